@@ -98,6 +98,9 @@ class SimulationConfiguration(Configuration):
     validate_consistency = False        # Create a consistency report for all replicas post simulation.
     trace_logs           = False        # Write out the logs of all replicas in the results (more disk usage)
     aggregate_heartbeats = True         # Differentiate between append entries and heartbeat messages.
+    results_sink         = "memory"     # Keep time series in memory or stream them to disk (memory, jsonl, csv, columnar, online)
+    results_path         = None         # Parent directory of the streamed time series of each run (a temporary directory if None)
+    results_chunk_size   = 10000        # Values of a time series buffered in memory before being written
     default_latency      = 800
     default_replica      = "storage"
     default_consistency  = "strong"
@@ -134,7 +137,7 @@ class SimulationConfiguration(Configuration):
     online_stddev    = 512    # standard deviation of ounline duration in milliseconds
     partition_across = "wide" # types of links to cut, one of wide, local, both, node, or leader
 
-    # Integration parameter: default, floated, or federated
+    # Integration parameter: default, floated, federated, or sharded
     integration      = "default"
 
     # Versioning parameter: default, lamport, federated
@@ -143,17 +146,33 @@ class SimulationConfiguration(Configuration):
     # Eventual Parameters
     anti_entropy_delay = 600  # delay in milliseconds (100x per minute)
     num_neighbors = 1         # the number of neighbors to push to during anti-entropy session.
+    anti_entropy_mode = "full" # type of anti-entropy session, one of full, digest, or delta
     do_gossip     = True      # perform gossip protocol (deprecated)
     do_rumoring   = False     # perform rumor mongering (deprecated)
+    rumor_termination = "counter" # how to stop spreading a rumor, one of counter or coin
+    rumor_limit   = 2         # the k for the counter or coin (1/k) rumor termination
 
     # Raft Parameters
     election_timeout   = [150, 300] # Usually related to a tick parameter T
     heartbeat_interval = 75         # Usually half the minimum election timeout.
-    aggregate_writes   = False      # Don't send writes until heartbeat.
-    read_policy        = "latest"   # Policy for followers reading from logs (latest or commit)
+    aggregate_writes   = False      # Don't send writes until heartbeat (or "batch").
+    write_batch_size   = 8          # Number of writes to aggregate in a batch
+    write_batch_delay  = 10         # Maximum delay of a batch in milliseconds
+    append_batch_size  = 64         # Maximum number of entries per AppendEntries
+    append_window      = 4          # Maximum AppendEntries in flight per follower
+    append_timeout     = 300        # Delay before unacknowledged entries are resent
+    read_policy        = "latest"   # Policy for followers reading from logs (latest, commit, lease, quorum)
+    read_index         = True       # Followers ask the leader for a read index for lease and quorum reads
+    pre_vote           = False      # Poll the quorum before starting an election (disrupts fewer terms)
+    check_quorum       = False      # Leaders step down without contact from a quorum in the election timeout
+
+    # Sharded Raft Parameters
+    num_shards         = 4      # Number of Raft groups the namespace is partitioned into
+    shard_partition    = "hash" # Partition the namespace by hash or range
 
     # Tag Parameters
     session_timeout    = 4096 # Related to the mean delay between accesses
+    tag_batch_size     = 1    # Objects requested per tag acquisition (including recent accesses)
 
     # Federated Parameters
     sync_prob  = 0.3  # probability of eventual syncing with core consensus
@@ -44,6 +44,7 @@ COMMANDS    = [
     ModifyTopologyCommand,
     TopologyGeneratorCommand,
     StatusCommand,
+    IngestCommand,
 ]
 
 ##########################################################################
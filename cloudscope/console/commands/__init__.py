@@ -29,3 +29,4 @@ from .outages import OutagesCommand
 from .modify import ModifyTopologyCommand
 from .topology import TopologyGeneratorCommand
 from .status import StatusCommand
+from .ingest import IngestCommand
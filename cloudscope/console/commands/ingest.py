@@ -0,0 +1,72 @@
+# console.commands.ingest
+# Ingests the results of multisim into a SQLite results store.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: ingest.py [] $
+
+"""
+Ingests the results of multisim into a SQLite results store.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import multiprocessing as mp
+
+from commis import Command
+from cloudscope.utils.decorators import Timer
+from cloudscope.results.store import ResultsStore
+
+##########################################################################
+## Command
+##########################################################################
+
+class IngestCommand(Command):
+
+    name = 'ingest'
+    help = 'ingest multisim results into a SQLite database for analysis.'
+    args = {
+        ('-d', '--database'): {
+            'type': str,
+            'default': 'results.db',
+            'metavar': 'DB',
+            'help': 'specify the location of the database to ingest into',
+        },
+        ('-t', '--tasks'): {
+            'type': int,
+            'metavar': 'NUM',
+            'default': mp.cpu_count(),
+            'help': 'number of processes parsing the results',
+        },
+        ('-s', '--series'): {
+            'action': 'store_true',
+            'default': False,
+            'help': 'also store the raw time series of the results',
+        },
+        'results': {
+            'nargs': '+',
+            'type': str,
+            'metavar': 'multisim.json',
+            'help': 'multisim results files (one result per line) to ingest',
+        },
+    }
+
+    def handle(self, args):
+        """
+        Ingests each of the results files into the store.
+        """
+        ingested = 0
+        with Timer() as timer:
+            with ResultsStore(args.database) as store:
+                for path in args.results:
+                    ingested += store.ingest(
+                        path, series=args.series, processes=args.tasks
+                    )
+                total = len(store)
+
+        return "ingested {} experiments into {} ({} total) in {}".format(
+            ingested, args.database, total, timer
+        )
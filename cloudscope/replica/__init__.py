@@ -24,6 +24,7 @@ from .consensus import RaftReplica
 from .consensus import TagReplica
 from .consensus import FloatedRaftReplica
 from .consensus import TieredRaftReplica
+from .consensus import ShardedRaftReplica
 from .eventual import EventualReplica
 from .federated import FederatedRaftReplica
 from .federated import FederatedEventualReplica
@@ -54,6 +55,11 @@ ReplicaTypes = {
         Consistency.STRONG: FloatedRaftReplica,
     },
 
+    'sharded': {
+        Consistency.STRONG: ShardedRaftReplica,
+        Consistency.RAFT: ShardedRaftReplica,
+    },
+
     'federated': {
         Consistency.STRONG: FederatedRaftReplica,
         Consistency.EVENTUAL: FederatedEventualReplica,
@@ -377,6 +377,10 @@ class Write(Access):
         """
         super(Write, self).drop()
 
+        # Inform the version so its parent no longer counts it as a fork.
+        if self.version is not None:
+            self.version.on_drop(self)
+
         # Track the drop latency
         self.sim.results.update(
             'dropped write latency',
@@ -22,7 +22,7 @@ from cloudscope.dynamo import Sequence
 from cloudscope.utils.enums import Enum
 from cloudscope.utils.strings import decamelize
 from cloudscope.replica.access import Read, Write
-from cloudscope.results.metrics import SENT, RECV, DROP
+from cloudscope.results.metrics import SENT, RECV, DROP, message_type
 from cloudscope.simulation.network import Node, Message
 from cloudscope.exceptions import AccessError, NetworkError
 
@@ -106,6 +106,37 @@ class ReadPolicy(Enum):
 
     LATEST = "latest"
     COMMIT = "commit"
+    LEASE  = "lease"  # linearizable reads using leader leases
+    QUORUM = "quorum" # linearizable reads confirmed by a quorum round
+
+
+class WritePolicy(Enum):
+    """
+    Defines how leaders replicate writes (e.g. aggregate writes).
+    """
+
+    IMMEDIATE = "immediate" # replicate on every write
+    HEARTBEAT = "heartbeat" # replicate on the next heartbeat
+    BATCH     = "batch"     # replicate after N writes or M milliseconds
+
+
+class AntiEntropy(Enum):
+    """
+    Defines the types of anti-entropy sessions between eventual replicas.
+    """
+
+    FULL   = "full"   # push the latest version of every object
+    DIGEST = "digest" # exchange version digests, then only differing entries
+    DELTA  = "delta"  # push entries since the last synchronized log index
+
+
+class RumorTermination(Enum):
+    """
+    Defines how replicas stop spreading a rumor (e.g. lose interest in it).
+    """
+
+    COUNTER = "counter" # after k responses from replicas that already knew it
+    COIN    = "coin"    # with probability 1/k on every such response
 
 
 ##########################################################################
@@ -137,6 +168,11 @@ class Replica(Node):
             'consistency', settings.simulation.default_consistency
         ))
 
+        # Message classification
+        self.aggregate_heartbeats = kwargs.get(
+            'aggregate_heartbeats', settings.simulation.aggregate_heartbeats
+        )
+
     ######################################################################
     ## Properties
     ######################################################################
@@ -165,6 +201,13 @@ class Replica(Node):
     ## Core Methods (Replica API)
     ######################################################################
 
+    def classify(self, value):
+        """
+        Classifies the message type of the value once when it is sent so
+        that the metrics and the traces don't have to inspect the message.
+        """
+        return message_type(value, self.aggregate_heartbeats)
+
     def send(self, target, value):
         """
         Intermediate step towards Node.send (which handles simulation network)
@@ -401,8 +444,8 @@ class Replica(Node):
         someone else. For now, we'll just record and log the drop.
         """
         # Create a dummy message
-        dummy = Message(self, target, value, None)
-        mtype = self.sim.results.messages.update(message, DROP)
+        dummy = Message(self, target, value, None, self.classify(value))
+        mtype = self.sim.results.messages.update(dummy, DROP)
 
         # Debug logging of the message dropped
         self.sim.logger.debug(
@@ -21,3 +21,4 @@ from .raft import RaftReplica
 from .tag import TagReplica
 from .float import FloatedRaftReplica
 from .tiered import TieredRaftReplica
+from .sharded import ShardedRaftReplica
@@ -191,14 +191,8 @@ class FloatedRaftReplica(RaftReplica):
 
         if self.state == State.LEADER:
 
-            if rpc.success:
-                self.nextIndex[msg.source]  = rpc.lastLogIndex + 1
-                self.matchIndex[msg.source] = rpc.lastLogIndex
-
-            else:
-                # Decrement next index and retry append entries
-                self.nextIndex[msg.source] -= 1
-                self.send_append_entries(msg.source)
+            # Update the replication state of the follower
+            self.update_follower(msg)
 
             # Decide if we can commit the entry
             for n in xrange(self.log.lastApplied, self.log.commitIndex, -1):
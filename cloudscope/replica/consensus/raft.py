@@ -20,7 +20,7 @@ Implements strong consistency using Raft consensus.
 from cloudscope.config import settings
 from cloudscope.simulation.timer import Timer
 from cloudscope.replica.store import namespace
-from cloudscope.replica import Consistency, State, ReadPolicy
+from cloudscope.replica import Consistency, State, ReadPolicy, WritePolicy
 from cloudscope.exceptions import RaftRPCException, SimulationException
 from cloudscope.replica.store import MultiObjectWriteLog
 
@@ -40,15 +40,27 @@ ELECTION_TIMEOUT   = settings.simulation.election_timeout
 
 # Other Settings/Policies
 READ_POLICY        = settings.simulation.read_policy
+READ_INDEX         = settings.simulation.read_index
 AGGREGATE_WRITES   = settings.simulation.aggregate_writes
+WRITE_BATCH_SIZE   = settings.simulation.write_batch_size
+WRITE_BATCH_DELAY  = settings.simulation.write_batch_delay
+APPEND_BATCH_SIZE  = settings.simulation.append_batch_size
+APPEND_WINDOW      = settings.simulation.append_window
+APPEND_TIMEOUT     = settings.simulation.append_timeout
+PRE_VOTE           = settings.simulation.pre_vote
+CHECK_QUORUM       = settings.simulation.check_quorum
 
 ## RPC Messages
 AppendEntries = namedtuple('AppendEntries', 'term, leaderId, prevLogIndex, prevLogTerm, entries, leaderCommit')
 AEResponse    = namedtuple('AEResponse', 'term, success, lastLogIndex, lastCommitIndex')
 RequestVote   = namedtuple('RequestVote', 'term, candidateId, lastLogIndex, lastLogTerm')
 VoteResponse  = namedtuple('VoteResponse', 'term, voteGranted')
+PreVote       = namedtuple('PreVote', 'term, candidateId, lastLogIndex, lastLogTerm')
+PreVoteResponse = namedtuple('PreVoteResponse', 'term, voteGranted')
 RemoteWrite   = namedtuple('RemoteWrite', 'term, version')
 WriteResponse = namedtuple('WriteResponse', 'term, success, access')
+ReadIndex     = namedtuple('ReadIndex', 'term, access, lease')
+ReadIndexResponse = namedtuple('ReadIndexResponse', 'term, access, success, readIndex')
 
 ##########################################################################
 ## Raft Replica
@@ -61,6 +73,15 @@ class RaftReplica(ConsensusReplica):
         super(RaftReplica, self).__init__(simulation, **kwargs)
 
         ## Initialize Raft Specific settings
+        self._leader     = None # leader hint learned from AppendEntries
+        self.leaderless  = self.env.now # when the leader hint was last lost
+        self.heard       = None # when the leader hint was last heard from
+        self.votes       = None # the election of the current candidacy
+        self.prevotes    = None # the poll of the quorum before an election
+        self.candidacy   = None # when the current candidacy started
+        self.elected     = None # when this replica was last elected leader
+        self.reads       = []   # reads waiting for leadership confirmation
+        self.waiting     = []   # reads waiting for the commit of a read index
         self.state       = State.FOLLOWER
         self.currentTerm = 0
         self.votedFor    = None
@@ -69,18 +90,76 @@ class RaftReplica(ConsensusReplica):
 
         ## Policies
         self.read_policy = ReadPolicy.get(kwargs.get('read_policy', READ_POLICY))
-        self.aggregate_writes = kwargs.get('aggregate_writes', AGGREGATE_WRITES)
+        self.read_index  = kwargs.get('read_index', READ_INDEX)
+        self.write_policy = self.get_write_policy(
+            kwargs.get('aggregate_writes', AGGREGATE_WRITES)
+        )
+        self.aggregate_writes = self.write_policy != WritePolicy.IMMEDIATE
+        self.pre_vote     = kwargs.get('pre_vote', PRE_VOTE)
+        self.check_quorum = kwargs.get('check_quorum', CHECK_QUORUM)
+
+        ## Replication pipeline
+        self.append_batch   = kwargs.get('append_batch_size', APPEND_BATCH_SIZE)
+        self.append_window  = kwargs.get('append_window', APPEND_WINDOW)
+        self.append_timeout = kwargs.get('append_timeout', APPEND_TIMEOUT)
 
         ## Timers for work
         eto = kwargs.get('election_timeout', ELECTION_TIMEOUT)
         hbt = kwargs.get('heartbeat_interval', HEARTBEAT_INTERVAL)
 
         self.timeout     = ElectionTimer.fromReplica(self, eto)
+        self.lease       = kwargs.get('lease_duration', min(eto))
+        self.min_timeout = min(eto)
         self.heartbeat   = Timer(self.env, hbt, self.on_heartbeat_timeout)
 
+        ## Write batching
+        self.batch_size  = kwargs.get('write_batch_size', WRITE_BATCH_SIZE)
+        self.batch_delay = kwargs.get('write_batch_delay', WRITE_BATCH_DELAY)
+        self.batch       = Timer(self.env, self.batch_delay, self.on_batch_timeout)
+        self.pending     = 0 # number of writes appended since the last flush
+
         ## Leader state
         self.nextIndex   = None
         self.matchIndex  = None
+        self.inflight    = None
+        self.rewound     = None
+        self.contacted   = None
+
+    ######################################################################
+    ## Properties
+    ######################################################################
+
+    @property
+    def leaderId(self):
+        """
+        Returns the id of the replica this replica believes to be leader.
+        """
+        if self.leader is not None:
+            return self.leader.id
+
+    @property
+    def leader(self):
+        """
+        Returns the replica this replica believes to be leader (or None).
+        """
+        return self._leader
+
+    @leader.setter
+    def leader(self, leader):
+        """
+        Sets the leader hint, recording the periods of time that this replica
+        spends without knowing of any leader.
+        """
+        if leader is None and self._leader is not None:
+            self.leaderless = self.env.now
+
+        elif leader is not None and self.leaderless is not None:
+            self.sim.results.update(
+                'leaderless', (self.id, self.leaderless, self.env.now)
+            )
+            self.leaderless = None
+
+        self._leader = leader
 
     ######################################################################
     ## Core Methods (Replica API)
@@ -96,10 +175,19 @@ class RaftReplica(ConsensusReplica):
         rpc = message.value
 
         # If RPC request or response contains term > currentTerm
-        # Set currentTerm to term and convert to follower.
+        # Set currentTerm to term and convert to follower (unless it is a
+        # vote request and a leader lease might be held, which is denied).
+        # Pre-votes propose a term without incrementing it, so are ignored.
         if rpc.term > self.currentTerm:
+            if isinstance(rpc, RequestVote) and self.in_lease():
+                return super(RaftReplica, self).recv(event)
+
+            if isinstance(rpc, PreVote):
+                return super(RaftReplica, self).recv(event)
+
             self.state = State.FOLLOWER
             self.currentTerm = rpc.term
+            self.leader = None
 
         # Record the received message and dispatch to event handler
         return super(RaftReplica, self).recv(event)
@@ -117,21 +205,21 @@ class RaftReplica(ConsensusReplica):
         # Record the number of attempts for the access
         if access.is_local_to(self): access.attempts += 1
 
-        # NOTE: Formerly, this was ALWAYS read commit not read latest, now
-        # it is set by the read policy on the replica. We previously noted that
-        # read committed was one of the key differences from eventual.
-        version = self.read_via_policy(access.name)
-
-        # If the version is None, that we haven't read anything!
-        if version is None: return access.drop(empty=True)
+        # Linearizable reads must first confirm the leadership of the leader
+        if self.read_policy in (ReadPolicy.LEASE, ReadPolicy.QUORUM):
+            if self.state == State.LEADER:
+                # Leaders holding a lease can read locally without a round trip
+                if self.read_policy == ReadPolicy.LEASE and self.has_lease():
+                    return self.complete_read(access)
 
-        # Because this is a local read committed, complete the read.
-        access.update(version, completed=True)
+                # Otherwise wait for a quorum to confirm leadership
+                return self.confirm_read(access)
 
-        # Log the access from this particular replica.
-        access.log(self)
+            # Followers fetch a read index from the leader if specified.
+            if self.read_index:
+                return self.send_read_index(access)
 
-        return access
+        return self.complete_read(access)
 
     def write(self, name, **kwargs):
         """
@@ -216,11 +304,18 @@ class RaftReplica(ConsensusReplica):
         forte = True if settings.simulation.forte_on_append else False
         version.update(self, forte=forte)
 
-        # Now do AppendEntries
-        # Also interrupt the heartbeat since we just sent AppendEntries
-        if not self.aggregate_writes:
-            self.send_append_entries()
-            self.heartbeat.stop()
+        # Now do AppendEntries according to the write policy
+        self.pending += 1
+        if self.write_policy == WritePolicy.IMMEDIATE:
+            self.flush_writes()
+
+        elif self.write_policy == WritePolicy.BATCH:
+            # Flush a full batch, otherwise ensure the batch timer is running
+            if self.pending >= self.batch_size:
+                self.stop_batch()
+                self.flush_writes()
+            else:
+                self.batch.start()
 
         return access
 
@@ -244,38 +339,394 @@ class RaftReplica(ConsensusReplica):
     ## Helper Methods
     ######################################################################
 
+    def complete_read(self, access):
+        """
+        Completes a read with the version fetched via the read policy and
+        records the read latency and staleness by read policy.
+        """
+        # NOTE: Formerly, this was ALWAYS read commit not read latest, now
+        # it is set by the read policy on the replica. We previously noted that
+        # read committed was one of the key differences from eventual.
+        version = self.read_via_policy(access.name)
+
+        # If the version is None, that we haven't read anything!
+        if version is None: return access.drop(empty=True)
+
+        # Because this is a local read committed, complete the read.
+        access.update(version, completed=True)
+
+        # Log the access from this particular replica.
+        access.log(self)
+
+        # Track the read latency and staleness of the read policy
+        self.sim.results.update(
+            'policy read', (
+                self.id, self.read_policy.value, access.started,
+                access.finished, version.staleness(),
+            )
+        )
+
+        return access
+
+    def confirm_read(self, access, source=None):
+        """
+        Leader-only method that holds a read (a local access or a read index
+        request from the source) until a quorum has been contacted after the
+        read was requested. A heartbeat round is sent if one is required.
+        """
+        if not self.reads:
+            self.send_append_entries()
+
+        self.reads.append((access, source, self.env.now))
+        return access
+
+    def confirm_reads(self):
+        """
+        Completes all reads that were requested before the leader most
+        recently heard from a quorum, or responds with the read index.
+        """
+        confirmed = self.get_quorum_contact()
+        pending   = []
+
+        for access, source, requested in self.reads:
+            if requested > confirmed:
+                pending.append((access, source, requested))
+            elif source is None:
+                self.complete_read(access)
+            else:
+                self.send(source, ReadIndexResponse(
+                    self.currentTerm, access, True, self.log.commitIndex
+                ))
+
+        self.reads = pending
+
+    def drop_reads(self):
+        """
+        Drops all reads waiting on leadership confirmation, e.g. on step down.
+        """
+        for access, source, requested in self.reads:
+            if source is None:
+                access.drop()
+            else:
+                self.send(source, ReadIndexResponse(
+                    self.currentTerm, access, False, 0
+                ))
+
+        self.reads = []
+
+    def send_read_index(self, access):
+        """
+        Helper function to request a read index from the leader; the read is
+        completed when the local commit index reaches the read index.
+        """
+        leader = self.get_leader_node()
+
+        # If not leader, then drop the read
+        if not leader:
+            self.sim.logger.info(
+                "no leader: dropped read at {}".format(self)
+            )
+
+            return access.drop()
+
+        lease = self.read_policy == ReadPolicy.LEASE
+        self.send(leader, ReadIndex(self.currentTerm, access, lease))
+        return access
+
+    def complete_waiting(self):
+        """
+        Completes the reads whose read index has been committed locally.
+        """
+        pending = []
+        for readIndex, access in self.waiting:
+            if readIndex <= self.log.commitIndex:
+                self.complete_read(access)
+            else:
+                pending.append((readIndex, access))
+
+        self.waiting = pending
+
+    def get_quorum_contact(self):
+        """
+        Returns the latest time by which a quorum of the cluster (including
+        the leader) had heard from the leader in the current term.
+        """
+        contacts = sorted(self.contacted.values(), reverse=True)
+        needed   = (len(contacts) + 1) / 2
+
+        if needed == 0: return self.env.now
+        return contacts[needed - 1]
+
+    def has_lease(self):
+        """
+        A leader holds a lease if a quorum has heard from it within the lease
+        duration (the minimum election timeout), since no other leader can
+        be elected before then.
+        """
+        if self.state != State.LEADER: return False
+        return self.get_quorum_contact() + self.lease > self.env.now
+
+    def in_lease(self):
+        """
+        Returns True if leases are in use and this replica has heard from the
+        leader within the lease duration (or holds the lease itself), in
+        which case vote requests must be denied.
+        """
+        if self.read_policy != ReadPolicy.LEASE: return False
+        if self.state == State.LEADER: return self.has_lease()
+        if self.leader is None or self.heard is None: return False
+        return self.env.now - self.heard < self.lease
+
+    def has_quorum(self):
+        """
+        A leader checking the quorum must have heard from a quorum within the
+        minimum election timeout (or been elected within it) to stay leader.
+        """
+        if self.state != State.LEADER: return False
+        contact = max(self.get_quorum_contact(), self.elected)
+        return contact + self.min_timeout > self.env.now
+
+    def heard_leader(self):
+        """
+        Returns True if this replica is the leader or has heard from the
+        leader within the minimum election timeout, in which case pre-votes
+        are denied so that a partitioned replica cannot disrupt the cluster.
+        """
+        if self.state == State.LEADER: return True
+        if self.leader is None or self.heard is None: return False
+        return self.env.now - self.heard < self.min_timeout
+
+    def start_election(self):
+        """
+        Becomes a candidate in the next term, votes for self and requests the
+        votes of the rest of the quorum.
+        """
+        # Set state to candidate
+        self.state = State.CANDIDATE
+
+        # Create Election and vote for self
+        self.currentTerm += 1
+        self.leader = None
+        self.candidacy = self.env.now
+        self.votes = Election([node.id for node in self.quorum()])
+        self.votes.vote(self.id)
+        self.votedFor = self.id
+
+        # Inform the rest of the quorum you'd like their vote.
+        rpc = RequestVote(
+            self.currentTerm, self.id, self.log.lastApplied, self.log.lastTerm
+        )
+
+        for follower in self.quorum():
+            if follower == self: continue
+            self.send(
+                follower, rpc
+            )
+
+        # Log the newly formed candidacy
+        self.sim.logger.info(
+            "{} is now a leader candidate".format(self)
+        )
+
+    def start_pre_vote(self):
+        """
+        Polls the quorum with the next term without incrementing the current
+        term; the election is only started if a majority would grant a vote.
+        """
+        self.leader = None
+        self.prevotes = Election([node.id for node in self.quorum()])
+        self.prevotes.vote(self.id)
+
+        rpc = PreVote(
+            self.currentTerm + 1, self.id, self.log.lastApplied, self.log.lastTerm
+        )
+
+        for follower in self.quorum():
+            if follower == self: continue
+            self.send(follower, rpc)
+
+    def end_election(self, won):
+        """
+        Records the outcome of the current candidacy: the number of votes
+        granted, how long the election took and whether it was won.
+        """
+        granted = sum(1 for vote in self.votes.quorum.values() if vote)
+        self.sim.results.update(
+            'election', (
+                self.id, self.currentTerm, self.candidacy,
+                self.env.now, granted, won
+            )
+        )
+        self.candidacy = None
+
+    def get_write_policy(self, policy):
+        """
+        Returns the write policy from the aggregate writes setting, which can
+        be a boolean (aggregate until the heartbeat or not) or a policy name.
+        """
+        if isinstance(policy, bool):
+            return WritePolicy.HEARTBEAT if policy else WritePolicy.IMMEDIATE
+        return WritePolicy.get(policy)
+
+    def stop_batch(self):
+        """
+        Stops the batch timer. A stopped timer keeps running until the
+        simulation steps, so it is replaced to ensure that writes in the same
+        tick as a flush can start a new batch delay.
+        """
+        if self.batch.running:
+            self.batch.stop()
+            self.batch = Timer(self.env, self.batch_delay, self.on_batch_timeout)
+
+    def flush_writes(self, interrupt=True):
+        """
+        Sends AppendEntries for all pending writes and records the batch.
+        Also interrupts the heartbeat since we just sent AppendEntries unless
+        interrupt is False (e.g. when flushing on the heartbeat itself).
+        """
+        messages = self.send_append_entries()
+        if interrupt: self.heartbeat.stop()
+
+        if self.pending:
+            self.sim.results.update(
+                'write batch', (
+                    self.id, self.write_policy.value, self.pending,
+                    messages, self.env.now
+                )
+            )
+
+        self.pending = 0
+
     def send_append_entries(self, target=None):
         """
         Helper function to send append entries to quorum or a specific node.
 
+        Replication is pipelined: entries are sent in batches of at most
+        append_batch entries as zero-copy views of the log, and the nextIndex
+        of the follower is optimistically advanced past each batch so that
+        up to append_window batches can be in flight at once. If there are
+        no new entries (or the window is full) a heartbeat is sent instead.
+
+        Returns the number of AppendEntries messages sent to followers.
         Note: fails silently if target is not in the neighbors list.
         """
         # Leader check
         if not self.state == State.LEADER:
-            return
+            return 0
 
         # Go through follower list.
-        for node, nidx in self.nextIndex.iteritems():
+        messages = 0
+        for node in self.nextIndex:
             # Filter based on the target supplied.
             if target is not None and node != target:
                 continue
 
-            # Construct the entries, or empty for heartbeat
-            entries = []
-            if self.log.lastApplied >= nidx:
-                entries = self.log[nidx:]
+            # Resend from the last match if the oldest batch is presumed lost.
+            inflight = self.inflight[node]
+            if inflight and self.env.now - inflight[0][1] >= self.append_timeout:
+                del inflight[:]
+                self.rewound.pop(node, None)
+                self.nextIndex[node] = self.matchIndex[node] + 1
+
+            # Send batches of entries while the window is open.
+            sent = False
+            while self.log.lastApplied >= self.nextIndex[node]:
+                if len(inflight) >= self.append_window:
+                    break
 
-            # Compute the previous log index and term
-            prevLogIndex = nidx - 1
-            prevLogTerm  = self.log[prevLogIndex].term
+                nidx = self.nextIndex[node]
+                stop = min(self.log.lastApplied + 1, nidx + self.append_batch)
+                self.send_entries(node, nidx - 1, self.log.view(nidx, stop))
 
-            # Send the heartbeat message
-            self.send(
-                node, AppendEntries(
-                    self.currentTerm, self.id, prevLogIndex,
-                    prevLogTerm, entries, self.log.commitIndex
-                )
+                # Optimistically advance the next index past the batch.
+                self.nextIndex[node] = stop
+                inflight.append((stop - 1, self.env.now))
+                messages += 1
+                sent = True
+
+            if not sent:
+                # Heartbeats are anchored at the last match while entries are
+                # in flight so that they aren't rejected by the follower.
+                prevLogIndex = self.nextIndex[node] - 1
+                if inflight: prevLogIndex = self.matchIndex[node]
+                self.send_entries(node, prevLogIndex, [])
+                messages += 1
+
+        return messages
+
+    def send_entries(self, node, prevLogIndex, entries):
+        """
+        Helper function to send a single AppendEntries RPC to a follower.
+        """
+        # Compute the previous log term
+        prevLogTerm = self.log[prevLogIndex].term
+
+        # Send the append entries (or heartbeat) message
+        return self.send(
+            node, AppendEntries(
+                self.currentTerm, self.id, prevLogIndex,
+                prevLogTerm, entries, self.log.commitIndex
             )
+        )
+
+    def update_follower(self, msg):
+        """
+        Updates the replication state of a follower from an AppendEntries
+        response. Successful responses acknowledge all batches up to the last
+        matched index and send the next batch if entries remain, failures
+        rewind the next index (using the follower's last log index as a hint)
+        and retry append entries immediately, once for all of the batches
+        rejected behind the same gap.
+
+        Any response in the current term also records when the follower last
+        heard from the leader, confirming leadership for pending reads.
+        """
+        node, rpc = msg.source, msg.value
+
+        if rpc.term == self.currentTerm:
+            self.contacted[node] = max(self.contacted[node], self.env.now - msg.delay)
+            if self.reads: self.confirm_reads()
+
+        if rpc.success:
+            # Responses may arrive out of order, so never move backwards.
+            self.matchIndex[node] = max(self.matchIndex[node], rpc.lastLogIndex)
+            self.nextIndex[node]  = max(self.nextIndex[node], rpc.lastLogIndex + 1)
+
+            # Remove all acknowledged batches from the in flight window.
+            self.inflight[node] = [
+                batch for batch in self.inflight[node]
+                if batch[0] > rpc.lastLogIndex
+            ]
+
+            # Batches behind a rewound gap are accepted once it is filled.
+            if rpc.lastLogIndex >= self.rewound.get(node, float('inf')):
+                del self.rewound[node]
+
+            # Send the next batch if entries remain and the window has room.
+            if self.nextIndex[node] <= self.log.lastApplied:
+                if len(self.inflight[node]) < self.append_window:
+                    self.send_append_entries(node)
+
+        else:
+            # Ignore rejections sent before the follower acknowledged later
+            # entries, they were already resent.
+            if rpc.lastLogIndex < self.matchIndex[node]:
+                return
+
+            # Decrement next index and retry append entries
+            # Ensure to floor the nextIndex to the last match (at least 1).
+            nidx = min(self.nextIndex[node] - 1, rpc.lastLogIndex + 1)
+            nidx = max(nidx, self.matchIndex[node] + 1)
+
+            # The batches behind a gap are all rejected, only resend them for
+            # the first rejection (the resent entries are still in flight).
+            if self.inflight[node] and nidx >= self.rewound.get(node, float('inf')):
+                return
+
+            self.nextIndex[node] = nidx
+            self.rewound[node]   = nidx
+            self.inflight[node]  = []
+            self.send_append_entries(node)
 
     def send_remote_write(self, access):
         """
@@ -301,19 +752,11 @@ class RaftReplica(ConsensusReplica):
 
     def get_leader_node(self):
         """
-        Searches for the leader amongst the neighbors. Raises an exception if
-        there are multiple leaders, which is an extreme edge case.
+        Returns the leader as last learned from AppendEntries in the current
+        term, or None if the leader is unknown. Note that the leader can be
+        stale, in which case remote writes are forwarded again.
         """
-        leaders = [
-            node for node in self.quorum() if node.state == State.LEADER
-        ]
-
-        if len(leaders) > 1:
-            raise SimulationException("MutipleLeaders?!")
-        elif len(leaders) < 1:
-            return None
-        else:
-            return leaders[0]
+        return self.leader
 
     def read_via_policy(self, name):
         """
@@ -327,7 +770,8 @@ class RaftReplica(ConsensusReplica):
         """
 
         # If the policy is read committed, return the latest committed version
-        if self.read_policy == ReadPolicy.COMMIT:
+        # Linearizable reads also return the latest committed version.
+        if self.read_policy in (ReadPolicy.COMMIT, ReadPolicy.LEASE, ReadPolicy.QUORUM):
             return self.log.get_latest_commit(name)
 
         # If the policy is latest, read the latest and compare to cache.
@@ -399,14 +843,29 @@ class RaftReplica(ConsensusReplica):
         interacts with RPC messages and client reads/writes.
         """
         if self.state in (State.FOLLOWER, State.CANDIDATE):
+            # Stepping down or restarting a candidacy loses the election.
+            if self.candidacy is not None: self.end_election(False)
+            if self.leader == self: self.leader = None
+            self.prevotes    = None
+            if self.reads: self.drop_reads()
             self.votedFor    = None
             self.nextIndex   = None
             self.matchIndex  = None
+            self.inflight    = None
+            self.rewound     = None
+            self.contacted   = None
+            self.pending     = 0
         elif self.state == State.CANDIDATE:
             pass
         elif self.state == State.LEADER:
+            self.leader      = self
+            self.elected     = self.env.now
+            self.prevotes    = None
             self.nextIndex   = {node: self.log.lastApplied + 1 for node in self.quorum() if node != self}
             self.matchIndex  = {node: 0 for node in self.quorum() if node != self}
+            self.inflight    = {node: [] for node in self.quorum() if node != self}
+            self.rewound     = {}
+            self.contacted   = {node: float('-inf') for node in self.quorum() if node != self}
         elif self.state == State.READY:
             # This happens on the call to super, just ignore for now.
             pass
@@ -422,37 +881,37 @@ class RaftReplica(ConsensusReplica):
         if not self.state == State.LEADER:
             return
 
+        # Step down if a quorum hasn't been heard from in an election timeout
+        if self.check_quorum and not self.has_quorum():
+            self.sim.logger.info(
+                "{} stepping down without contact from a quorum".format(self)
+            )
+            self.state = State.FOLLOWER
+            return
+
         # Send heartbeat or aggregated writes
-        self.send_append_entries()
+        self.stop_batch()
+        self.flush_writes(interrupt=False)
 
-    def on_election_timeout(self):
+    def on_batch_timeout(self):
         """
-        Callback for when an election timeout occurs, e.g. become candidate.
+        Callback for when the batch delay has elapsed since the first write
+        in the batch; flushes the batch with AppendEntries.
         """
-        # Set state to candidate
-        self.state = State.CANDIDATE
-
-        # Create Election and vote for self
-        self.currentTerm += 1
-        self.votes = Election([node.id for node in self.quorum()])
-        self.votes.vote(self.id)
-        self.votedFor = self.id
+        if not self.state == State.LEADER:
+            return
 
-        # Inform the rest of the quorum you'd like their vote.
-        rpc = RequestVote(
-            self.currentTerm, self.id, self.log.lastApplied, self.log.lastTerm
-        )
+        # Send the batched writes
+        self.flush_writes()
 
-        for follower in self.quorum():
-            if follower == self: continue
-            self.send(
-                follower, rpc
-            )
-
-        # Log the newly formed candidacy
-        self.sim.logger.info(
-            "{} is now a leader candidate".format(self)
-        )
+    def on_election_timeout(self):
+        """
+        Callback for when an election timeout occurs, e.g. become candidate
+        (or poll the quorum first if pre-vote is enabled).
+        """
+        if self.pre_vote:
+            return self.start_pre_vote()
+        return self.start_election()
 
     def on_request_vote_rpc(self, msg):
         """
@@ -460,7 +919,7 @@ class RaftReplica(ConsensusReplica):
         """
         rpc = msg.value
 
-        if rpc.term >= self.currentTerm:
+        if rpc.term >= self.currentTerm and not self.in_lease():
             if self.votedFor is None or self.votedFor == rpc.candidateId:
                 if self.log.as_up_to_date(rpc.lastLogTerm, rpc.lastLogIndex):
 
@@ -490,6 +949,7 @@ class RaftReplica(ConsensusReplica):
             self.votes.vote(msg.source.id, rpc.voteGranted)
             if self.votes.has_passed():
                 ## Become the leader
+                self.end_election(True)
                 self.state = State.LEADER
                 self.timeout.stop()
 
@@ -512,6 +972,35 @@ class RaftReplica(ConsensusReplica):
                 "Vote response in unknown state: '{}'".format(self.state)
             )
 
+    def on_pre_vote_rpc(self, msg):
+        """
+        Callback for the PreVote RPC call; grants the vote if the candidate
+        could win an election without disrupting a live leader.
+        """
+        rpc = msg.value
+        granted = (
+            rpc.term > self.currentTerm and not self.heard_leader() and
+            self.log.as_up_to_date(rpc.lastLogTerm, rpc.lastLogIndex)
+        )
+
+        return self.send(
+            msg.source, PreVoteResponse(self.currentTerm, granted)
+        )
+
+    def on_pre_vote_response_rpc(self, msg):
+        """
+        Callback for the PreVote RPC response; starts the election once a
+        majority of the quorum would grant their votes.
+        """
+        rpc = msg.value
+        if self.prevotes is None or self.state == State.LEADER:
+            return
+
+        self.prevotes.vote(msg.source.id, rpc.voteGranted)
+        if self.prevotes.has_passed():
+            self.prevotes = None
+            self.start_election()
+
     def on_append_entries_rpc(self, msg):
         """
         Callback for the AppendEntries RPC call.
@@ -528,6 +1017,11 @@ class RaftReplica(ConsensusReplica):
                 msg.source, AEResponse(self.currentTerm, False, self.log.lastApplied, self.log.lastCommit)
             )
 
+        # Remember the leader of the current term for remote writes
+        self.leader = msg.source
+        self.heard  = self.env.now
+        self.prevotes = None
+
         # Reply false if log doesn't contain an entry at prevLogIndex whose
         # term matches previous log term.
         if self.log.lastApplied < rpc.prevLogIndex or self.log[rpc.prevLogIndex][1] != rpc.prevLogTerm:
@@ -550,47 +1044,45 @@ class RaftReplica(ConsensusReplica):
             )
 
         # At this point AppendEntries RPC is accepted
-        if rpc.entries:
-            if self.log.lastApplied >= rpc.prevLogIndex:
+        index = rpc.prevLogIndex
+        for entry in rpc.entries:
+            index += 1
+
+            # Entries may be resent or pipelined, skip those already in the log.
+            if index <= self.log.lastApplied:
+                if self.log[index].term == entry.term:
+                    continue
+
                 # If existing entry conflicts with new one (same index, different terms)
                 # Delete the existing entry and all that follow it.
-                if self.log[rpc.prevLogIndex][1] != rpc.prevLogTerm:
-                    self.log.truncate(rpc.prevLogIndex)
-
-            if self.log.lastApplied > rpc.prevLogIndex:
-                # Otherwise this could be a message that is sent again
-                # raise RaftRPCException(
-                #     "{} is possibly receiving a duplicate append entries!".format(self)
-                # )
-                self.sim.logger.warn(
-                    "{} is possibly receiving a duplicate append entries!".format(self)
-                )
-                return self.send(msg.source, AEResponse(self.currentTerm, True, self.log.lastApplied, self.log.lastCommit))
-
+                self.log.truncate(index)
 
-            # Append any new entries not already in the log.
-            for entry in rpc.entries:
-                # Add the entry/term to the log
-                self.log.append(*entry)
-                self.sim.logger.debug(
-                    "appending {} to {} on {}".format(entry[0], entry[1], self)
-                )
+            # Add the entry/term to the log
+            self.log.append(*entry)
+            self.sim.logger.debug(
+                "appending {} to {} on {}".format(entry[0], entry[1], self)
+            )
 
-                # Update the versions to compute visibilities
-                entry[0].update(self)
+            # Update the versions to compute visibilities
+            entry[0].update(self)
 
+        if rpc.entries:
             # Log the last write from the append entries.
             self.sim.logger.debug(
                 "{} writes {} at idx {} (term {}, commit {})".format(
                 self, self.log.lastVersion, self.log.lastApplied, self.log.lastTerm, self.log.commitIndex
             ))
 
-        # If leaderCommit > commitIndex, update commit Index
+        # If leaderCommit > commitIndex, update commit Index (heartbeats may
+        # be anchored behind the commit index while entries are in flight).
         if rpc.leaderCommit > self.log.commitIndex:
-            self.log.commitIndex = min(rpc.leaderCommit, self.log.lastApplied)
+            self.log.commitIndex = max(self.log.commitIndex, min(rpc.leaderCommit, index))
 
-        # Return success response.
-        return self.send(msg.source, AEResponse(self.currentTerm, True, self.log.lastApplied, self.log.lastCommit))
+            # Complete any reads waiting for the commit index to advance
+            if self.waiting: self.complete_waiting()
+
+        # Return success response with the index of the last matched entry.
+        return self.send(msg.source, AEResponse(self.currentTerm, True, index, self.log.lastCommit))
 
     def on_ae_response_rpc(self, msg):
         """
@@ -600,16 +1092,8 @@ class RaftReplica(ConsensusReplica):
 
         if self.state == State.LEADER:
 
-            if rpc.success:
-                self.nextIndex[msg.source]  = rpc.lastLogIndex + 1
-                self.matchIndex[msg.source] = rpc.lastLogIndex
-
-            else:
-                # Decrement next index and retry append entries
-                # Ensure to floor the nextIndex to 1 (the start of the log).
-                nidx = self.nextIndex[msg.source] - 1
-                self.nextIndex[msg.source] = max(nidx, 1)
-                self.send_append_entries(msg.source)
+            # Update the replication state of the follower
+            self.update_follower(msg)
 
             # Decide if we can commit the entry
             for n in xrange(self.log.lastApplied, self.log.commitIndex, -1):
@@ -658,11 +1142,20 @@ class RaftReplica(ConsensusReplica):
 
         # Write the access from the remote replica
         access = message.value.version
+        forwarded = self.state != State.LEADER
         self.write(access)
 
         # Check if the access was dropped (e.g. the write failed)
         success = not access.is_dropped()
 
+        # If we're not the leader the write was forwarded to our leader,
+        # which will respond; track writes sent to a stale leader.
+        if forwarded and success:
+            self.sim.results.update(
+                'forwarded writes', (self.id, self.env.now)
+            )
+            return
+
         # Send the write response
         self.send(message.source, WriteResponse(self.currentTerm, success, access))
 
@@ -673,3 +1166,40 @@ class RaftReplica(ConsensusReplica):
         rpc = message.value
         if rpc.success:
             rpc.access.complete()
+
+    def on_read_index_rpc(self, message):
+        """
+        Responds to a read index request from a follower with the commit index
+        once leadership is confirmed (immediately if leased and allowed).
+        """
+        rpc = message.value
+
+        # Only leaders can respond with a read index.
+        if self.state != State.LEADER:
+            return self.send(
+                message.source,
+                ReadIndexResponse(self.currentTerm, rpc.access, False, 0)
+            )
+
+        # Respond immediately if the follower accepts leased read indices.
+        if rpc.lease and self.has_lease():
+            return self.send(
+                message.source, ReadIndexResponse(
+                    self.currentTerm, rpc.access, True, self.log.commitIndex
+                )
+            )
+
+        # Otherwise wait for a quorum to confirm leadership.
+        self.confirm_read(rpc.access, message.source)
+
+    def on_read_index_response_rpc(self, message):
+        """
+        Completes the read once the read index has been committed locally, or
+        drops the read if the leader could not provide a read index.
+        """
+        rpc = message.value
+        if not rpc.success:
+            return rpc.access.drop()
+
+        self.waiting.append((rpc.readIndex, rpc.access))
+        self.complete_waiting()
@@ -0,0 +1,224 @@
+# cloudscope.replica.consensus.sharded
+# Implements strong consistency by sharding the namespace into Raft groups.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: sharded.py [] $
+
+"""
+Implements strong consistency by sharding the namespace into Raft groups.
+
+The object namespace is partitioned (by hash or by range) into K shards, each
+of which is replicated by its own Raft group with its own log, term, and
+leader. Every replica server hosts one member of every group, so the groups
+are placed over the same replicas and share their network connections.
+Leadership is balanced by assigning a preferred replica to each shard, whose
+election timeout is drawn from the earlier half of the election timeout range
+so that it is usually elected first.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import zlib
+
+from bisect import bisect_left
+from cloudscope.config import settings
+from cloudscope.replica import State
+from cloudscope.exceptions import ImproperlyConfigured
+from cloudscope.replica.store import MultiObjectWriteLog
+from cloudscope.simulation.workload.multi import WorkloadCollection
+
+from .base import ConsensusReplica
+from .raft import RaftReplica
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+NUM_SHARDS       = settings.simulation.num_shards
+SHARD_PARTITION  = settings.simulation.shard_partition
+ELECTION_TIMEOUT = settings.simulation.election_timeout
+
+##########################################################################
+## Raft Group
+##########################################################################
+
+class RaftGroup(RaftReplica):
+    """
+    A member of the Raft group for a single shard, hosted on a replica. The
+    group member has the same id and location as its host and uses the
+    connections of its host to communicate with the members of the same
+    shard's group on the other hosts.
+    """
+
+    def __init__(self, simulation, host, shard, **kwargs):
+        self.host  = host
+        self.shard = shard
+        self.election_timeout = kwargs.get('election_timeout', ELECTION_TIMEOUT)
+        self._connections = None
+
+        super(RaftGroup, self).__init__(simulation, **kwargs)
+
+    @property
+    def connections(self):
+        """
+        Maps the connections of the host to the group members of this shard.
+        """
+        if self._connections is None:
+            self._connections = {
+                node.shards[self.shard]: connection
+                for node, connection in self.host.connections.iteritems()
+                if isinstance(node, ShardedRaftReplica)
+            }
+        return self._connections
+
+    @property
+    def preferred(self):
+        """
+        Returns True if this replica is the preferred leader for the shard,
+        assigned round robin to the replicas in the group by id.
+        """
+        members = sorted(node.id for node in self.quorum())
+        return members[self.shard % len(members)] == self.id
+
+    def run(self):
+        """
+        Splits the election timeout range so that preferred leaders time out
+        first, then implements the Raft consensus protocol.
+        """
+        low, high = self.election_timeout
+        split = low + (high - low) / 2
+        self.timeout.delay = [low, split] if self.preferred else [split, high]
+
+        for event in super(RaftGroup, self).run():
+            yield event
+
+    def on_state_change(self):
+        """
+        Records the leadership of the shard when this member becomes leader.
+        """
+        super(RaftGroup, self).on_state_change()
+
+        if self.state == State.LEADER:
+            self.sim.results.update(
+                'shard leader', (self.id, self.shard, self.env.now)
+            )
+
+    def on_ae_response_rpc(self, msg):
+        """
+        Tracks the commit latency of entries committed in this shard.
+        """
+        commitIndex = self.log.commitIndex
+        super(RaftGroup, self).on_ae_response_rpc(msg)
+
+        for idx in xrange(commitIndex + 1, self.log.commitIndex + 1):
+            version = self.log[idx].version
+            if version is None: continue
+
+            self.sim.results.update(
+                'shard commit latency', (
+                    self.id, self.shard, str(version),
+                    version.created, self.env.now
+                )
+            )
+
+    def __str__(self):
+        return "{} shard {}".format(self.host, self.shard)
+
+
+##########################################################################
+## Sharded Raft Replica
+##########################################################################
+
+class ShardedRaftReplica(ConsensusReplica):
+    """
+    A replica server that hosts a member of each shard's Raft group and
+    routes reads and writes to the group that replicates the object.
+    """
+
+    def __init__(self, simulation, **kwargs):
+        super(ShardedRaftReplica, self).__init__(simulation, **kwargs)
+
+        self.n_shards  = kwargs.get('num_shards', NUM_SHARDS)
+        self.partition = kwargs.get('shard_partition', SHARD_PARTITION)
+
+        if self.partition not in ('hash', 'range'):
+            raise ImproperlyConfigured(
+                "'{}' is not a valid shard partition, use hash or range".format(
+                    self.partition
+                )
+            )
+
+        # The sorted object namespace, computed on the first range lookup.
+        self.namespace = None
+
+        # Groups share the identity and location of the host.
+        kwargs.update({
+            'id': self.id, 'label': self.label,
+            'location': self.location, 'consistency': self.consistency,
+            'election_timeout': kwargs.get('election_timeout', ELECTION_TIMEOUT),
+        })
+
+        self.shards = [
+            RaftGroup(simulation, self, shard, **kwargs)
+            for shard in xrange(self.n_shards)
+        ]
+
+    @property
+    def log(self):
+        """
+        Returns the concatenation of the shard logs (for validation).
+        """
+        log = MultiObjectWriteLog()
+        for group in self.shards:
+            for entry in group.log[1:]:
+                log.append(*entry)
+        return log
+
+    def get_namespace(self):
+        """
+        Returns the object namespace of the workload in the order that names
+        are generated (by length, then alphabetically). The namespace is empty
+        if it is not known up front, e.g. when accesses are read from traces.
+        """
+        if self.namespace is None:
+            objects = set()
+            workload = getattr(self.sim, 'workload', None)
+            if isinstance(workload, WorkloadCollection):
+                for user in workload:
+                    objects.update(user.objects)
+
+            self.namespace = sorted((len(obj), obj) for obj in objects)
+        return self.namespace
+
+    def shard_for(self, name):
+        """
+        Returns the shard of the object with the given name, partitioned
+        either by a stable hash of the name or by contiguous, equally sized
+        ranges of the sorted object namespace. Range partitioning falls back
+        to hashing if the namespace has fewer objects than shards.
+        """
+        if self.partition == 'range':
+            namespace = self.get_namespace()
+            if len(namespace) >= self.n_shards:
+                idx = bisect_left(namespace, (len(name), name))
+                return min(idx * self.n_shards / len(namespace), self.n_shards - 1)
+
+        return (zlib.crc32(name) & 0xffffffff) % self.n_shards
+
+    def read(self, name, **kwargs):
+        """
+        Reads the object from the Raft group of its shard.
+        """
+        shard = self.shard_for(getattr(name, 'name', name))
+        return self.shards[shard].read(name, **kwargs)
+
+    def write(self, name, **kwargs):
+        """
+        Writes the object to the Raft group of its shard.
+        """
+        shard = self.shard_for(getattr(name, 'name', name))
+        return self.shards[shard].write(name, **kwargs)
@@ -29,8 +29,10 @@ from cloudscope.utils.enums import Enum
 from .base import ConsensusReplica
 from .election import Election
 
+from itertools import chain
 from collections import defaultdict
 from collections import namedtuple
+from collections import OrderedDict
 from functools import partial
 
 ##########################################################################
@@ -41,12 +43,15 @@ from functools import partial
 SESSION_TIMEOUT    = settings.simulation.session_timeout
 HEARTBEAT_INTERVAL = settings.simulation.heartbeat_interval
 
+## Tag acquisition
+TAG_BATCH_SIZE     = settings.simulation.tag_batch_size
+
 ## RPC Messages
 ## NOTE: tag should be a data structure of {objects: {index, epoch, commit}}
 ## NOTE: index, epoch, commit are meaningful in different RPC contexts
 
 RequestTag     = namedtuple('RequestTag', 'epoch, tag, candidate')
-TagResponse    = namedtuple('TagResponse', 'epoch, accept')
+TagResponse    = namedtuple('TagResponse', 'epoch, accept, denied')
 AppendEntries  = namedtuple('AppendEntries', 'epoch, owner, tag, entries')
 AEResponse     = namedtuple('AEResponse', 'epoch, success, tag, reason')
 RemoteAccess   = namedtuple('RemoteAccess', 'epoch, access')
@@ -72,14 +77,29 @@ class TagReplica(ConsensusReplica):
         self.session   = None
         self.heartbeat = None
 
+        ## Batched tag acquisition of the predicted working set
+        self.tag_batch_size = kwargs.get('tag_batch_size', TAG_BATCH_SIZE)
+        self.working_set    = kwargs.get('working_set', [])
+        self.recent         = OrderedDict()
+        self.denied         = None
+        self.blocked        = {}          # denied objects -> owner, until it sends entries
+        self.tag_started    = None
+        self.prefetched     = set()       # objects granted ahead of an access
+
+        ## Accesses waiting on ownership: object -> [(access, queued)]
+        self.pending        = defaultdict(list)
+
         ## Initialze the tag specific settings
         self.epoch  = 0
         self.log    = defaultdict(WriteLog)
-        self.view   = defaultdict(set)
+        self.view   = defaultdict(set)    # owner -> objects
+        self.owners = {}                  # object -> owner
 
-        ## Owner state
+        ## Owner state, keyed by (follower, object)
         self.nextIndex  = None
         self.matchIndex = None
+        self.behind     = None            # follower -> objects with entries to send
+        self.tracked    = None            # objects with replication state
 
         ## Initialize the replica
         super(TagReplica, self).__init__(simulation, **kwargs)
@@ -108,13 +128,17 @@ class TagReplica(ConsensusReplica):
         access = super(TagReplica, self).read(name, **kwargs)
 
         # Record the number of attempts for the access
-        if access.is_local_to(self): access.attempts += 1
+        if access.is_local_to(self):
+            access.attempts += 1
+            self.touch(access.name)
 
         # Increase the session on access.
         self.handle_session()
 
         # Are we the owner of this tag?
         if self.owns(access.name):
+            self.record_prefetch(access)
+
             # TODO: Change to last commit!
             version = self.log[access.name].lastVersion
 
@@ -142,14 +166,8 @@ class TagReplica(ConsensusReplica):
             # Log the access from this particular replica.
             access.log(self)
 
-            # We're going to have some read latency, retry the read.
-            retry = Timer(
-                self.env, self.heartbeat_interval, lambda: self.read(access)
-            ).start()
-
-            if access.attempts <= 1 and self.state != State.TAGGING:
-                # Request the ownership of the tag
-                self.acquire(access.name)
+            # We're going to have some read latency, wait for ownership.
+            self.enqueue(access)
 
         return access
 
@@ -181,6 +199,7 @@ class TagReplica(ConsensusReplica):
         if access.is_local_to(self):
             # Record the number of attempts for the access
             access.attempts += 1
+            self.touch(access.name)
 
             # Fetch the latest version from the log.
             latest = self.log[access.name].lastVersion
@@ -209,8 +228,13 @@ class TagReplica(ConsensusReplica):
 
         # Are we the owner of this tag?
         if self.owns(access.name):
+            self.record_prefetch(access)
+
             # Perform the append entries
             self.log[name].append(version, self.epoch)
+            for node in self.behind:
+                self.behind[node].add(access.name)
+
             # Update the version to track visibility latency
             version.update(self)
 
@@ -236,20 +260,17 @@ class TagReplica(ConsensusReplica):
 
         # We're going to acquire the tag!
         else:
-            # We're going to have some write latency, retry the write.
-            retry = Timer(
-                self.env, self.heartbeat_interval, lambda: self.write(access)
-            ).start()
-
-            # Request the ownership of the tag
-            self.acquire(access.name)
+            # We're going to have some write latency, wait for ownership.
+            self.enqueue(access)
 
         return access
 
     def run(self):
         """
         We have to check in at every heartbeat interval. If we own a tag then
-        send a heartbeat message, otherwise just keep quiescing.
+        send a heartbeat message, otherwise just keep quiescing. Accesses that
+        are still waiting on unowned objects are retried at the check in,
+        including denied objects whose owner has not sent append entries.
         """
         while True:
             if self.state == State.OWNER:
@@ -260,6 +281,10 @@ class TagReplica(ConsensusReplica):
             else:
                 yield self.env.timeout(self.heartbeat_interval)
 
+            if self.pending and self.state != State.TAGGING:
+                self.blocked.clear()
+                self.service()
+
     ######################################################################
     ## Helper Methods
     ######################################################################
@@ -268,17 +293,54 @@ class TagReplica(ConsensusReplica):
         """
         Returns True if the name is in the current view for that owner.
         """
-        return name in self.view[self]
+        return self.owners.get(name) is self
 
     def find_owner(self, name):
         """
         Looks up the owner of the name in the current view.
         Returns None if there is no owner fo the tag.
         """
-        for owner, tag in self.view.items():
-            if name in tag:
-                return owner
-        return None
+        return self.owners.get(name)
+
+    def update_view(self, owner, tag):
+        """
+        Sets the objects owned by the owner in the current view, updating the
+        object to owner index only for the objects that have changed.
+        """
+        tag = set(tag)
+        current = self.view[owner]
+
+        for obj in current - tag:
+            if self.owners.get(obj) is owner:
+                del self.owners[obj]
+
+        for obj in tag - current:
+            self.owners[obj] = owner
+
+        self.view[owner] = tag
+
+    def touch(self, name):
+        """
+        Tracks the most recently accessed objects to predict the working set.
+        """
+        self.recent.pop(name, None)
+        self.recent[name] = True
+
+        while len(self.recent) > self.tag_batch_size:
+            self.recent.popitem(last=False)
+
+    def predict_tag(self, name):
+        """
+        Returns the objects to request along with the name in a single tag
+        acquisition: the declared working set then the most recently accessed
+        objects, up to the batch size, that no other replica owns.
+        """
+        tag = {name}
+        for obj in chain(self.working_set, reversed(self.recent)):
+            if len(tag) >= self.tag_batch_size: break
+            if self.find_owner(obj) is None and obj not in self.blocked:
+                tag.add(obj)
+        return tag
 
     def acquire(self, tag):
         """
@@ -321,6 +383,51 @@ class TagReplica(ConsensusReplica):
             "{} is atempting to release tag {}".format(self, tag)
         )
 
+    def enqueue(self, access):
+        """
+        Queues the access until its object has an owner and requests the tag
+        for the object, extending the tag request in flight if necessary.
+        Objects denied to us are not requested until their owner sends us
+        append entries.
+        """
+        self.pending[access.name].append((access, self.env.now))
+        if access.name in self.blocked: return
+
+        tag = self.predict_tag(access.name)
+        if self.state != State.TAGGING:
+            self.acquire(tag)
+        elif access.name not in self.tag:
+            self.acquire(self.tag | tag)
+
+    def service(self, names=None):
+        """
+        Retries the pending accesses of the given objects (or all pending
+        objects) that now have an owner, when ownership changes. The accesses
+        of objects that still have no owner keep waiting and their objects
+        are requested in a single tag acquisition (unless they were denied).
+        """
+        if names is None: names = self.pending.keys()
+        unowned = set()
+
+        for name in names:
+            if self.find_owner(name) is None:
+                if name not in self.blocked: unowned.add(name)
+                continue
+
+            for access, queued in self.pending.pop(name):
+                self.sim.results.update(
+                    'pending access', (self.id, access.type, queued, self.env.now)
+                )
+
+                # Retry the access, which will complete or drop it.
+                if access.type == 'read':
+                    self.read(access)
+                else:
+                    self.write(access)
+
+        if unowned and self.state != State.TAGGING:
+            self.acquire(unowned)
+
     def handle_session(self):
         """
         Starts a session timer if one isn't running, otherwise resets the
@@ -350,10 +457,42 @@ class TagReplica(ConsensusReplica):
             ) for obj in tag
         }
 
+    def record_acquisition(self, granted):
+        """
+        Records the number of objects requested and granted beyond the ones
+        already owned for a tag acquisition (e.g. not for tag releases).
+        """
+        requested = self.tag - self.view[self]
+        if not requested: return
+
+        self.sim.results.update(
+            'tag acquisition', (
+                self.id, len(requested), len(granted - self.view[self]),
+                self.tag_started, self.env.now
+            )
+        )
+
+    def record_prefetch(self, access):
+        """
+        Records a local access served by an object that was granted ahead of
+        any access to it, e.g. an acquisition round trip saved by batching.
+        """
+        if not access.is_local_to(self): return
+        if access.name not in self.prefetched: return
+
+        self.prefetched.discard(access.name)
+        self.sim.results.update(
+            'prefetched access', (self.id, access.type, self.env.now)
+        )
+
     def send_tag_request(self, tag):
         """
         Broadcasts a tag request for the passed in tag.
         """
+        # Track when the acquisition started (over retries)
+        if self.state != State.TAGGING:
+            self.tag_started = self.env.now
+
         # Change state to tagging and save tag locally
         self.state = State.TAGGING
         self.tag = tag
@@ -380,8 +519,11 @@ class TagReplica(ConsensusReplica):
         if not self.state == State.OWNER:
             return
 
+        # The tag state of followers that are caught up is shared by all.
+        current = self.get_log_state(self.view[self])
+
         # Go through follower list.
-        for node, objs in self.nextIndex.iteritems():
+        for node, behind in self.behind.iteritems():
             # Filter based on the target supplied.
             if target is not None and node != target:
                 continue
@@ -389,9 +531,14 @@ class TagReplica(ConsensusReplica):
             # Construct the entries, or empty for heartbeat
             # The tag contains the state of each item to be sent
             entries = defaultdict(list)
-            tag = defaultdict(LogState)
+            tag = current
+
+            if behind:
+                tag = dict(current)
+
+            for obj in behind:
+                nidx = self.nextIndex[(node, obj)]
 
-            for obj, nidx in objs.items():
                 # A rule directly from the Raft paper
                 if self.log[obj].lastApplied >= nidx:
                     entries[obj] = self.log[obj][nidx:]
@@ -428,6 +575,8 @@ class TagReplica(ConsensusReplica):
             # Remove owner state
             self.nextIndex  = None
             self.matchIndex = None
+            self.behind     = None
+            self.tracked    = None
 
             # Also interrupt the heartbeat
             if self.heartbeat: self.heartbeat.stop()
@@ -439,25 +588,34 @@ class TagReplica(ConsensusReplica):
             # Create election and vote for self
             self.votes = Election([node.id for node in self.quorum()])
             self.votes.vote(self.id)
+            self.denied = {}
 
             # Also interrupt the heartbeat
             if self.heartbeat: self.heartbeat.stop()
 
         elif self.state == State.OWNER:
 
-            # Create the next index and match index
-            self.nextIndex = {
-                node: {
-                    obj: self.log[obj].lastApplied + 1
-                    for obj in self.view[self]
-                } for node in self.neighbors()
-            }
+            # Create the next index and match index if we weren't the owner
+            if self.nextIndex is None:
+                self.nextIndex  = {}
+                self.matchIndex = {}
+                self.behind     = {node: set() for node in self.neighbors()}
+                self.tracked    = set()
+
+            # Only update the state of objects acquired or released.
+            acquired = self.view[self] - self.tracked
+            released = self.tracked - self.view[self]
+            self.tracked = set(self.view[self])
+
+            for node, behind in self.behind.iteritems():
+                for obj in acquired:
+                    self.nextIndex[(node, obj)] = self.log[obj].lastApplied + 1
+                    self.matchIndex[(node, obj)] = 0
 
-            self.matchIndex = {
-                node: {
-                    obj: 0 for obj in self.view[self]
-                } for node in self.neighbors()
-            }
+                for obj in released:
+                    del self.nextIndex[(node, obj)]
+                    del self.matchIndex[(node, obj)]
+                    behind.discard(obj)
 
         else:
             raise SimulationException(
@@ -498,32 +656,28 @@ class TagReplica(ConsensusReplica):
         Respond to a request for a tag acquisition from a server.
         """
         rpc = msg.value
-        accept = True
+        tag = rpc.tag[rpc.candidate.id]
 
         # The requested epoch must be less than or greater than local.
-        if rpc.epoch < self.epoch: accept = False
+        accept = rpc.epoch >= self.epoch
 
-        # Ensure that no one else owns the tag in your current view.
-        for candidate, tagset in rpc.tag.items():
-            # Short circuit
-            if not accept: break
-
-            for tag in tagset:
-                owner = self.find_owner(tag)
-                if owner is not None and owner.id != candidate:
-                    accept = False
-                    break
+        # Deny the objects in the tag that someone else owns in our view,
+        # the candidate is only granted the rest of the tag.
+        denied = {
+            obj: self.find_owner(obj) for obj in tag
+            if self.find_owner(obj) not in (None, rpc.candidate)
+        } if accept else {}
 
         # Log the vote decision
         amsg = "accepted" if accept else "did not accept"
         lmsg = "{} {} tag [{}] for {}".format(
-            self, amsg, ",".join(rpc.tag[rpc.candidate.id]), rpc.candidate.id
+            self, amsg, ",".join(tag.difference(denied)), rpc.candidate.id
         )
         self.sim.logger.info(lmsg)
 
         # Send the vote response back to the tag requester
         return self.send(
-            msg.source, TagResponse(self.epoch, accept)
+            msg.source, TagResponse(self.epoch, accept, denied)
         )
 
     def on_tag_response_rpc(self, msg):
@@ -548,12 +702,25 @@ class TagReplica(ConsensusReplica):
 
             # Update the current election
             self.votes.vote(msg.source.id, rpc.accept)
+            if rpc.accept: self.denied.update(rpc.denied)
+
             if self.votes.has_passed():
 
+                # Objects denied by any of the majority are not granted, and
+                # are not requested again until their owner sends entries.
+                granted = frozenset(self.tag.difference(self.denied))
+                self.blocked.update(self.denied)
+                self.record_acquisition(granted)
+
+                # Track the objects granted without an access waiting on them.
+                self.prefetched |= granted - self.view[self] - set(self.pending)
+                self.prefetched &= granted
+
                 # Update our local tag and become owner.
+                self.tag = granted
+                self.update_view(self, self.tag)
                 if self.tag:
                     self.state = State.OWNER
-                    self.view[self] = set(self.tag)
                 else:
                     self.state = State.READY
 
@@ -565,6 +732,9 @@ class TagReplica(ConsensusReplica):
                     "{} tag goes to: {}".format(self, self.view[self])
                 )
 
+                # Service the accesses waiting on the ownership change
+                if self.pending: self.service()
+
                 # Record tag length over time
                 self.sim.results.update(
                     'tag size', (self.id, self.env.now, len(self.view[self]))
@@ -601,7 +771,21 @@ class TagReplica(ConsensusReplica):
 
         # Update the view to match the view of the append entries
         # Update the epoch to match the rpc of the append entries
-        self.view[msg.source] = set(rpc.tag.keys())
+        self.update_view(msg.source, rpc.tag.keys())
+
+        # Objects denied to us for the source can be requested again
+        released = [
+            obj for obj, owner in self.blocked.items() if owner is msg.source
+        ]
+        for obj in released:
+            del self.blocked[obj]
+
+        # Service the accesses waiting on objects owned by the source
+        if self.pending:
+            self.service([
+                name for name in self.pending
+                if name in rpc.tag or name in released
+            ])
         if self.epoch < rpc.epoch:
             self.epoch = rpc.epoch
 
@@ -639,27 +823,26 @@ class TagReplica(ConsensusReplica):
                 continue
 
             # At this point the entries are accepted because of continue statements
-            if entries:
-                if objlog.lastApplied >= prev.index:
+            index = prev.index
+            for entry in entries:
+                index += 1
+
+                # Entries may be resent by heartbeats, skip those already in the log.
+                if index <= objlog.lastApplied:
+                    if objlog[index].term == entry.term:
+                        continue
+
                     # If existing entry conflicts with a new one (same index, different epochs)
                     # Delete the existing entry and all that follow it.
-                    if objlog[prev.index].term != prev.epoch:
-                        objlog.truncate(prev.index)
+                    objlog.truncate(index)
 
-                if objlog.lastApplied > prev.index:
-                    # Better look into what's happening here!
-                    raise TagRPCException(
-                        "{} is possibly receiving duplicate append entries".format(self)
-                    )
+                # Add the entry/epoch to the log
+                objlog.append(*entry)
 
-                # Append any new entries not already in the log.
-                for entry in entries:
-                    # Add the entry/epoch to the log
-                    objlog.append(*entry)
-
-                    # Update the versions to compute visibilities
-                    entry[0].update(self)
+                # Update the versions to compute visibilities
+                entry[0].update(self)
 
+            if entries:
                 # Log the last write from the append entries
                 self.sim.logger.debug(
                     "appending {} entries to {} log on {} (term {}, commit {})".format(
@@ -690,10 +873,20 @@ class TagReplica(ConsensusReplica):
         if self.state == State.OWNER:
 
             # Update state of followers in the tag group
+            behind = self.behind[msg.source]
             for obj, success in rpc.success.items():
+                # Ignore responses for objects we no longer own
+                if obj not in self.tracked: continue
+                key = (msg.source, obj)
+
                 if success:
-                    self.nextIndex[msg.source][obj] = rpc.tag[obj].index + 1
-                    self.matchIndex[msg.source][obj] = rpc.tag[obj].index
+                    self.nextIndex[key] = rpc.tag[obj].index + 1
+                    self.matchIndex[key] = rpc.tag[obj].index
+
+                    if self.nextIndex[key] > self.log[obj].lastApplied:
+                        behind.discard(obj)
+                    else:
+                        behind.add(obj)
 
                 else:
                     # If the epoch is not the same, update accordingly.
@@ -705,8 +898,11 @@ class TagReplica(ConsensusReplica):
                         retry = True
 
                     # Otherwise decrement the next index and to retry
+                    # Floor the next index to the last match (at least 1).
                     elif rpc.reason == Reason.LOG:
-                        self.nextIndex[msg.source][obj] -= 1
+                        nidx = min(self.nextIndex[key] - 1, rpc.tag[obj].index + 1)
+                        self.nextIndex[key] = max(nidx, self.matchIndex[key] + 1)
+                        behind.add(obj)
                         retry = True
 
                     else:
@@ -716,12 +912,13 @@ class TagReplica(ConsensusReplica):
 
             # Determine if we can commit the entry
             for obj, state in rpc.tag.items():
+                if obj not in self.tracked: continue
+
                 log = self.log[obj]
                 for n in xrange(log.lastApplied, log.commitIndex, -1):
-                    commit = Election(self.matchIndex.keys())
-                    for node, objs in self.matchIndex.items():
-                        match = objs[obj]
-                        commit.vote(node, match >= n)
+                    commit = Election(self.behind.keys())
+                    for node in self.behind:
+                        commit.vote(node, self.matchIndex[(node, obj)] >= n)
 
                     if commit.has_passed() and log[n].term == self.epoch:
                         # Commit all versions from the last log to now.
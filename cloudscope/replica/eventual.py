@@ -47,7 +47,7 @@ mechanism rather than any remote reads/writes.
 
 import random
 
-from .base import Replica
+from .base import Replica, AntiEntropy, RumorTermination
 from .store import namespace
 from .store import MultiObjectWriteLog
 
@@ -55,6 +55,7 @@ from cloudscope.config import settings
 from cloudscope.simulation.timer import Timer
 from cloudscope.exceptions import AccessError
 
+from collections import Counter
 from collections import defaultdict
 from collections import namedtuple
 
@@ -65,6 +66,9 @@ from collections import namedtuple
 ## Fetch simulation settings from defaults
 AE_DELAY    = settings.simulation.anti_entropy_delay
 NEIGHBORS   = settings.simulation.num_neighbors
+AE_MODE     = settings.simulation.anti_entropy_mode
+TERMINATION = settings.simulation.rumor_termination
+RUMOR_LIMIT = settings.simulation.rumor_limit
 
 # Deprecated
 DO_GOSSIP   = settings.simulation.do_gossip
@@ -74,7 +78,11 @@ DO_RUMORING = settings.simulation.do_rumoring
 Gossip   = namedtuple('Gossip', 'entries, length')
 GossipResponse = namedtuple('GossipResponse', 'entries, length, success')
 Rumor    = namedtuple('Rumor', 'access')
-RumorResponse  = namedtuple('RumorResponse', 'access, success')
+RumorResponse  = namedtuple('RumorResponse', 'access, success, current')
+Digest   = namedtuple('Digest', 'versions, length')
+DigestResponse = namedtuple('DigestResponse', 'entries, length, wanted')
+Delta    = namedtuple('Delta', 'entries, length, index, since')
+DeltaResponse  = namedtuple('DeltaResponse', 'entries, length, index, head')
 
 ##########################################################################
 ## Eventual Replica
@@ -88,6 +96,9 @@ class EventualReplica(Replica):
         # Eventually consistent settings
         self.ae_delay    = kwargs.get('anti_entropy_delay', AE_DELAY)
         self.n_neighbors = kwargs.get('num_neighbors', NEIGHBORS)
+        self.ae_mode     = AntiEntropy.get(kwargs.get('anti_entropy_mode', AE_MODE))
+        self.termination = RumorTermination.get(kwargs.get('rumor_termination', TERMINATION))
+        self.rumor_limit = kwargs.get('rumor_limit', RUMOR_LIMIT)
 
         # Deprecated
         self.do_gossip   = kwargs.get('do_gossip', DO_GOSSIP)
@@ -95,6 +106,13 @@ class EventualReplica(Replica):
 
         self.log         = MultiObjectWriteLog() # the write log of the replica
         self.timeout     = None                  # anti entropy timer
+        self.watermarks  = {}                    # log index synchronized per neighbor
+        self.outstanding = {}                    # log index sent per neighbor, not acked
+        self.pulled      = {}                    # neighbor log index received per neighbor
+        self.heads       = {}                    # log index reported as our head per neighbor
+        self.sources     = {}                    # neighbor the latest version was received from per object
+        self.hot         = {}                    # feedback count of versions being rumored
+        self.rumored     = Counter()             # rumor messages sent per version
 
     ######################################################################
     ## Properties
@@ -144,8 +162,9 @@ class EventualReplica(Replica):
 
         1. append the write to the log as (version, id)
         2. cache the latest access for gossip or rumoring
-        3. update the version for visibility latency
-        4. call the rumor handler
+        3. stop rumoring the version superseded by the write
+        4. update the version for visibility latency
+        5. call the rumor handler
 
         Note this method can raise an error if not writing the latest version.
         """
@@ -168,6 +187,7 @@ class EventualReplica(Replica):
 
             # Update the access with the latest version and complete
             access.update(version, completed=True)
+            previous = latest
 
         else:
 
@@ -186,10 +206,16 @@ class EventualReplica(Replica):
                 raise AccessError(
                     "Attempting unordered write of {} after write of {}".format(version, current)
                 )
+            previous = current
 
         # At this point we've dealt with local vs. remote
         # Append the latest version to the local data store
         self.log.append(version, 0)
+        self.sources.pop(access.name, None)
+
+        # Stop spreading the rumor of the version this write supersedes
+        if previous in self.hot:
+            self.remove_rumor(previous)
 
         # Handle the access according to eventual rules
         version.update(self) # Update the version to track visibility latency
@@ -216,34 +242,166 @@ class EventualReplica(Replica):
         exchanging information about the state of the latest objects in the
         cache since the last anti-entropy delay.
 
+        In digest mode only the versions of the latest objects are sent to
+        eventual neighbors, who respond with the entries that differ. In delta
+        mode only the objects written since the last synchronized log index
+        of the neighbor are sent.
+
         TODO: how to gossip to strong consistency nodes?
         """
         # If gossiping is not allowed, forget about it.
         if not self.do_gossip:
             return
 
+        latest = self.log.get_latest_versions()
+
         # Perform pairwise anti-entropy sessions with n_neighbors
         for target in self.get_anti_entropy_neighbors():
-            # Send the latest version of ALL objects.
-            entries = [
-                self.log.get_latest_version(name).access
-                for name in self.log.namespace
-            ]
-            gossip  = Gossip(tuple(entries), len(entries))
-            self.send(target, gossip)
+            if not isinstance(target, EventualReplica):
+                mode = AntiEntropy.FULL
+            else:
+                mode = self.ae_mode
+
+            if mode == AntiEntropy.DIGEST:
+                # Send the digest of the latest versions of ALL objects.
+                digest = tuple(latest.itervalues())
+                self.send(target, Digest(digest, len(digest)))
+                self.record_anti_entropy(0, len(digest))
+
+            elif mode == AntiEntropy.DELTA:
+                # Send the latest versions of objects since the watermark.
+                self.send_delta(target, latest)
+
+            else:
+                # Send the latest version of ALL objects.
+                entries = tuple(version.access for version in latest.itervalues())
+                self.send(target, Gossip(entries, len(entries)))
+                self.record_anti_entropy(len(entries))
+
+    def send_delta(self, target, latest):
+        """
+        Sends the latest versions of the objects written since the log index
+        last synchronized with the target, along with the index of the
+        target's log that we have already received so that it can respond
+        with only its own new writes. If the previous delta was never
+        acknowledged (e.g. dropped during a partition), falls back to a full
+        exchange of the latest versions of all objects. Versions received from
+        the target are not sent back to it.
+        """
+        if target in self.outstanding:
+            del self.outstanding[target]
+            self.watermarks.pop(target, None)
+            self.pulled.pop(target, None)
+
+        index = self.log.lastApplied
+        watermark = self.watermarks.get(target)
+
+        if watermark is not None:
+            latest = self.log.get_latest_versions(after=watermark)
+
+        entries = tuple(
+            version.access for name, version in latest.iteritems()
+            if self.sources.get(name) is not target
+        )
+        self.send(
+            target, Delta(entries, len(entries), index, self.pulled.get(target))
+        )
+        self.record_anti_entropy(len(entries))
+
+        self.outstanding[target] = index
+
+    def rewind_watermarks(self, index):
+        """
+        Shifts the neighbor watermarks and the heads reported to neighbors
+        after the entry at the given index has been removed from the log, so
+        that no later entries are skipped.
+        """
+        for marks in (self.watermarks, self.outstanding, self.heads):
+            for target, mark in marks.items():
+                if mark >= index: marks[target] = mark - 1
+
+    def reconcile(self, entries, source=None):
+        """
+        Writes all entries that are later than our current versions and
+        returns the accesses of the current versions that are later than the
+        entries (e.g. the remote is behind us). The source of the entries is
+        remembered so that deltas do not send them back.
+        """
+        updates = []
+
+        # Go through the entries from the RPC and update log
+        for access in entries:
+            # Get the latest version from the log then update with forte
+            current = self.log.get_latest_version(access.name)
+            current = self.update_forte_children(current, access.version)
+
+            # If the access is greater than our current version, write it!
+            if current is None or access.version > current:
+                self.write(access)
+                self.sources[access.name] = source
+
+            # Is the the remote behind us? If so, send the latest version!
+            elif access.version < current:
+                updates.append(current.access)
+
+        return updates
 
     def rumor(self, access):
         """
-        Performs on access rumor mongering
+        Performs on access rumor mongering: the version becomes a hot rumor
+        and is sent to n neighbors. Every response keeps the rumor spreading
+        to another neighbor until the replica loses interest in it.
         """
         # if rumoring is not allowed, forget about it.
         if not self.do_rumoring:
             return
 
         # Send the access to n other neighbors (excluding the origin)
+        self.hot[access.version] = 0
         for target in self.get_anti_entropy_neighbors():
-            rumor = Rumor(access)
-            self.send(target, rumor)
+            self.send_rumor(target, access)
+
+    def send_rumor(self, target, access):
+        """
+        Sends the rumor of the access to the target, counting the messages.
+        """
+        self.send(target, Rumor(access))
+        self.rumored[access.version] += 1
+
+    def lose_interest(self, version):
+        """
+        Implements the rumor termination policy when a rumor is sent to a
+        replica that already knew it. Returns True if the rumor is removed.
+        """
+        if self.termination == RumorTermination.COIN:
+            return random.random() < 1.0 / self.rumor_limit
+
+        self.hot[version] += 1
+        return self.hot[version] >= self.rumor_limit
+
+    def remove_rumor(self, version):
+        """
+        Stops spreading the rumor and records the messages sent for it.
+        """
+        del self.hot[version]
+        self.sim.results.update(
+            'rumor', (
+                self.id, str(version), version.created, self.env.now,
+                self.rumored.pop(version, 0)
+            )
+        )
+
+    def record_anti_entropy(self, entries, digest=0, wanted=0):
+        """
+        Records the number of entries, digest versions and wanted versions
+        (requested by a digest response) sent in a message of an
+        anti-entropy session.
+        """
+        self.sim.results.update(
+            'anti entropy', (
+                self.id, self.ae_mode.value, entries, digest, wanted, self.env.now
+            )
+        )
 
     def get_anti_entropy_timeout(self):
         """
@@ -269,9 +427,9 @@ class EventualReplica(Replica):
 
     def update_forte_children(self, current, remote):
         """
-        This unfortunately named method is a recursive function that updates
-        all the children of the remote version with the new forte number and
-        returns the newly correct current version.
+        This unfortunately named method updates all the children of the
+        remote version with the new forte number and returns the newly
+        correct current version.
 
         The idea here is that if the current version has a lower forte number
         then we should update the children of the remote (higher forte) in
@@ -279,25 +437,6 @@ class EventualReplica(Replica):
 
         This method provides backpressure from Raft to Eventual.
         """
-
-        def update_forte(forte, version, current):
-            """
-            Recursive update the forte number for a particular version.
-            """
-            # Update all the version's children with its forte number.
-            for child in version.children:
-                # Only update children that are in the current log.
-                if child in self.log:
-                    # Update child forte to parent and detect current
-                    child.forte = forte
-                    if child > current: current = child
-
-                # Recurse on grandchildren
-                current = update_forte(forte, child, current)
-
-            # Return the maximal version (using forte numbers) discovered.
-            return current
-
         # This function only needs be called if we're in federated versioning.
         if settings.simulation.versioning != "federated":
             return current
@@ -307,19 +446,15 @@ class EventualReplica(Replica):
 
         # Check the forte number on the remote and update the children.
         if remote.forte > current.forte:
-            strong = update_forte(remote.forte, remote, current)
+            strong = remote.propagate_forte(current, self.log)
             if strong > current:
                 # Put the strong version at the end of the log and return it
                 # as the new current version (or latest for this object)
-                if strong in self.log:
-                    self.log.remove(strong)
-                    self.log.append(strong, strong.forte)
-                    return strong
-                else:
-                    # This really shouldn't happen?!
-                    self.sim.logger.warning(
-                        "Attempting to move {} to end when not in log!"
-                    )
+                if self.watermarks or self.outstanding or self.heads:
+                    self.rewind_watermarks(self.log.index(strong))
+                self.log.remove(strong)
+                self.log.append(strong, strong.forte)
+                return strong
 
         # Last resort, return the current version.
         return current
@@ -334,32 +469,14 @@ class EventualReplica(Replica):
         accesses (Write events) as entries. Goes through all and compares the
         versions, replying False only if there is an error or a conflict.
         """
-        entries = message.value.entries
-        updates = []
-
-        # Go through the entries from the RPC and update log
-        for access in entries:
-            # Get the latest version from the log then update with forte
-            current = self.log.get_latest_version(access.name)
-            current = self.update_forte_children(current, access.version)
-
-            # If the access is greater than our current version, write it!
-            if current is None or access.version > current:
-                self.write(access)
-
-            # Is the the remote behind us? If so, send the latest version!
-            elif access.version < current:
-                updates.append(current.access)
-
-            else:
-                # Presumably the version are equal, so do nothing.
-                continue
+        updates = self.reconcile(message.value.entries, message.source)
 
         # Success here just means whether or not we're responding with updates
         success = True if updates else False
 
         # Respond to the sender with the latest versions from our log
         self.send(message.source, GossipResponse(updates, len(updates), success))
+        self.record_anti_entropy(len(updates))
 
     def on_gossip_response_rpc(self, message):
         """
@@ -375,10 +492,116 @@ class EventualReplica(Replica):
             # This is a new version or a later version than our current.
             if current is None or access.version > current:
                 self.write(access)
+                self.sources[access.name] = message.source
+
+    def on_digest_rpc(self, message):
+        """
+        Handles the receipt of a digest of the latest versions of another
+        node. Responds with the entries where we are ahead of the remote
+        (including objects it has never seen) and the names of the objects
+        where the remote is ahead of us, so that only they are transferred.
+        """
+        latest  = self.log.get_latest_versions()
+        updates = []
+        wanted  = []
+
+        for remote in message.value.versions:
+            # Get the latest version from the log then update with forte
+            current = latest.pop(remote.name, None)
+            current = self.update_forte_children(current, remote)
+
+            # If the remote is later than our current version, request it.
+            if current is None or remote > current:
+                wanted.append(remote.name)
+
+            # Is the remote behind us? If so, send the latest version!
+            elif remote < current:
+                updates.append(current.access)
+
+        # Send all the objects that are not in the remote digest.
+        updates.extend(version.access for version in latest.itervalues())
+
+        self.send(
+            message.source,
+            DigestResponse(tuple(updates), len(updates), tuple(wanted))
+        )
+        self.record_anti_entropy(len(updates), wanted=len(wanted))
+
+    def on_digest_response_rpc(self, message):
+        """
+        Handles the response to a digest, updating entries from the responder
+        then pushing the latest versions of the objects it requested.
+        """
+        # The response entries are handled exactly like a gossip response.
+        self.on_gossip_response_rpc(message)
+
+        wanted = message.value.wanted
+        if wanted:
+            entries = tuple(
+                self.log.get_latest_version(name).access for name in wanted
+            )
+            self.send(message.source, Gossip(entries, len(entries)))
+            self.record_anti_entropy(len(entries))
+
+    def on_delta_rpc(self, message):
+        """
+        Handles the receipt of the objects written on another node since our
+        last synchronization, responding with any later versions we have, the
+        objects written here since the sender last heard from us, and the
+        index of the delta to acknowledge it.
+        """
+        delta   = message.value
+        updates = {
+            access.name: access
+            for access in self.reconcile(delta.entries, message.source)
+        }
+
+        # Add the objects written since the sender last received our log,
+        # which may have been rewound since we reported the head.
+        since = delta.since
+        if since is not None and message.source in self.heads:
+            since = min(since, self.heads[message.source])
+
+        if since is None:
+            latest = self.log.get_latest_versions()
+        else:
+            latest = self.log.get_latest_versions(after=since)
+
+        for name, version in latest.iteritems():
+            if self.sources.get(name) is not message.source:
+                updates[name] = version.access
+
+        updates = tuple(updates.itervalues())
+        self.send(
+            message.source,
+            DeltaResponse(updates, len(updates), delta.index, self.log.lastApplied)
+        )
+        self.record_anti_entropy(len(updates))
+        self.heads[message.source] = self.log.lastApplied
+
+    def on_delta_response_rpc(self, message):
+        """
+        Handles the acknowledgment of a delta, updating entries from the
+        responder and advancing the watermarks of and for the responder.
+        """
+        # The response entries are handled exactly like a gossip response.
+        self.on_gossip_response_rpc(message)
+
+        response = message.value
+        source   = message.source
+
+        # The outstanding index is rewound if our log was rewound since.
+        if source in self.outstanding:
+            index = min(response.index, self.outstanding.pop(source))
+            self.watermarks[source] = max(self.watermarks.get(source, 0), index)
+
+        self.pulled[source] = max(self.pulled.get(source, 0), response.head)
 
     def on_rumor_rpc(self, message):
         """
-        Handles the rumor message from the originator of the rumor.
+        Handles the rumor message from the originator of the rumor. Responds
+        True only if the rumor was news to us, otherwise False along with our
+        current version if it is later than the rumor.
         """
         access  = message.value.access
         current = self.log.get_latest_version(access.name)
@@ -390,29 +613,46 @@ class EventualReplica(Replica):
             self.write(access)
 
             # Respond True to the origin of the rumor
-            response = RumorResponse(None, True)
+            response = RumorResponse(access, True, None)
 
         elif access.version < current:
             # Respond False to the origin with the later version
-            response = RumorResponse(current.access, False)
+            response = RumorResponse(access, False, current.access)
 
         else:
-            # Simply acknowledge receipt
-            response = RumorResponse(None, True)
+            # We already knew the rumor
+            response = RumorResponse(access, False, None)
 
         # Send the response back to the source
         self.send(message.source, response)
 
     def on_rumor_response_rpc(self, message):
         """
-        Handles the rumor acknowledgment
+        Handles the rumor acknowledgment, applying the termination policy
+        if the target already knew the rumor, otherwise continues spreading
+        the rumor to another neighbor.
         """
         response = message.value
-        if not response.success:
+        if response.current is not None:
             # This means that a later value has come in!
-            current = self.log.get_latest_version(response.access.name)
-            current = self.update_forte_children(current, access.version)
+            remote  = response.current
+            current = self.log.get_latest_version(remote.name)
+            current = self.update_forte_children(current, remote.version)
 
             # If their response is later than our version, write it.
-            if current is None or response.access.version > current:
-                self.write(response.access)
+            if current is None or remote.version > current:
+                self.write(remote)
+
+        # Ignore responses to rumors we are no longer spreading
+        version = response.access.version
+        if version not in self.hot: return
+
+        # Stop spreading rumors that are stale or that we are not interested in
+        latest = self.log.get_latest_version(version.name)
+        if latest is not version or (not response.success and self.lose_interest(version)):
+            return self.remove_rumor(version)
+
+        # Keep spreading the hot rumor
+        neighbors = list(self.get_anti_entropy_neighbors())
+        if neighbors:
+            self.send_rumor(random.choice(neighbors), response.access)
@@ -175,9 +175,9 @@ class FederatedRaftReplica(RaftReplica):
 
     def update_forte_children(self, current, remote):
         """
-        This unfortunately named method is a recursive function that updates
-        all the children of the remote version with the new forte number and
-        returns the newly correct current version.
+        This unfortunately named method updates all the children of the
+        remote version with the new forte number and returns the newly
+        correct current version.
 
         The idea here is that if the current version has a lower forte number
         then we should update the children of the remote (higher forte) in
@@ -185,25 +185,6 @@ class FederatedRaftReplica(RaftReplica):
 
         This method provides backpressure from Raft to Eventual.
         """
-
-        def update_forte(forte, version, current):
-            """
-            Recursive update the forte number for a particular version.
-            """
-            # Update all the version's children with its forte number.
-            for child in version.children:
-                # Only update children that are in the current log.
-                if child in self.log:
-                    # Update child forte to parent and detect current
-                    child.forte = forte
-                    if child > current: current = child
-
-                # Recurse on grandchildren
-                current = update_forte(forte, child, current)
-
-            # Return the maximal version (using forte numbers) discovered.
-            return current
-
         # This function only needs be called if we're in federated versioning.
         if settings.simulation.versioning != "federated":
             return current
@@ -213,7 +194,7 @@ class FederatedRaftReplica(RaftReplica):
 
         # Check the forte number on the remote and update the children.
         if remote.forte > current.forte:
-            strong = update_forte(remote.forte, remote, current)
+            strong = remote.propagate_forte(current, self.log)
             if strong > current:
                 # Put the strong version into the cache
                 self.cache[strong.name] = strong
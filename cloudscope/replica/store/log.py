@@ -17,6 +17,7 @@ Implements a "write-ahead" log for Raft storage.
 ## Imports
 ##########################################################################
 
+from collections import Counter
 from collections import namedtuple
 
 
@@ -27,6 +28,51 @@ from collections import namedtuple
 LogEntry  = namedtuple("LogEntry", "version, term")
 NullEntry = LogEntry(None, 0)
 
+##########################################################################
+## Log View
+##########################################################################
+
+class LogView(object):
+    """
+    A read-only window onto a range of entries of a write log that does not
+    copy the underlying entries. Because logs are truncated by rebinding the
+    list of entries rather than mutating it, a view remains valid as long as
+    the log is only appended to in place (as a Raft leader's log is).
+    """
+
+    __slots__ = ('entries', 'start', 'stop')
+
+    def __init__(self, entries, start=0, stop=None):
+        self.entries = entries
+        self.start   = start
+        self.stop    = len(entries) if stop is None else stop
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in xrange(*idx.indices(len(self)))]
+
+        if idx < 0: idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError("log view index out of range")
+        return self.entries[self.start + idx]
+
+    def __iter__(self):
+        for idx in xrange(self.start, self.stop):
+            yield self.entries[idx]
+
+    def __len__(self):
+        return max(self.stop - self.start, 0)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "<LogView [{}:{}]>".format(self.start, self.stop)
+
+
 ##########################################################################
 ## Write Log
 ##########################################################################
@@ -115,6 +161,13 @@ class WriteLog(object):
         self.log = self.log[:after]
         self.lastApplied = len(self.log) - 1
 
+    def view(self, start, stop=None):
+        """
+        Returns a zero-copy view of the entries from start up to (but not
+        including) stop, or to the end of the log if stop is None.
+        """
+        return LogView(self.log, start, stop)
+
     def as_up_to_date(self, lastTerm, lastApplied):
         """
         Returns True if the log specified by its last term and last applied is
@@ -210,13 +263,43 @@ class MultiObjectWriteLog(WriteLog):
         # Keep track of the object namespace
         self.namespace = set()
 
+        # Index of the version objects (by identity) for membership checks
+        self.versions = Counter()
+
+    def insert(self, index, version, term):
+        """
+        Inserts a version at the specified index and updates the index.
+        """
+        self.versions[id(version)] += 1
+        super(MultiObjectWriteLog, self).insert(index, version, term)
+
     def append(self, version, term):
         """
         Appends a version and a term to the log.
         """
         self.namespace.add(version.name)
+        self.versions[id(version)] += 1
         super(MultiObjectWriteLog, self).append(version, term)
 
+    def remove(self, version, term=None):
+        """
+        Removes the version from the log and the membership index.
+        """
+        version = super(MultiObjectWriteLog, self).remove(version, term)
+        self.versions[id(version)] -= 1
+        if self.versions[id(version)] <= 0:
+            del self.versions[id(version)]
+        return version
+
+    def truncate(self, after=1):
+        """
+        Removes all items from the log after the index and rebuilds the index.
+        """
+        super(MultiObjectWriteLog, self).truncate(after)
+        self.versions = Counter(
+            id(entry.version) for entry in self.log if entry.version is not None
+        )
+
     def insert_before(self, ancestor, version, term):
         """
         Inserts the version and term to the log before the ancestor, which is
@@ -258,6 +341,12 @@ class MultiObjectWriteLog(WriteLog):
         # Didn't find anything so return empty list
         return []
 
+    def __contains__(self, version):
+        """
+        Constant time lookup of the version object in the log.
+        """
+        return id(version) in self.versions
+
     def get_latest_version(self, name):
         """
         Get the latest version for the name given.
@@ -265,6 +354,23 @@ class MultiObjectWriteLog(WriteLog):
         entry = self.search(name)
         return entry.version
 
+    def get_latest_versions(self, after=0):
+        """
+        Returns a dictionary of the latest version of every object in the
+        namespace, collected in a single reverse pass of the log. If after is
+        specified, only objects written after that index are returned.
+        """
+        latest = {}
+        for idx in xrange(self.lastApplied, after, -1):
+            version = self[idx].version
+            if version is not None and version.name not in latest:
+                latest[version.name] = version
+
+                # Stop early once the whole namespace has been found
+                if len(latest) == len(self.namespace): break
+
+        return latest
+
     def get_latest_commit(self, name):
         """
         Get the latest name for the commit given.
@@ -148,6 +148,8 @@ class Version(object):
         self.parent    = parent
         self.children  = []
         self.committed = False
+        self.dropped   = False # if the write that created the version is dropped
+        self.forks     = 0     # the number of children that are not dropped
         self.tag       = kwargs.get('tag', None)
 
         # This seems very tightly coupled, should we do something different?
@@ -190,6 +192,27 @@ class Version(object):
         passing the event along in the distributed system.
         """
         self._access = access
+        self.set_dropped(access.is_dropped())
+
+    def set_dropped(self, dropped=True):
+        """
+        Marks the version as dropped (or not) and updates the count of live
+        children on the parent so that fork detection is constant time. This
+        is called by the Write access that created this version on drop.
+        """
+        if dropped == self.dropped: return
+        self.dropped = dropped
+
+        if self.parent is not None:
+            self.parent.forks += -1 if dropped else 1
+
+    def on_drop(self, access):
+        """
+        Callback for a Write access that has been dropped; the version is only
+        dropped if the access is the one that created it (not a clone).
+        """
+        if getattr(self, '_access', None) is access:
+            self.set_dropped(True)
 
     def update(self, replica, commit=False, **kwargs):
         """
@@ -243,16 +266,20 @@ class Version(object):
         """
         return self.version < self.latest_version()
 
+    def staleness(self):
+        """
+        Returns the number of versions this version is behind the latest
+        global version of the object (the version staleness).
+        """
+        return self.latest_version() - self.version
+
     def is_forked(self):
         """
-        Detect if we have multiple children or not. This is a "magic" method
-        of determining if the fork exists or not ... for now. We need to make
-        this "non-magic" soon.
+        Detect if we have multiple un-dropped children or not. The number of
+        live children is maintained incrementally as children are created by
+        `nextv` and as their writes are dropped (see `set_dropped`).
         """
-        # TODO: Non-magic version of this
-        # Right now we are computing how many un-dropped children exist
-        dropped = lambda child: not child.access.is_dropped()
-        return len(filter(dropped, self.children)) > 1
+        return self.forks > 1
 
     def nextv(self, replica, **kwargs):
         """
@@ -289,6 +316,7 @@ class Version(object):
 
         # Append the next version to your children
         self.children.append(nv)
+        self.forks += 1
 
         # Detect if we've forked the write
         if self.is_forked():
@@ -426,20 +454,57 @@ class LamportScalar(object):
         return self > other
 
 
+class LamportCounter(object):
+    """
+    Maintains a Lamport scalar sequence for each replica as well as the
+    running maximum of all of the sequences. Because the per-replica counters
+    only ever increase (either by incrementing or merging a remote value) the
+    global maximum can be maintained on every change rather than computed.
+    """
+
+    def __init__(self):
+        self.replicas = defaultdict(Sequence)
+        self.value    = 0
+
+    def next(self, replica):
+        """
+        Increments the sequence for the replica and returns the next value.
+        """
+        value = self.replicas[replica].next()
+        if value > self.value: self.value = value
+        return value
+
+    def update(self, replica, value):
+        """
+        Sets the sequence for the replica to the maximum of its current value
+        and the passed in value (e.g. from a recently received version).
+        """
+        sequence = self.replicas[replica]
+        if value > sequence.value:
+            sequence.value = value
+            if value > self.value: self.value = value
+
+    def reset(self):
+        """
+        Resets all replica sequences and the running maximum.
+        """
+        self.replicas.clear()
+        self.value = 0
+
+    def __str__(self):
+        return "latest: {} ({} replicas)".format(self.value, len(self.replicas))
+
+
 class LamportVersion(Version):
     """
     A version class that makes use of Lamport scalar numbers assigned to each
     replica as version numbers, rather than a globally increasing constant.
 
-    Lamport versions are not fully implemented as the Replicas must modify
-    their counter sequence with the maximal value they've seen from all
-    messages - a task that directly modifies this class from the outside.
-
-    As such, Lamport versions are currently in use.
+    Replicas merge their counter sequence with the version value of every
+    version they receive (on update) so that the next version they write is
+    greater than any version they have seen from all messages.
     """
 
-    # TODO: Fully implement Lamport Versions by having replicas update class.
-
     @classmethod
     def new(klass, name):
         """
@@ -447,10 +512,10 @@ class LamportVersion(Version):
         resets the global counter on the object, for multi-version systems.
         """
         name = name or "foo" # Handle passing None into the new method.
-        return type(name, (klass,), {"counter": defaultdict(Sequence)})
+        return type(name, (klass,), {"counter": LamportCounter()})
 
     # Per-Replica auto-incrementing ID
-    counter = defaultdict(Sequence)
+    counter = LamportCounter()
 
     @classmethod
     def increment_version(klass, replica):
@@ -459,16 +524,14 @@ class LamportVersion(Version):
         This method takes as input the replica writing the version number so
         that subclasses can implement replica-specific versioning.
         """
-        return LamportScalar(replica.id, klass.counter[replica.id].next())
+        return LamportScalar(replica.id, klass.counter.next(replica.id))
 
     @classmethod
     def latest_version(klass):
         """
         Returns the globally latest version of all versions stored by replicas
         """
-        return max([
-            counter.value for counter in klass.counter.values()
-        ])
+        return klass.counter.value
 
     @classmethod
     def update_version(klass, replica, version):
@@ -478,9 +541,21 @@ class LamportVersion(Version):
         equal to the maximum between the current value and the version value.
         """
         # Yes, version.version.version is annoying ...
-        klass.counter[replica.id].value = max([
-            version.version.version, klass.counter[replica.id].value
-        ])
+        klass.counter.update(replica.id, version.version.version)
+
+    def staleness(self):
+        """
+        Compares the counter of the Lamport scalar to the latest counter.
+        """
+        return self.latest_version() - self.version.version
+
+    def update(self, replica, commit=False, **kwargs):
+        """
+        Replicas call this on receipt of the version, so merge the version
+        number into the replica's Lamport sequence before tracking visibility.
+        """
+        self.update_version(replica, self)
+        super(LamportVersion, self).update(replica, commit, **kwargs)
 
 
 ##########################################################################
@@ -586,6 +661,32 @@ class FederatedVersion(Version):
 
         super(FederatedVersion, self).update(replica, commit, **kwargs)
 
+    def propagate_forte(self, current, log):
+        """
+        Raises the forte number of all descendants of this version that are in
+        the log to the forte number of this version, returning the maximal
+        version (using forte numbers) discovered, starting with current.
+
+        The tree is walked iteratively (rather than recursively) so that deep
+        version chains do not hit the recursion limit, and the forte is only
+        assigned to versions whose forte number actually increases.
+        """
+        forte = self.forte
+        stack = [self]
+
+        while stack:
+            for child in stack.pop().children:
+                # Only update children that are in the log.
+                if child in log:
+                    # Update child forte to parent and detect current
+                    if child.forte < forte: child.forte = forte
+                    if child > current: current = child
+
+                # Continue on to the grandchildren
+                stack.append(child)
+
+        return current
+
     def __str__(self):
         def mkvers(item):
             vers = "{}.{}".format(item.version, item.forte)
@@ -20,14 +20,145 @@ Analysis utilities for dealing with cloudscope results.
 from operator import itemgetter
 from collections import defaultdict, Counter
 
-from cloudscope.utils.statistics import mean, median
+from cloudscope.utils.statistics import mean, median, QuantileSketch
 from cloudscope.utils.strings import snake_case
 from cloudscope.exceptions import BadValue
 from peak.util.imports import lazyModule
 
+from .sink import open_sink
+
 # Perform lazy loading of vizualiation libraries
+np  = lazyModule('numpy')
 pd  = lazyModule('pandas')
 
+##########################################################################
+## Helpers
+##########################################################################
+
+def percentiles(name, values):
+    """
+    Returns the estimated tail percentiles of the latencies in values as
+    aggregates labeled by name, e.g. "p99 read latency (ms)".
+    """
+    return tail_latencies(name, QuantileSketch(values))
+
+
+def tail_latencies(name, sketch):
+    """
+    Returns the percentiles of a quantile sketch labeled by name.
+    """
+    return {
+        "{} {} (ms)".format(label, name): value
+        for label, value in sketch.percentiles().iteritems()
+    }
+
+
+def series_values(series, key):
+    """
+    Returns the records of the series, as a DataFrame if the sink maps the
+    columns of the series and the series has a columnar handler.
+    """
+    if hasattr(series, 'frame') and hasattr(aggregator, "column_{}".format(snake_case(key))):
+        return series.frame(key)
+    return series[key]
+
+
+class GroupedSeries(object):
+    """
+    The columns of the records of a series (a list of records or a DataFrame
+    of the columns) with the integer codes of the group of each record, for
+    computing aggregates of every group at once with numpy. Sums are added
+    in the order of the records, so aggregates are identical to the sums of
+    the handlers over each group.
+    """
+
+    def __init__(self, values, by=0):
+        self.values = values
+        self.fields = {}
+
+        if by is None:
+            self.codes  = np.zeros(len(self), dtype=int)
+            self.groups = [None]
+        else:
+            self.codes, self.groups = pd.factorize(self.field(by))
+
+        self.size = len(self.groups)
+
+    def field(self, idx):
+        """
+        Returns the field of the records at the index as an array.
+        """
+        if idx not in self.fields:
+            if isinstance(self.values, pd.DataFrame):
+                values = self.values.iloc[:, idx].values
+            else:
+                values = np.asarray([value[idx] for value in self.values])
+                if values.dtype.kind in 'SU':
+                    values = np.asarray([value[idx] for value in self.values], dtype=object)
+            self.fields[idx] = values
+        return self.fields[idx]
+
+    def number(self, idx):
+        """
+        Returns the field of the records at the index as a numeric array.
+        """
+        values = self.field(idx)
+        if values.dtype == object:
+            values = values.astype(float)
+        return values
+
+    def count(self):
+        return np.bincount(self.codes, minlength=self.size)
+
+    def sum(self, values):
+        total = np.zeros(self.size, dtype=values.dtype)
+        np.add.at(total, self.codes, values)
+        return total
+
+    def mean(self, values):
+        return self.sum(values.astype(float)) / self.count()
+
+    def nunique(self, values):
+        codes, uniques = pd.factorize(values)
+        pairs = np.unique(self.codes * len(uniques) + codes)
+        return np.bincount(pairs // len(uniques), minlength=self.size)
+
+    def counts(self, values):
+        """
+        Returns a dictionary of the count of each value for every group.
+        """
+        codes, uniques = pd.factorize(values)
+        counts = np.bincount(
+            self.codes * len(uniques) + codes, minlength=self.size * len(uniques)
+        ).reshape(self.size, len(uniques))
+
+        return [
+            {value: count for value, count in zip(uniques, row) if count}
+            for row in counts.tolist()
+        ]
+
+    def percentiles(self, name, values):
+        """
+        Returns the tail percentiles of the values for every group.
+        """
+        order  = np.argsort(self.codes, kind='mergesort')
+        splits = np.cumsum(self.count())[:-1]
+
+        sketches = []
+        for group in np.split(values[order], splits):
+            sketch = QuantileSketch()
+            sketch.update_many(group)
+            sketches.append(sketch)
+
+        tails = [tail_latencies(name, sketch) for sketch in sketches]
+        return [
+            (label, [tail[label] for tail in tails]) for label in sorted(tails[0])
+        ]
+
+    def __len__(self):
+        return len(self.values)
+
+
 ##########################################################################
 ## Time Series Handlers
 ##########################################################################
@@ -67,6 +198,61 @@ class TimeSeriesAggregator(object):
         label = label or key
         return handler(label, values)
 
+    def has_handler(self, key):
+        """
+        Returns True if there is a specific handler for the key.
+        """
+        return hasattr(self, "handle_{}".format(snake_case(key)))
+
+    def group(self, key, values, by=0, label=None):
+        """
+        Aggregates the series separately for each value of the field at
+        index by (the replica by default), or for the whole series if by is
+        None, returning a dictionary of group to aggregates.
+
+        Series with a columnar handler (column_[key]) are aggregated with
+        numpy operations on the columns of the series for all groups at once,
+        other series are bucketed by group and passed to their handler.
+        """
+        label   = label or key
+        handler = "column_{}".format(snake_case(key))
+
+        if not hasattr(self, handler):
+            if self.has_handler(key):
+                return self.bucket(key, values, by, label)
+            handler = "column_default"
+
+        if not len(values): return {}
+
+        series  = GroupedSeries(values, by)
+        columns = getattr(self, handler)(label, series)
+
+        result = {group: {} for group in series.groups}
+        for name, values in columns:
+            for group, value in zip(series.groups, list(values)):
+                result[group][name] = value.tolist() if hasattr(value, 'tolist') else value
+        return result
+
+    def bucket(self, key, values, by=0, label=None):
+        """
+        Aggregates the series per group by bucketing the records of the
+        series by group and passing each bucket to the handler.
+        """
+        if isinstance(values, pd.DataFrame):
+            values = [list(row) for row in values.itertuples(index=False)]
+
+        if by is None:
+            return {None: self(key, values, label)} if values else {}
+
+        groups = defaultdict(list)
+        for value in values:
+            groups[value[by]].append(value)
+
+        return {
+            group: self(key, values, label)
+            for group, values in groups.iteritems()
+        }
+
     def default_handler(self, label, values):
         """
         The default handler simply counts the number of items in the series.
@@ -99,11 +285,14 @@ class TimeSeriesAggregator(object):
             (target, source, recv at, message type, delay)
 
         Returns the number of received messages and the average dleay
+        as well as the p50, p95, p99 and p999 latencies
         """
-        return {
+        result = {
             label: len(values),
             "mean message latency (ms)": mean(v[4] for v in values),
         }
+        result.update(percentiles("message latency", (v[4] for v in values)))
+        return result
 
     def handle_read(self, label, values):
         """
@@ -160,11 +349,14 @@ class TimeSeriesAggregator(object):
             (owner, version, started, finished)
 
         Returns the mean read latency and the number of completed reads
+        as well as the p50, p95, p99 and p999 latencies
         """
-        return {
+        result = {
             "completed reads": len(values),
             "mean read latency (ms)": mean(v[3] - v[2] for v in values),
         }
+        result.update(percentiles("read latency", (v[3] - v[2] for v in values)))
+        return result
 
     def handle_missed_read_latency(self, label, values):
         """
@@ -178,6 +370,31 @@ class TimeSeriesAggregator(object):
             "mean missed read latency (ms)": mean(v[3] - v[2] for v in values),
         }
 
+    def handle_policy_read(self, label, values):
+        """
+        Expects a time series in the form of:
+
+            (replica, read policy, started, finished, version staleness)
+
+        Returns the number of reads, the mean read latency and the number of
+        stale reads (and mean version staleness) for each read policy.
+        """
+        policies = defaultdict(list)
+        for val in values:
+            policies[val[1]].append(val)
+
+        result = {}
+        for policy, reads in policies.iteritems():
+            stale = [v[4] for v in reads if v[4] > 0]
+            result.update({
+                "{} reads".format(policy): len(reads),
+                "mean {} read latency (ms)".format(policy): mean(v[3] - v[2] for v in reads),
+                "{} stale reads".format(policy): len(stale),
+                "mean {} version staleness".format(policy): mean(stale) if stale else 0.0,
+            })
+
+        return result
+
     def handle_stale_reads(self, label, values):
         """
         Expects a time series in the form of:
@@ -259,11 +476,14 @@ class TimeSeriesAggregator(object):
             (replica, version, created, updated)
 
         Returns the mean time delta and the number of visible writes
+        as well as the p50, p95, p99 and p999 latencies
         """
-        return {
+        result = {
             "mean visibility latency (ms)": mean(v[3] - v[2] for v in values),
             "visible writes": len(set([v[1] for v in values])),
         }
+        result.update(percentiles("visibility latency", (v[3] - v[2] for v in values)))
+        return result
 
     def handle_commit_latency(self, label, values):
         """
@@ -272,11 +492,14 @@ class TimeSeriesAggregator(object):
             (replica, version, created, updated)
 
         Returns the mean time delta and the number of committed writes
+        as well as the p50, p95, p99 and p999 latencies
         """
-        return {
+        result = {
             "mean commit latency (ms)": mean(v[3] - v[2] for v in values),
             "committed writes": len(set([v[1] for v in values])),
         }
+        result.update(percentiles("commit latency", (v[3] - v[2] for v in values)))
+        return result
 
     def handle_write_latency(self, label, values):
         """
@@ -285,11 +508,14 @@ class TimeSeriesAggregator(object):
             (replica, version, started, finished)
 
         Returns the mean write latency and the number of completed writes
+        as well as the p50, p95, p99 and p999 latencies
         """
-        return {
+        result = {
             "completed writes": len(values),
             "mean write latency (ms)": mean(v[3] - v[2] for v in values),
         }
+        result.update(percentiles("write latency", (v[3] - v[2] for v in values)))
+        return result
 
     def handle_dropped_write_latency(self, label, values):
         """
@@ -303,6 +529,145 @@ class TimeSeriesAggregator(object):
             "mean dropped write latency (ms)": mean(v[3] - v[2] for v in values),
         }
 
+    def handle_write_batch(self, label, values):
+        """
+        Expects a time series in the form of:
+
+            (leader, write policy, writes, messages, timestamp)
+
+        Returns the write policy, the number of batches, the mean batch size
+        and the number of AppendEntries messages sent per write.
+        """
+        policies = Counter(v[1] for v in values)
+        writes   = sum(v[2] for v in values)
+        messages = sum(v[3] for v in values)
+
+        return {
+            "write policy": policies.most_common(1)[0][0] if policies else None,
+            "write batches": len(values),
+            "mean write batch size": mean(v[2] for v in values),
+            "append entries per write": float(messages) / writes if writes else 0.0,
+        }
+
+    def handle_shard_commit_latency(self, label, values):
+        """
+        Expects a time series in the form of:
+
+            (leader, shard, version, created, committed)
+
+        Returns the number of shards, the mean commit latency across shards
+        as well as the mean commit latency and commits of each shard.
+        """
+        shards = defaultdict(list)
+        for val in values:
+            shards[val[1]].append(val[4] - val[3])
+
+        result = {
+            "shards": len(shards),
+            "mean shard commit latency (ms)": mean(v[4] - v[3] for v in values),
+        }
+
+        for shard, latencies in shards.iteritems():
+            result["shard {} commits".format(shard)] = len(latencies)
+            result["shard {} mean commit latency (ms)".format(shard)] = mean(latencies)
+
+        return result
+
+    def handle_shard_leader(self, label, values):
+        """
+        Expects a time series in the form of:
+
+            (leader, shard, timestamp)
+
+        Returns the number of shard leader elections, and the leader load as
+        the number of shards led by the busiest (and least busy) leader.
+        """
+        leaders = {}
+        for replica, shard, timestamp in sorted(values, key=itemgetter(2)):
+            leaders[shard] = replica
+
+        load = Counter(leaders.values())
+        return {
+            "shard leader elections": len(values),
+            "shard leaders": len(load),
+            "max leader load": max(load.values()) if load else 0,
+            "min leader load": min(load.values()) if load else 0,
+        }
+
+    def handle_election(self, label, values):
+        """
+        Expects a time series in the form of:
+
+            (replica, term, started, finished, votes, won)
+
+        Returns the number of elections held (and won), the mean number of
+        votes granted per election, and the mean duration of an election.
+        """
+        return {
+            "elections": len(values),
+            "elections won": sum(1 for v in values if v[5]),
+            "mean votes per election": mean(v[4] for v in values),
+            "mean election duration (ms)": mean(v[3] - v[2] for v in values),
+        }
+
+    def handle_leaderless(self, label, values):
+        """
+        Expects a time series in the form of:
+
+            (replica, since, until)
+
+        Returns the number of periods that replicas spent without knowing of
+        a leader, and the mean time without a leader per replica.
+        """
+        replicas = set(v[0] for v in values)
+        leaderless = sum(v[2] - v[1] for v in values)
+        return {
+            "leaderless periods": len(values),
+            "mean leaderless period (ms)": mean(v[2] - v[1] for v in values),
+            "time without a leader (ms)": leaderless / float(len(replicas)),
+        }
+
+    def handle_anti_entropy(self, label, values):
+        """
+        Expects a time series in the form of:
+
+            (replica, mode, entries, digest, wanted, timestamp)
+
+        Returns the number of anti-entropy messages and the total and mean
+        number of entries, digest versions and wanted versions sent in those
+        messages.
+        """
+        return {
+            "anti-entropy messages": len(values),
+            "anti-entropy entries": sum(v[2] for v in values),
+            "anti-entropy digest versions": sum(v[3] for v in values),
+            "anti-entropy wanted versions": sum(v[4] for v in values),
+            "mean anti-entropy entries per message": mean(v[2] for v in values),
+        }
+
+    def handle_rumor(self, label, values):
+        """
+        Expects a time series in the form of:
+
+            (replica, version, created, removed, messages)
+
+        Returns the number of rumors, the total and mean rumor messages sent
+        per rumor, and the mean convergence time: the time from the creation
+        of the version until the last replica stopped spreading the rumor.
+        """
+        converged = defaultdict(int)
+        messages  = Counter()
+        for replica, version, created, removed, sent in values:
+            converged[version] = max(converged[version], removed - created)
+            messages[version] += sent
+
+        return {
+            "rumors": len(converged),
+            "rumor messages": sum(messages.values()),
+            "mean rumor messages": mean(messages.values()),
+            "mean rumor convergence (ms)": mean(converged.values()),
+        }
+
     def handle_session_length(self, label, values):
         """
         Expects a time series in the form of:
@@ -316,6 +681,56 @@ class TimeSeriesAggregator(object):
             "mean session duration (ms)": mean(v[1] for v in values),
         }
 
+    def handle_tag_acquisition(self, label, values):
+        """
+        Expects a time series in the form of:
+
+            (replica, requested, granted, started, finished)
+
+        Returns the number of tag acquisitions, their mean latency, and the
+        number of objects acquired.
+        """
+        return {
+            "tag acquisitions": len(values),
+            "mean tag acquisition latency (ms)": mean(v[4] - v[3] for v in values),
+            "objects acquired": sum(v[2] for v in values),
+            "partial tag grants": sum(1 for v in values if v[2] < v[1]),
+        }
+
+    def handle_prefetched_access(self, label, values):
+        """
+        Expects a time series in the form of:
+
+            (replica, type, timestamp)
+
+        Returns the number of accesses served by an object granted ahead of
+        any access to it, each one an acquisition round trip saved by batching.
+        """
+        return {
+            "acquisition round trips saved": len(values),
+        }
+
+    def handle_pending_access(self, label, values):
+        """
+        Expects a time series in the form of:
+
+            (replica, type, queued, serviced)
+
+        Returns the number of accesses that waited on ownership and the mean
+        time to service them (overall and by access type).
+        """
+        result = {
+            "pending accesses": len(values),
+            "mean time to service (ms)": mean(v[3] - v[2] for v in values),
+        }
+
+        for atype in ('read', 'write'):
+            waits = [v[3] - v[2] for v in values if v[1] == atype]
+            if waits:
+                result["mean {} time to service (ms)".format(atype)] = mean(waits)
+
+        return result
+
     def handle_tag_size(self, label, values):
         """
         Expects a time series in the form of:
@@ -329,6 +744,101 @@ class TimeSeriesAggregator(object):
         }
 
 
+    ######################################################################
+    ## Columnar Handlers
+    ######################################################################
+
+    # Columnar handlers compute the same aggregates as the handlers of the
+    # series for every group of a GroupedSeries at once, returning a list
+    # of (name, values) pairs where values holds the aggregate of each group.
+
+    def column_default(self, label, series):
+        return [(label, series.count())]
+
+    column_empty_reads = column_default
+    column_missed_reads = column_default
+    column_dropped_writes = column_default
+
+    def column_sent(self, label, series):
+        return [
+            (label, series.count()),
+            ("message types", series.counts(series.field(3))),
+        ]
+
+    def column_recv(self, label, series):
+        delay = series.number(4)
+        return [
+            (label, series.count()),
+            ("mean message latency (ms)", series.mean(delay)),
+        ] + series.percentiles("message latency", delay)
+
+    def column_read(self, label, series):
+        return [("reads", series.count())]
+
+    def column_write(self, label, series):
+        return [("writes", series.count())]
+
+    def column_read_latency(self, label, series):
+        latency = series.number(3) - series.number(2)
+        return [
+            ("completed reads", series.count()),
+            ("mean read latency (ms)", series.mean(latency)),
+        ] + series.percentiles("read latency", latency)
+
+    def column_write_latency(self, label, series):
+        latency = series.number(3) - series.number(2)
+        return [
+            ("completed writes", series.count()),
+            ("mean write latency (ms)", series.mean(latency)),
+        ] + series.percentiles("write latency", latency)
+
+    def column_visibility_latency(self, label, series):
+        latency = series.number(3) - series.number(2)
+        return [
+            ("mean visibility latency (ms)", series.mean(latency)),
+            ("visible writes", series.nunique(series.field(1))),
+        ] + series.percentiles("visibility latency", latency)
+
+    def column_commit_latency(self, label, series):
+        latency = series.number(3) - series.number(2)
+        return [
+            ("mean commit latency (ms)", series.mean(latency)),
+            ("committed writes", series.nunique(series.field(1))),
+        ] + series.percentiles("commit latency", latency)
+
+    def column_stale_reads(self, label, series, access='read'):
+        time_stale = series.number(1) - series.number(2)
+        vers_stale = series.number(3) - series.number(4)
+        return [
+            (label, series.count()),
+            ("cumulative {} time staleness (ms)".format(access), series.sum(time_stale)),
+            ("mean {} time staleness (ms)".format(access), series.mean(time_stale)),
+            ("mean {} version staleness".format(access), series.mean(vers_stale)),
+        ]
+
+    def column_stale_writes(self, label, series):
+        return self.column_stale_reads(label, series, access='write')
+
+    def column_anti_entropy(self, label, series):
+        entries = series.field(2)
+        return [
+            ("anti-entropy messages", series.count()),
+            ("anti-entropy entries", series.sum(entries)),
+            ("anti-entropy digest versions", series.sum(series.field(3))),
+            ("anti-entropy wanted versions", series.sum(series.field(4))),
+            ("mean anti-entropy entries per message", series.mean(entries)),
+        ]
+
+    def column_session_length(self, label, series):
+        return [
+            ("sessions", series.count()),
+            ("mean session duration (ms)", series.mean(series.number(1))),
+        ]
+
+    def column_tag_size(self, label, series):
+        return [("average tag size", series.mean(series.number(2)))]
+
+
 ## Hook to a single instance of the aggregator
 aggregator = TimeSeriesAggregator()
 
@@ -337,6 +847,52 @@ aggregator = TimeSeriesAggregator()
 ## DataFrame creation utilities
 ##########################################################################
 
+def aggregate_replicas(result):
+    """
+    Aggregates the time series of a single results object per replica,
+    returning a dictionary of replica id to its aggregates.
+    """
+    replicas = defaultdict(dict)
+    series   = result.results
+
+    # Series aggregated online already hold the per-replica aggregates.
+    if hasattr(series, 'aggregate'):
+        for replica in series.replicas():
+            replicas[replica] = series.aggregate(replica)
+        return replicas
+
+    # Group each series by replica and aggregate them one series at a time
+    # so that only a single series is loaded at once.
+    for key in series.keys():
+        for replica, values in aggregator.group(key, series_values(series, key)).iteritems():
+            replicas[replica].update(values)
+
+    return replicas
+
+
+def aggregate_series(result):
+    """
+    Aggregates the time series of a single results object (or dictionary
+    loaded from JSON) for the whole experiment.
+    """
+    data   = {}
+    series = result_value(result, 'results')
+    if isinstance(series, dict) and isinstance(series.get('sink'), basestring):
+        series = open_sink(series)
+
+    if hasattr(series, 'aggregate'):
+        return series.aggregate()
+
+    for key in series.keys():
+        values = series_values(series, key)
+        if len(values):
+            data.update(aggregator.group(key, values, by=None)[None])
+        else:
+            data.update(aggregator(key, values))
+
+    return data
+
+
 def create_per_replica_dataframe(results):
     """
     Expects a single results object and creates a data frame, aggregating
@@ -349,31 +905,19 @@ def create_per_replica_dataframe(results):
         )
 
     # Set up the various data structures we will be using
-    replicas = defaultdict(lambda: defaultdict(list))
+    replicas = aggregate_replicas(results)
     topology = results.topology
-    config   = results.settings
-    series   = results.results
-
-    # Separate the series into per-replica series
-    for key, values in series.iteritems():
-        for value in values:
-            # Append the item from the series to the correct replica series
-            replicas[value[0]][key].append(value)
 
     # Create a table with each replica id
+    nodes = {node['id']: node for node in topology['nodes']}
     table = []
-    for replica, series in replicas.iteritems():
+    for replica, values in replicas.iteritems():
         row = {'replica': replica}
-
-        # Perform per-replica aggregations for each series
-        for key, values in series.iteritems():
-            row.update(aggregator(key, values))
+        row.update(values)
 
         # Add in topology information
-        for node in topology['nodes']:
-            if node['id'] == replica:
-                row.update(node)
-                break
+        if replica in nodes:
+            row.update(nodes[replica])
 
         # Help with missing keys
 
@@ -418,6 +962,18 @@ def create_messages_dataframe(results):
                 msg['sent'] = 1 if mode == 'sent' else 0
                 yield msg
 
+    # Columnar results only map the columns of the sent and recv series.
+    if hasattr(results.results, 'frame'):
+        frames = []
+        for mode in modes:
+            frame = results.results.frame(mode, range(len(fields)), fields)
+            frame['recv'] = 1 if mode == 'recv' else 0
+            frame['sent'] = 1 if mode == 'sent' else 0
+            frames.append(frame)
+
+        frame = pd.concat(frames, ignore_index=True)
+        return frame[sorted(frame.columns)]
+
     return pd.DataFrame(messages(results.results))
 
 
@@ -490,11 +1046,73 @@ def create_settings_dataframe(results, exclude=None):
     return pd.DataFrame(table.values())
 
 
+class ExperimentRow(dict):
+    """
+    The aggregates of a single experiment, a row of the per experiment table.
+    """
+    pass
+
+
+def aggregate_experiment(result):
+    """
+    Aggregates a single results object (or dictionary loaded from JSON) into
+    its row of the per experiment table.
+    """
+    data = ExperimentRow()
+    conf = result_value(result, 'settings')
+
+    # Pull information from the configuration
+    data['type'] = conf['type']
+    data['users'] = conf['users']
+    data['tick metric (T)'] = conf['tick_metric']
+    data['mean latency (ms)'] = conf['latency_mean']
+    data['latency range (ms)'] = conf['latency_range']
+    data['standard deviation of latency (ms)'] = conf['latency_stddev']
+    data['anti-entropy delay (ms)'] = conf['anti_entropy_delay']
+    data['heartbeat interval (ms)'] = conf['heartbeat_interval']
+    data['election timeout (ms, ms)'] = conf['election_timeout']
+    data['T parameter model'] = conf['tick_param_model']
+    data['conflict probability'] = conf['conflict_prob']
+    data['sync probability'] = conf['sync_prob']
+    data['local probability'] = conf['local_prob']
+
+    # Aggregate the timeseries resuts data
+    data.update(aggregate_series(result))
+
+    # If we didn't do an aggregation from the time series, get it
+    # directly from the messages and latencies objects.
+    messages  = result.messages.messages
+    latencies = result.latencies
+
+    if 'message types' not in data:
+        data['message types'] = messages.get('sent', {})
+
+    if 'sent' not in data:
+        data['sent messages'] = sum(messages.get('sent', {}).values())
+
+    if 'recv' not in data:
+        data['recv messages'] = sum(messages.get('recv', {}).values())
+
+    if 'dropped' not in data:
+        data['dropped messages'] = sum(messages.get('drop', {}).values())
+
+    # Compute the election rate over the simulated time (in minutes)
+    if 'elections' in data:
+        data['elections per minute'] = data['elections'] / (conf['max_sim_time'] / 60000.0)
+
+    # Get the simulation time from the results
+    data['simulation time (secs)'] = result.timer['finished'] - result.timer['started']
+
+    return data
+
+
 def create_per_experiment_dataframe(results):
     """
     Creates a DataFrame of aggregations per experiment rather than per replica
     by iterating through a list of results objects. This does not really work
-    for a single results object, and so this function expects a list or tuple.
+    for a single results object, and so this function expects a list or tuple
+    or an iterator of results (or of their rows) such as those yielded by the
+    cloudscope.results.loader.load_results function.
     """
 
     try:
@@ -504,51 +1122,13 @@ def create_per_experiment_dataframe(results):
             "This analysis function requires a collection of results objects"
         )
 
-
     table = []
     for idx, result in enumerate(results):
-        data = {'eid': "e{:0>2}".format(idx)}
-        conf = result_value(result, 'settings')
-
-        # Pull information from the configuration
-        data['type'] = conf['type']
-        data['users'] = conf['users']
-        data['tick metric (T)'] = conf['tick_metric']
-        data['mean latency (ms)'] = conf['latency_mean']
-        data['latency range (ms)'] = conf['latency_range']
-        data['standard deviation of latency (ms)'] = conf['latency_stddev']
-        data['anti-entropy delay (ms)'] = conf['anti_entropy_delay']
-        data['heartbeat interval (ms)'] = conf['heartbeat_interval']
-        data['election timeout (ms, ms)'] = conf['election_timeout']
-        data['T parameter model'] = conf['tick_param_model']
-        data['conflict probability'] = conf['conflict_prob']
-        data['sync probability'] = conf['sync_prob']
-        data['local probability'] = conf['local_prob']
-
-        # Aggregate the timeseries resuts data
-        for key, values in result_value(result, 'results').iteritems():
-            data.update(aggregator(key, values))
-
-        # If we didn't do an aggregation from the time series, get it
-        # directly from the messages and latencies objects.
-        messages  = result.messages.messages
-        latencies = result.latencies
-
-        if 'message types' not in data:
-            data['message types'] = messages.get('sent', {})
-
-        if 'sent' not in data:
-            data['sent messages'] = sum(messages.get('sent', {}).values())
-
-        if 'recv' not in data:
-            data['recv messages'] = sum(messages.get('recv', {}).values())
-
-        if 'dropped' not in data:
-            data['dropped messages'] = sum(messages.get('drop', {}).values())
-
-        # Get the simulation time from the results
-        data['simulation time (secs)'] = result.timer['finished'] - result.timer['started']
+        if not isinstance(result, ExperimentRow):
+            result = aggregate_experiment(result)
 
+        data = dict(result)
+        data['eid'] = "e{:0>2}".format(idx)
         table.append(data)
 
     df = pd.DataFrame(table)
@@ -24,6 +24,7 @@ from .report import details as report_details
 from .report import topology as report_topology
 from .metrics import MessageCounter
 from .metrics import LatencyDistribution
+from .sink import MemorySink, get_sink, open_sink
 from .consistency import ConsistencyValidator
 
 from cloudscope.config import settings
@@ -33,8 +34,6 @@ from cloudscope.utils.timez import HUMAN_DATETIME
 from cloudscope.utils.timez import epochptime
 from cloudscope.viz import plot_workload
 
-from collections import defaultdict
-
 ##########################################################################
 ## Results Object
 ##########################################################################
@@ -47,14 +46,18 @@ class Results(object):
     @classmethod
     def load(klass, fp):
         """
-        Load a results object from a JSON file on disk.
+        Load a results object from a JSON file on disk, a JSON string, or a
+        dictionary of the parsed JSON (which is consumed by the load).
         """
-        if isinstance(fp, basestring):
+        if isinstance(fp, dict):
+            data = fp
+        elif isinstance(fp, basestring):
             data = json.loads(fp)
         else:
             data = json.load(fp)
 
         # Get the objects to deserialize
+        series   = data.pop('results', None)
         messages = data.pop('messages', None)
         latencies = data.pop('latencies', None)
         # consistency = data.pop('consistency', None)
@@ -62,6 +65,13 @@ class Results(object):
         results = klass(**data)
 
         # Deserialize necessary objects
+        if series is not None:
+            # Streamed or aggregated time series are referenced by sink.
+            if isinstance(series.get('sink'), basestring):
+                results.results = open_sink(series)
+            else:
+                results.results = MemorySink(series)
+
         if messages:
             results.messages = MessageCounter.deserialize(messages)
 
@@ -76,7 +86,11 @@ class Results(object):
 
     def __init__(self, **kwargs):
         # Set reasonable defaults for results
-        self.results     = defaultdict(list)
+        self.results     = get_sink(
+            settings.simulation.results_sink,
+            settings.simulation.results_path,
+            settings.simulation.results_chunk_size,
+        )
         self.timer       = Timer()
         self.simulation  = None
         self.version     = cloudscope.get_version()
@@ -95,7 +109,7 @@ class Results(object):
         """
         Updates the results by appending the value to the appropriate key.
         """
-        self.results[key].append(value)
+        self.results.append(key, value)
 
     def dump(self, fp, **kwargs):
         """
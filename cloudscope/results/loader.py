@@ -0,0 +1,162 @@
+# cloudscope.results.loader
+# Streaming, parallel loader for the JSON lines output of multisim.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: loader.py [] $
+
+"""
+Streaming, parallel loader for the JSON lines output of multisim.
+
+Every line of a multisim output is a complete serialized results object, so
+the lines are parsed independently by a pool of worker processes. Workers
+project each result onto the selected keys and series before deserializing
+it and can aggregate it into its row of the per experiment table, so that
+only the row is sent back. Lines are read in bounded batches, so outputs of
+any size are streamed rather than loaded into memory.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import json
+import multiprocessing as mp
+
+from itertools import imap, islice
+
+from .base import Results
+from .analysis import aggregate_experiment
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+# Keys of the serialized results that are always loaded.
+METADATA = ('simulation', 'version', 'randseed', 'timesteps', 'timer')
+
+##########################################################################
+## Results Parser
+##########################################################################
+
+class ResultsParser(object):
+    """
+    Parses a line of a multisim output into a results object, or its row of
+    the per experiment table if rows is True (or the row computed by rows if
+    it is a function of the results object). If keys are specified, only
+    those keys of the results (e.g. settings, messages) are loaded; if the
+    series are specified, only those time series are loaded. Results of
+    simulations that errored are parsed as None.
+    """
+
+    def __init__(self, keys=None, series=None, rows=False):
+        self.keys   = None
+        self.series = frozenset(series) if series is not None else None
+        self.rows   = aggregate_experiment if rows is True else rows
+
+        if keys is not None:
+            self.keys = set(METADATA) | set(keys)
+            if series is not None:
+                self.keys.add('results')
+
+    def project(self, data):
+        """
+        Removes the keys and the series that are not loaded from the data.
+        """
+        if self.keys is not None:
+            data = {
+                key: val for key, val in data.iteritems() if key in self.keys
+            }
+
+        series = data.get('results')
+        if self.series is not None and series:
+            # Sinks stored elsewhere only load the series that are accessed,
+            # but series aggregated online are serialized with the results.
+            if not isinstance(series.get('sink'), basestring):
+                data['results'] = {
+                    key: val for key, val in series.iteritems()
+                    if key in self.series
+                }
+            elif 'series' in series:
+                series['series'] = {
+                    key: val for key, val in series['series'].iteritems()
+                    if key in self.series
+                }
+
+        return data
+
+    def __call__(self, line):
+        data = json.loads(line)
+        if data.get('success', True) is False:
+            return None
+
+        result = Results.load(self.project(data))
+        if self.rows:
+            return self.rows(result)
+        return result
+
+
+##########################################################################
+## Loader
+##########################################################################
+
+def load_results(path, keys=None, series=None, rows=False, processes=None, batch_size=None):
+    """
+    Lazily yields the results of each line of a multisim output at path (or
+    an open file) in order, or their rows of the per experiment table if
+    rows is True, which can be passed directly to
+    create_per_experiment_dataframe. The keys and series limit the parts of
+    each result that are loaded, and rows may also be a (picklable) function
+    computing the row of each result in the workers (see ResultsParser).
+
+    Lines are parsed by a pool of processes (by default one per cpu, or in
+    this process if processes is 1) in batches of batch_size lines, the next
+    batch being parsed while the results of the previous one are consumed.
+    """
+    parser = ResultsParser(keys, series, rows)
+    processes  = processes or mp.cpu_count()
+    batch_size = batch_size or processes * 2
+
+    fobj = open(path, 'r') if isinstance(path, basestring) else path
+
+    try:
+        lines = (line for line in fobj if line.strip())
+        if processes == 1:
+            parsed = imap(parser, lines)
+        else:
+            parsed = parallel_map(parser, lines, processes, batch_size)
+
+        for result in parsed:
+            if result is not None:
+                yield result
+
+    finally:
+        if fobj is not path:
+            fobj.close()
+
+
+def parallel_map(func, items, processes, batch_size):
+    """
+    Yields the func of each of the items in order, computed in a pool of
+    processes with at most two batches of items in memory at once.
+    """
+    pool = mp.Pool(processes=processes)
+    pending = None
+
+    try:
+        while True:
+            batch = list(islice(items, batch_size))
+            task  = pool.map_async(func, batch) if batch else None
+
+            if pending is not None:
+                for result in pending.get():
+                    yield result
+
+            if task is None:
+                break
+            pending = task
+
+    finally:
+        pool.terminate()
+        pool.join()
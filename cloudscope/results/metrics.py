@@ -17,10 +17,16 @@ Specialized metrics objects for recording results accurately
 ## Imports
 ##########################################################################
 
+from array import array
+from itertools import product
 from collections import Counter
 from collections import defaultdict
 from cloudscope.config import settings
-from cloudscope.utils.statistics import OnlineVariance
+from peak.util.imports import lazyModule
+from cloudscope.utils.statistics import OnlineVariance, QuantileSketch
+
+# Lazy loading of optional dependencies
+np = lazyModule('numpy')
 
 ##########################################################################
 ## Module Constants
@@ -32,6 +38,222 @@ RECV = "recv"
 DROP = "dropped"
 
 
+##########################################################################
+## Message Classification
+##########################################################################
+
+def message_type(value, aggregate_heartbeats=False):
+    """
+    Determines the message type from the value of a message, classifying
+    append entries without any entries as heartbeats if aggregating them.
+    """
+    # Get the base type of the message.
+    mtype = value.__class__.__name__ if value else "None"
+
+    # If we are aggregating heartbeats in addition to append entries:
+    if aggregate_heartbeats:
+
+        # Check if we're actually an append entries or a heartbeat
+        if mtype == 'AppendEntries':
+
+            # Tag/Complex entries
+            if isinstance(value.entries, dict):
+                if not any(value.entries.values()):
+                    mtype = 'Heartbeat'
+
+            # Raft/Standard entries
+            if not value.entries:
+                mtype = 'Heartbeat'
+
+    return mtype
+
+
+##########################################################################
+## Dense Metric Arrays
+##########################################################################
+
+class Enumeration(dict):
+    """
+    Interns keys (e.g. replica ids or message types) to consecutive integer
+    indices on first lookup; labels holds the keys in index order.
+    """
+
+    def __init__(self, labels=()):
+        super(Enumeration, self).__init__()
+        self.labels = []
+        for label in labels:
+            self[label]
+
+    def __missing__(self, key):
+        index = len(self.labels)
+        self.labels.append(key)
+        self[key] = index
+        return index
+
+    def __reduce__(self):
+        return (self.__class__, (self.labels,))
+
+
+class MetricMatrix(object):
+    """
+    Preallocated flat arrays of one or more metric fields indexed by the
+    integer indices of a fixed number of enumerated dimensions (which may
+    be shared, e.g. source and target replicas). The capacity of every
+    dimension is doubled when an index exceeds it.
+    """
+
+    def __init__(self, fields, dimensions, typecode='d', capacity=4):
+        self.fields     = tuple(fields)
+        self.dimensions = tuple(dimensions)
+        self.typecode   = typecode
+        self.shape      = tuple(max(capacity, len(dim)) for dim in self.dimensions)
+        self.strides    = self.compute_strides(self.shape)
+        self.arrays     = {
+            field: self.allocate(self.shape) for field in self.fields
+        }
+        self.offsets    = {}
+
+    @staticmethod
+    def compute_strides(shape):
+        strides = []
+        stride  = 1
+        for size in reversed(shape):
+            strides.insert(0, stride)
+            stride *= size
+        return tuple(strides)
+
+    def allocate(self, shape):
+        size = reduce(lambda x, y: x * y, shape, 1)
+        return array(self.typecode, [0]) * size
+
+    def index(self, *keys):
+        """
+        Interns the keys of each dimension, returning their indices.
+        """
+        return tuple(dim[key] for dim, key in zip(self.dimensions, keys))
+
+    def locate(self, keys):
+        """
+        Returns the flat offset of the tuple of keys, interning the keys and
+        growing the arrays if needed. Offsets are cached by the keys.
+        """
+        try:
+            return self.offsets[keys]
+        except KeyError:
+            offset = self.offset(self.index(*keys))
+            self.offsets[keys] = offset
+            return offset
+
+    def add(self, field, keys, value=1):
+        """
+        Adds the value to the field of the cell of the keys.
+        """
+        # The offset is computed first since it may grow the arrays
+        offset = self.offsets.get(keys)
+        if offset is None:
+            offset = self.locate(keys)
+        self.arrays[field][offset] += value
+
+    def offset(self, indices):
+        """
+        Returns the flat offset of the indices, growing the arrays if needed.
+        """
+        offset = 0
+        for idx, size, stride in zip(indices, self.shape, self.strides):
+            if idx >= size:
+                self.resize()
+                return self.offset(indices)
+            offset += idx * stride
+        return offset
+
+    def resize(self):
+        """
+        Doubles the capacity of the dimensions that have outgrown the arrays
+        and copies the values into the new layout.
+        """
+        shape   = tuple(
+            size * 2 if len(dim) > size else size
+            for dim, size in zip(self.dimensions, self.shape)
+        )
+        strides = self.compute_strides(shape)
+
+        for field, old in self.arrays.items():
+            new = self.allocate(shape)
+            for indices in product(*[xrange(size) for size in self.shape]):
+                src = sum(i * s for i, s in zip(indices, self.strides))
+                if old[src]:
+                    new[sum(i * s for i, s in zip(indices, strides))] = old[src]
+            self.arrays[field] = new
+
+        self.shape, self.strides = shape, strides
+        self.offsets = {}
+
+    def cells(self, field=None):
+        """
+        Yields the keys and offset of every cell where the field (by default
+        the first field) is non-zero.
+        """
+        values = self.arrays[field or self.fields[0]]
+        labels = [dim.labels for dim in self.dimensions]
+        for indices in product(*[xrange(len(dim)) for dim in self.dimensions]):
+            offset = sum(i * s for i, s in zip(indices, self.strides))
+            if values[offset]:
+                yield tuple(l[i] for l, i in zip(labels, indices)), offset
+
+    def matrix(self, field):
+        """
+        Returns the field as a dense numpy array whose axes are ordered by
+        the labels of each dimension.
+        """
+        values = np.frombuffer(self.arrays[field], dtype=self.arrays[field].typecode)
+        values = values.reshape(self.shape)
+        return values[tuple(slice(0, len(dim)) for dim in self.dimensions)].copy()
+
+    def __getitem__(self, field):
+        return self.arrays[field]
+
+
+class Moments(OnlineVariance):
+    """
+    A live view of the online variance of a cell of a metric matrix with the
+    samples, total and m2 fields, which reads and writes the arrays.
+    """
+
+    def __init__(self, matrix, indices):
+        self.matrix  = matrix
+        self.indices = indices
+
+    def _field(name):
+        def fget(self):
+            offset = self.matrix.offset(self.indices)
+            return self.matrix[name][offset]
+        def fset(self, value):
+            offset = self.matrix.offset(self.indices)
+            self.matrix[name][offset] = value
+        return property(fget, fset)
+
+    samples = _field('samples')
+    total   = _field('total')
+    m2      = _field('m2')
+    del _field
+
+    def __add__(self, other):
+        instance = OnlineVariance()
+        instance += self
+        instance += other
+        return instance
+
+    def __eq__(self, other):
+        if not isinstance(other, OnlineVariance):
+            return False
+
+        return (
+            self.samples == other.samples and
+            self.total == other.total and
+            self.m2 == other.m2
+        )
+
+
 ##########################################################################
 ## Message Counting
 ##########################################################################
@@ -50,29 +272,18 @@ class MessageMetric(object):
             "Subclasses must implement the deserialize class method."
         )
 
+    def __init__(self):
+        # Resolve the heartbeat aggregation once rather than per message
+        self.aggregate_heartbeats = settings.simulation.aggregate_heartbeats
+
     def get_message_type(self, message):
         """
-        Determines the message type from the value of the message.
+        Determines the message type from the value of the message, unless the
+        message was already classified when it was sent.
         """
-        # Get the base type of the message.
-        mtype = message.value.__class__.__name__ if message.value else "None"
-
-        # If we are aggregating heartbeats in addition to append entries:
-        if settings.simulation.aggregate_heartbeats:
-
-            # Check if we're actually an append entries or a heartbeat
-            if mtype == 'AppendEntries':
-
-                # Tag/Complex entries
-                if isinstance(message.value.entries, dict):
-                    if not any(message.value.entries.values()):
-                        mtype = 'Heartbeat'
-
-                # Raft/Standard entries
-                if not message.value.entries:
-                    mtype = 'Heartbeat'
-
-        return mtype
+        if message.kind is not None:
+            return message.kind
+        return message_type(message.value, self.aggregate_heartbeats)
 
     def update(self, message, **kwargs):
         """
@@ -105,6 +316,9 @@ class MessageCounter(MessageMetric):
     relationship to message types and their counts. Finally a received counter
     maintains a received by replica relationship to message types and their
     counts (which is a bit of a duplication of the LatencyDistribution).
+
+    The counts are stored in dense matrices of the interned actions, replica
+    ids and message types; the properties above are views of the counts.
     """
 
     @classmethod
@@ -118,33 +332,71 @@ class MessageCounter(MessageMetric):
 
         # For all the primary counter properties, fill in the value
         for key in ('messages', 'replicas', 'received'):
-            # Get the blank attribute from the class
-            attr = getattr(instance, key)
+            # Get the counts matrix of the property
+            matrix = instance.counts[key]
 
             # For every name  in the data for that item
             for name, counts in data.get(key, {}).items():
                 for mtype, count in counts.items():
-                    attr[name][mtype] = count
+                    offset = matrix.locate((name, mtype))
+                    matrix['count'][offset] = count
 
         return instance
 
     def __init__(self):
-        self.messages = defaultdict(Counter) # Tracks the sent, recv, drop according to message type
-        self.replicas = defaultdict(Counter) # Tracks the messages sent between replicas according to type
-        self.received = defaultdict(Counter) # Tracks the messages received between replicas according to type
+        super(MessageCounter, self).__init__()
+
+        # Interned actions, replica ids, and message types
+        self.actions  = Enumeration()
+        self.replica_ids = Enumeration()
+        self.kinds    = Enumeration()
+
+        # Counts of messages by action, sending and receiving replica
+        self.counts = {
+            'messages': MetricMatrix(['count'], [self.actions, self.kinds], 'l'),
+            'replicas': MetricMatrix(['count'], [self.replica_ids, self.kinds], 'l'),
+            'received': MetricMatrix(['count'], [self.replica_ids, self.kinds], 'l'),
+        }
+
+    def count(self, key, name, mtype):
+        """
+        Increments the count of the message type for the name in the matrix.
+        """
+        self.counts[key].add('count', (name, mtype))
+
+    def view(self, key):
+        """
+        Returns the nested dictionary of counters of the counts matrix.
+        """
+        counters = defaultdict(Counter)
+        for (name, mtype), offset in self.counts[key].cells():
+            counters[name][mtype] = self.counts[key]['count'][offset]
+        return counters
+
+    @property
+    def messages(self):
+        return self.view('messages')
+
+    @property
+    def replicas(self):
+        return self.view('replicas')
+
+    @property
+    def received(self):
+        return self.view('received')
 
     def update(self, message, action, **kwargs):
         """
         Must update with both a message and an action.
         """
         mtype = self.get_message_type(message)
-        self.messages[action][mtype] += 1
+        self.count('messages', action, mtype)
 
         if action == SENT:
-            self.replicas[message.source.id][mtype] += 1
+            self.count('replicas', message.source.id, mtype)
 
         if action == RECV:
-            self.received[message.target.id][mtype] += 1
+            self.count('received', message.target.id, mtype)
 
         return mtype
 
@@ -162,55 +414,139 @@ class MessageCounter(MessageMetric):
 class LatencyDistribution(MessageMetric):
     """
     Specialized class for counting latencies (delays) of messages recieved on
-    a per-replica basis by maintaining an online measurements of a running
-    sum, count, and sum of squares to compute online mean, variance, and
+    a per-replica basis by maintaining an online measurements of the sample
+    count, sum, and squared deviations to compute online mean, variance, and
     standard deviation of message types via the following data structure:
 
         - messages: source --> target --> message type --> online variance
 
-    The total message variance between source, target pairs can be computed
-    by summing two online variance objects.
+    The moments are stored in a dense R x R x K matrix of the interned
+    replica ids and message types, the messages property is a view whose
+    online variance objects read and write the matrix. The total message
+    variance between source, target pairs can be computed by summing two
+    online variance objects. Quantile sketches of each cell (sketches)
+    estimate the tail latencies of each message type.
     """
 
     @classmethod
     def deserialize(klass, data):
         """
-        Intantiates the complex messages data structure from data structured
-        as the the return from the serialize method.
+        Intantiates the dense matrices from data structured as the the return
+        from the serialize method.
         """
         instance = klass()
 
         for source, targets in data.items():
             for target, mtypes in targets.items():
                 for mtype, stats in mtypes.items():
+                    keys   = (source, target, mtype)
+                    offset = instance.moments.locate(keys)
+
+                    # Sketches are optional for backwards compatibility
+                    if 'quantiles' in stats:
+                        sketch = QuantileSketch.deserialize(stats['quantiles'])
+                        instance.sketches[keys] = sketch
+
                     stats = OnlineVariance.deserialize(stats)
-                    instance.messages[source][target][mtype] = stats
+                    for field in instance.moments.fields:
+                        instance.moments[field][offset] = getattr(stats, field)
 
         return instance
 
     def __init__(self):
-        # Nested default dictionaries, the highest level contains source ids
-        # as the key, followed by dictionaries of target ids, followed by
-        # dictionaries of message types whose value is an online variance.
-        self.messages = defaultdict(
-            lambda: defaultdict(
-                lambda: defaultdict(OnlineVariance)
-            )
+        super(LatencyDistribution, self).__init__()
+
+        # Interned replica ids (both sources and targets) and message types
+        self.replica_ids = Enumeration()
+        self.kinds       = Enumeration()
+
+        # Dense source x target x message type online variance moments
+        self.moments = MetricMatrix(
+            ['samples', 'total', 'm2'],
+            [self.replica_ids, self.replica_ids, self.kinds],
         )
 
+        # Quantile sketches by the source, target, message type
+        self.sketches = {}
+
+    @property
+    def messages(self):
+        """
+        Nested source, target, message type view of the online variances.
+        """
+        messages = {}
+        for keys, _ in self.moments.cells():
+            source, target, mtype = keys
+            stats = Moments(self.moments, self.moments.index(*keys))
+            messages.setdefault(source, {}).setdefault(target, {})[mtype] = stats
+        return messages
+
+    def sketch(self, source, target, mtype):
+        """
+        Returns the quantile sketch of the cell or None if it doesn't exist.
+        """
+        return self.sketches.get((source, target, mtype))
+
     def update(self, message, **kwargs):
         """
         Track the message delay by type for the source/target pair.
         """
         delay = message.delay or 0.0
 
-        mtype = self.get_message_type(message)
-        self.messages[message.source.id][message.target.id][mtype].update(delay)
+        mtype  = self.get_message_type(message)
+        keys   = (message.source.id, message.target.id, mtype)
+        offset = self.moments.offsets.get(keys)
+        if offset is None:
+            offset = self.moments.locate(keys)
+        arrays = self.moments.arrays
+
+        # Welford update of the moments (see OnlineVariance.update)
+        samples = arrays['samples'][offset]
+        if samples > 0:
+            delta = delay - arrays['total'][offset] / samples
+            arrays['m2'][offset] += delta * delta * samples / (samples + 1.0)
+        arrays['samples'][offset] = samples + 1.0
+        arrays['total'][offset]  += delay
+
+        try:
+            self.sketches[keys].update(delay)
+        except KeyError:
+            self.sketches[keys] = QuantileSketch([delay])
 
         return mtype
 
+    def quantiles(self, source=None, target=None, mtype=None):
+        """
+        Returns a quantile sketch of the message delays merged across all
+        the source, target pairs and message types that match the filters.
+        """
+        filters = (source, target, mtype)
+        merged  = QuantileSketch()
+        for keys, _ in self.moments.cells():
+            if any(f is not None and f != k for f, k in zip(filters, keys)):
+                continue
+
+            # Cells deserialized without a sketch have no quantiles.
+            sketch = self.sketch(*keys)
+            if sketch is not None:
+                merged += sketch
+        return merged
+
     def serialize(self):
         """
-        Writes out the current state of the online variance properties
+        Writes out the current state of the online variance properties along
+        with the quantile sketch and tail latency estimates of each type.
         """
-        return self.messages
+        data = {}
+        for source, targets in self.messages.items():
+            data[source] = {}
+            for target, mtypes in targets.items():
+                data[source][target] = {}
+                for mtype, stats in mtypes.items():
+                    stats  = stats.serialize()
+                    sketch = self.sketch(source, target, mtype)
+                    if sketch is not None:
+                        stats['quantiles'] = sketch.serialize()
+                        stats.update(sketch.percentiles())
+                    data[source][target][mtype] = stats
+        return data
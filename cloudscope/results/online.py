@@ -0,0 +1,433 @@
+# cloudscope.results.online
+# Online aggregation of the results time series during a simulation.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: online.py [] $
+
+"""
+Online aggregation of the results time series during a simulation.
+
+Rather than storing the raw time series, the online sink routes each record
+to a mergeable accumulator keyed by the series and the replica (the first
+field of the record) that maintains the counts, sums and maxima required to
+compute the same aggregates as the TimeSeriesAggregator handlers. Series
+whose handlers have no online accumulator keep their raw values.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+from collections import defaultdict, Counter
+
+from cloudscope.utils.statistics import mean, QuantileSketch
+
+##########################################################################
+## Accumulators
+##########################################################################
+
+class Count(object):
+    """
+    Counts the records of a series, like the default handler.
+    """
+
+    def __init__(self, name=None):
+        self.name  = name
+        self.count = 0
+
+    def update(self, value):
+        self.count += 1
+
+    def aggregate(self, label):
+        """
+        Returns the aggregates of the handler of the series.
+        """
+        return {self.name or label: self.count}
+
+    def serialize(self):
+        return dict(self.__dict__)
+
+    def load(self, data):
+        self.__dict__.update(data)
+        return self
+
+    def __iadd__(self, other):
+        self.count += other.count
+        return self
+
+
+class Mean(Count):
+    """
+    Maintains the mean of a field computed from each record of a series,
+    optionally with the count of records (named by the label if True) and
+    a quantile sketch of the field if its tail percentiles are named.
+    """
+
+    def __init__(self, name, field, counted=None, quantiles=None):
+        super(Mean, self).__init__(counted)
+        self.mean   = name
+        self.field  = field
+        self.total  = 0.0
+        self.tails  = quantiles
+        self.sketch = QuantileSketch() if quantiles else None
+
+    def update(self, value):
+        super(Mean, self).update(value)
+        sample = self.field(value)
+        self.total += float(sample)
+        if self.sketch is not None:
+            self.sketch.update(sample)
+
+    def aggregate(self, label):
+        result = {self.mean: self.total / self.count if self.count else None}
+        if self.name is True:
+            result[label] = self.count
+        elif self.name is not None:
+            result[self.name] = self.count
+        if self.sketch is not None:
+            # Imported here since the analysis module depends on the sinks.
+            from .analysis import tail_latencies
+            result.update(tail_latencies(self.tails, self.sketch))
+        return result
+
+    def serialize(self):
+        data = super(Mean, self).serialize()
+        del data['field']
+        if self.sketch is not None:
+            data['sketch'] = self.sketch.serialize()
+        return data
+
+    def load(self, data):
+        super(Mean, self).load(data)
+        if self.sketch is not None:
+            self.sketch = QuantileSketch.deserialize(self.sketch)
+        return self
+
+    def __iadd__(self, other):
+        super(Mean, self).__iadd__(other)
+        self.total += other.total
+        if self.sketch is not None:
+            self.sketch += other.sketch
+        return self
+
+
+class DistinctMean(Mean):
+    """
+    Maintains the mean latency of a series as well as the number of distinct
+    versions (the second field of each record) in the series.
+    """
+
+    def __init__(self, name, distinct, quantiles=None):
+        super(DistinctMean, self).__init__(name, latency, quantiles=quantiles)
+        self.distinct = distinct
+        self.versions = set()
+
+    def update(self, value):
+        super(DistinctMean, self).update(value)
+        self.versions.add(value[1])
+
+    def aggregate(self, label):
+        result = super(DistinctMean, self).aggregate(label)
+        result[self.distinct] = len(self.versions)
+        return result
+
+    def serialize(self):
+        data = super(DistinctMean, self).serialize()
+        data['versions'] = list(self.versions)
+        return data
+
+    def load(self, data):
+        super(DistinctMean, self).load(data)
+        self.versions = set(self.versions)
+        return self
+
+    def __iadd__(self, other):
+        super(DistinctMean, self).__iadd__(other)
+        self.versions |= other.versions
+        return self
+
+
+class MessageTypes(Count):
+    """
+    Counts the sent messages and the messages of each type.
+    """
+
+    def __init__(self):
+        super(MessageTypes, self).__init__()
+        self.mtypes = Counter()
+
+    def update(self, value):
+        super(MessageTypes, self).update(value)
+        self.mtypes[value[3]] += 1
+
+    def aggregate(self, label):
+        return {label: self.count, "message types": dict(self.mtypes)}
+
+    def load(self, data):
+        super(MessageTypes, self).load(data)
+        self.mtypes = Counter(self.mtypes)
+        return self
+
+    def __iadd__(self, other):
+        super(MessageTypes, self).__iadd__(other)
+        self.mtypes.update(other.mtypes)
+        return self
+
+
+class Staleness(Count):
+    """
+    Maintains the count, time and version staleness of stale accesses.
+    """
+
+    def __init__(self, access):
+        super(Staleness, self).__init__()
+        self.access   = access
+        self.time     = 0
+        self.versions = 0.0
+
+    def update(self, value):
+        super(Staleness, self).update(value)
+        self.time     += value[1] - value[2]
+        self.versions += float(value[3] - value[4])
+
+    def aggregate(self, label):
+        return {
+            label: self.count,
+            "cumulative {} time staleness (ms)".format(self.access): self.time,
+            "mean {} time staleness (ms)".format(self.access): float(self.time) / self.count,
+            "mean {} version staleness".format(self.access): self.versions / self.count,
+        }
+
+    def __iadd__(self, other):
+        super(Staleness, self).__iadd__(other)
+        self.time     += other.time
+        self.versions += other.versions
+        return self
+
+
+class Visibility(Count):
+    """
+    Maintains the maximum visibility of each version and the latest update
+    of each version by its creation time.
+    """
+
+    def __init__(self):
+        super(Visibility, self).__init__()
+        self.accesses = defaultdict(float)
+        self.delays   = defaultdict(int)
+
+    def update(self, value):
+        super(Visibility, self).update(value)
+        self.accesses[value[1]] = max(self.accesses[value[1]], value[2])
+        self.delays[(value[1], value[3])] = max(self.delays[(value[1], value[3])], value[4])
+
+    def aggregate(self, label):
+        return {
+            'mean visibility': mean(self.accesses.values()),
+            'partially visible writes': sum(1 for pcent in self.accesses.values() if pcent < 1.0),
+            'mean partial visibility latency (ms)': mean(
+                val - key[1] for key, val in self.delays.items()
+            )
+        }
+
+    def serialize(self):
+        return {
+            'count': self.count,
+            'accesses': dict(self.accesses),
+            'delays': [key + (val,) for key, val in self.delays.iteritems()],
+        }
+
+    def load(self, data):
+        self.count = data['count']
+        self.accesses = defaultdict(float, data['accesses'])
+        self.delays = defaultdict(int, {
+            (version, created): updated
+            for version, created, updated in data['delays']
+        })
+        return self
+
+    def __iadd__(self, other):
+        super(Visibility, self).__iadd__(other)
+        for version, pcent in other.accesses.iteritems():
+            self.accesses[version] = max(self.accesses[version], pcent)
+        for key, updated in other.delays.iteritems():
+            self.delays[key] = max(self.delays[key], updated)
+        return self
+
+
+class Values(Count):
+    """
+    Keeps the raw values of series without an online accumulator, which
+    are aggregated by their handler.
+    """
+
+    def __init__(self):
+        super(Values, self).__init__()
+        self.values = []
+
+    def update(self, value):
+        super(Values, self).update(value)
+        self.values.append(value)
+
+    def aggregate(self, label):
+        # Imported here since the analysis module depends on the sinks.
+        from .analysis import aggregator
+        return aggregator(label, self.values)
+
+    def __iadd__(self, other):
+        super(Values, self).__iadd__(other)
+        self.values.extend(other.values)
+        return self
+
+
+##########################################################################
+## Accumulators by series
+##########################################################################
+
+def latency(v):
+    return v[3] - v[2]
+
+
+ACCUMULATORS = {
+    'sent': MessageTypes,
+    'recv': lambda: Mean("mean message latency (ms)", lambda v: v[4], True, "message latency"),
+    'read': lambda: Count("reads"),
+    'write': lambda: Count("writes"),
+    'empty reads': Count,
+    'missed reads': Count,
+    'dropped writes': Count,
+    'read latency': lambda: Mean("mean read latency (ms)", latency, "completed reads", "read latency"),
+    'missed read latency': lambda: Mean("mean missed read latency (ms)", latency),
+    'write latency': lambda: Mean("mean write latency (ms)", latency, "completed writes", "write latency"),
+    'dropped write latency': lambda: Mean("mean dropped write latency (ms)", latency),
+    'stale reads': lambda: Staleness('read'),
+    'stale writes': lambda: Staleness('write'),
+    'visibility': Visibility,
+    'visibility latency': lambda: DistinctMean("mean visibility latency (ms)", "visible writes", "visibility latency"),
+    'commit latency': lambda: DistinctMean("mean commit latency (ms)", "committed writes", "commit latency"),
+    'session length': lambda: Mean("mean session duration (ms)", lambda v: v[1], "sessions"),
+    'tag size': lambda: Mean("average tag size", lambda v: v[2]),
+}
+
+
+def get_accumulator(key):
+    """
+    Returns a new accumulator for the series, keeping the raw values of the
+    series if it has a handler but no online accumulator.
+    """
+    # Imported here since the analysis module depends on the sinks.
+    from .analysis import aggregator
+
+    if key in ACCUMULATORS:
+        return ACCUMULATORS[key]()
+
+    if aggregator.has_handler(key):
+        return Values()
+    return Count()
+
+
+##########################################################################
+## Online Sink
+##########################################################################
+
+class OnlineSink(object):
+    """
+    Aggregates the time series during the simulation by routing each record
+    to the accumulator of its series and replica. Sinks (and the aggregates
+    of any replica) can be merged across replicas, workers and experiments.
+    """
+
+    format = "online"
+
+    @classmethod
+    def deserialize(klass, data):
+        """
+        Inverse of the serialization function.
+        """
+        instance = klass()
+        for key, replicas in data['series'].iteritems():
+            for replica, state in replicas.iteritems():
+                instance.accumulators[key][replica] = get_accumulator(key).load(state)
+        return instance
+
+    def __init__(self):
+        self.accumulators = defaultdict(dict)
+
+    def append(self, key, value):
+        """
+        Updates the accumulator of the series for the replica of the value.
+        """
+        replica = value[0] if isinstance(value, (tuple, list)) else None
+        series  = self.accumulators[key]
+        if replica not in series:
+            series[replica] = get_accumulator(key)
+        series[replica].update(value)
+
+    def close(self):
+        pass
+
+    def replicas(self):
+        """
+        Returns the ids of all replicas with records in any series.
+        """
+        return set(
+            replica for series in self.accumulators.itervalues()
+            for replica in series if replica is not None
+        )
+
+    def merged(self, key):
+        """
+        Returns the merged accumulator of all replicas for the series.
+        """
+        accumulator = get_accumulator(key)
+        for other in self.accumulators[key].itervalues():
+            accumulator += other
+        return accumulator
+
+    def aggregate(self, replica=None):
+        """
+        Returns the aggregates of every series for the replica, or of the
+        whole experiment if the replica is None.
+        """
+        result = {}
+        for key, series in self.accumulators.iteritems():
+            if replica is None:
+                result.update(self.merged(key).aggregate(key))
+            elif replica in series:
+                result.update(series[replica].aggregate(key))
+        return result
+
+    def serialize(self):
+        return {
+            'sink': self.format,
+            'series': {
+                key: {
+                    replica: accumulator.serialize()
+                    for replica, accumulator in series.iteritems()
+                } for key, series in self.accumulators.iteritems()
+            }
+        }
+
+    def __getstate__(self):
+        # Accumulators hold the functions of their fields, so are pickled
+        # by their serialization rather than their attributes.
+        return self.serialize()
+
+    def __setstate__(self, data):
+        self.accumulators = self.deserialize(data).accumulators
+
+    def __iadd__(self, other):
+        for key, series in other.accumulators.iteritems():
+            for replica, accumulator in series.iteritems():
+                if replica not in self.accumulators[key]:
+                    self.accumulators[key][replica] = get_accumulator(key)
+                self.accumulators[key][replica] += accumulator
+        return self
+
+    def __contains__(self, key):
+        return key in self.accumulators
+
+    def keys(self):
+        return self.accumulators.keys()
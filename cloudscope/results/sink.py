@@ -0,0 +1,503 @@
+# cloudscope.results.sink
+# Sinks that store the time series of the results during a simulation.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: sink.py [] $
+
+"""
+Sinks that store the time series of the results during a simulation.
+
+By default the time series are kept in memory and serialized along with the
+rest of the results. File sinks instead buffer a bounded chunk of each time
+series and append it to a JSONL or CSV file per series in a directory as the
+simulation runs; the results then only reference the directory. The columnar
+sink stores each column of a series as a typed binary array (dictionary
+encoding strings) that is memory mapped on demand when read. All sinks can be
+read back like a dictionary of series name to list of values.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import re
+import csv
+import json
+import tempfile
+
+from cloudscope.config import settings
+from cloudscope.exceptions import ImproperlyConfigured, BadValue
+from cloudscope.utils.serialize import JSONEncoder
+from peak.util.imports import lazyModule
+
+from .online import OnlineSink
+
+from collections import defaultdict
+from collections import OrderedDict
+
+# Perform lazy loading of analysis libraries
+np  = lazyModule('numpy')
+pd  = lazyModule('pandas')
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+RESULTS_SINK       = settings.simulation.results_sink
+RESULTS_PATH       = settings.simulation.results_path
+RESULTS_CHUNK_SIZE = settings.simulation.results_chunk_size
+
+INDEX = "index.json"
+
+##########################################################################
+## Memory Sink
+##########################################################################
+
+class MemorySink(defaultdict):
+    """
+    Keeps every time series in memory as a list of values.
+    """
+
+    format = "memory"
+
+    def __init__(self, *args, **kwargs):
+        super(MemorySink, self).__init__(list, *args, **kwargs)
+
+    def append(self, key, value):
+        """
+        Appends the value to the time series of the key.
+        """
+        self[key].append(value)
+
+    def __reduce__(self):
+        # The defaultdict reduction passes the factory to the constructor.
+        return (self.__class__, (), None, None, self.iteritems())
+
+    def close(self):
+        """
+        Nothing to close for in memory time series.
+        """
+        pass
+
+
+##########################################################################
+## File Sinks
+##########################################################################
+
+class FileSink(object):
+    """
+    Streams every time series to its own file in a directory, buffering at
+    most chunk_size values of a series in memory before appending them to
+    the file. Subclasses define how the values are written and read.
+    """
+
+    format    = None
+    extension = None
+
+    @classmethod
+    def open(klass, path):
+        """
+        Opens a sink previously written to the directory at path.
+        """
+        with open(os.path.join(path, INDEX), 'r') as fobj:
+            index = json.load(fobj)
+
+        sink = SINKS[index['format']](path)
+        sink.load_index(index)
+        return sink
+
+    def __init__(self, path=None, chunk_size=RESULTS_CHUNK_SIZE, root=None):
+        self._path   = path
+        self.root    = root                # parent of the directory if no path
+        self.chunk_size = chunk_size
+        self.buffers = defaultdict(list) # values not yet written by series
+        self.files   = {}                # the file name of each series
+        self.counts  = defaultdict(int)  # the number of values in each series
+
+    @property
+    def path(self):
+        """
+        The directory of the series, created on demand (a unique directory is
+        created under the root, or the temporary directory, if no path was
+        specified).
+        """
+        if self._path is None:
+            if self.root is not None and not os.path.exists(self.root):
+                os.makedirs(self.root)
+            self._path = tempfile.mkdtemp(prefix="cloudscope-results-", dir=self.root)
+        elif not os.path.exists(self._path):
+            os.makedirs(self._path)
+        return self._path
+
+    def append(self, key, value):
+        """
+        Buffers the value, writing the buffer once it reaches the chunk size.
+        """
+        self.buffers[key].append(value)
+        self.counts[key] += 1
+        if len(self.buffers[key]) >= self.chunk_size:
+            self.flush(key)
+
+    def flush(self, key=None):
+        """
+        Appends the buffered values of the series (or all series) to disk.
+        """
+        keys = [key] if key is not None else list(self.buffers.keys())
+        for key in keys:
+            rows = self.buffers.pop(key, None)
+            if not rows: continue
+
+            if key not in self.files:
+                self.files[key] = self.filename(key)
+
+            with open(os.path.join(self.path, self.files[key]), 'ab') as fobj:
+                self.write_rows(fobj, rows)
+
+    def close(self):
+        """
+        Flushes all buffered values and writes the index of the series.
+        """
+        self.flush()
+        with open(os.path.join(self.path, INDEX), 'w') as fobj:
+            json.dump(self.get_index(), fobj, indent=2)
+
+    def get_index(self):
+        """
+        Returns the index of the series written to the directory.
+        """
+        return {
+            'format': self.format,
+            'series': self.files,
+            'counts': self.counts,
+        }
+
+    def load_index(self, index):
+        """
+        Restores the series written to the directory from its index.
+        """
+        self.files  = index['series']
+        self.counts = defaultdict(int, index['counts'])
+
+    def filename(self, key):
+        """
+        Returns a unique, file system safe name for the series.
+        """
+        slug = re.sub(r'[^\w]+', '_', key).strip('_') or 'series'
+        name = "{}.{}".format(slug, self.extension)
+
+        idx = 1
+        while name in self.files.values():
+            idx += 1
+            name = "{}-{}.{}".format(slug, idx, self.extension)
+        return name
+
+    def iterseries(self, key):
+        """
+        Yields the values of a series one at a time from disk.
+        """
+        self.flush(key)
+        if key not in self.files: return
+
+        with open(os.path.join(self.path, self.files[key]), 'rb') as fobj:
+            for row in self.read_rows(fobj):
+                yield row
+
+    def write_rows(self, fobj, rows):
+        raise NotImplementedError("Subclasses must write rows to the file.")
+
+    def read_rows(self, fobj):
+        raise NotImplementedError("Subclasses must read rows from the file.")
+
+    def serialize(self):
+        """
+        Closes the sink and references its directory in the results.
+        """
+        self.close()
+        return {'sink': self.format, 'path': os.path.abspath(self.path)}
+
+    ## Read only dictionary interface, each series is loaded when accessed
+
+    def keys(self):
+        return [key for key in self.counts if self.counts[key] > 0]
+
+    def iterkeys(self):
+        return iter(self.keys())
+
+    def iteritems(self):
+        for key in self.keys():
+            yield key, self[key]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def get(self, key, default=None):
+        if key in self: return self[key]
+        return default
+
+    def __getitem__(self, key):
+        # Like the memory sink, missing series are empty.
+        return list(self.iterseries(key))
+
+    def __contains__(self, key):
+        return self.counts.get(key, 0) > 0
+
+    def __iter__(self):
+        return self.iterkeys()
+
+    def __len__(self):
+        return len(self.keys())
+
+
+class JSONLSink(FileSink):
+    """
+    Writes each value of a series as a JSON document on its own line.
+    """
+
+    format    = "jsonl"
+    extension = "jsonl"
+
+    def write_rows(self, fobj, rows):
+        for row in rows:
+            fobj.write(json.dumps(row, cls=JSONEncoder))
+            fobj.write("\n")
+
+    def read_rows(self, fobj):
+        for line in fobj:
+            if line.strip():
+                yield json.loads(line)
+
+
+class CSVSink(FileSink):
+    """
+    Writes each value of a series (which must be a tuple) as a CSV row.
+    Non-string fields are JSON encoded so that their types are restored;
+    string fields that are valid JSON (e.g. numbers) are read back decoded.
+    """
+
+    format    = "csv"
+    extension = "csv"
+
+    def write_rows(self, fobj, rows):
+        writer = csv.writer(fobj)
+        for row in rows:
+            writer.writerow([
+                field if isinstance(field, basestring)
+                else json.dumps(field, cls=JSONEncoder)
+                for field in row
+            ])
+
+    def read_rows(self, fobj):
+        for row in csv.reader(fobj):
+            yield [self.decode(field) for field in row]
+
+    def decode(self, field):
+        try:
+            return json.loads(field)
+        except ValueError:
+            return field.decode('utf-8')
+
+
+class ColumnarSink(FileSink):
+    """
+    Writes each column of a series (which must be a tuple of fixed width)
+    to its own file as a typed binary array in a directory per series.
+    Columns of strings (or of mixed or null values) are dictionary encoded
+    as integer codes whose values are stored in the index. Columns are
+    memory mapped when accessed, so analyses only read the columns used.
+    """
+
+    format    = "columnar"
+    extension = "columns"
+
+    # Column kinds in order of promotion and the dtype of their arrays
+    KINDS  = ('bool', 'int', 'float', 'str')
+    DTYPES = {'bool': '|b1', 'int': '<i8', 'float': '<f8', 'str': '<i4'}
+
+    def __init__(self, *args, **kwargs):
+        super(ColumnarSink, self).__init__(*args, **kwargs)
+        self.columns = {} # the kind and dictionary of each column by series
+        self.lookup  = {} # the code of each dictionary value by column
+
+    def get_index(self):
+        index = super(ColumnarSink, self).get_index()
+        index['columns'] = self.columns
+        return index
+
+    def load_index(self, index):
+        super(ColumnarSink, self).load_index(index)
+        self.columns = index['columns']
+
+    def infer(self, value):
+        """
+        Returns the kind of column required to store the value.
+        """
+        if isinstance(value, bool): return 'bool'
+        if isinstance(value, (int, long)): return 'int'
+        if isinstance(value, float): return 'float'
+        return 'str'
+
+    def flush(self, key=None):
+        """
+        Appends the buffered values of the series (or all series) to their
+        column files, promoting the kind of a column if required.
+        """
+        keys = [key] if key is not None else list(self.buffers.keys())
+        for key in keys:
+            rows = self.buffers.pop(key, None)
+            if not rows: continue
+
+            if key not in self.files:
+                self.files[key] = self.filename(key)
+                self.columns[key] = [
+                    {'kind': None, 'values': []} for field in rows[0]
+                ]
+                os.makedirs(os.path.join(self.path, self.files[key]))
+
+            width = len(self.columns[key])
+            if any(len(row) != width for row in rows):
+                raise BadValue(
+                    "columnar series '{}' requires rows of width {}".format(key, width)
+                )
+
+            for idx, values in enumerate(zip(*rows)):
+                column = self.columns[key][idx]
+                kinds  = set(map(self.infer, values))
+                if column['kind'] is not None: kinds.add(column['kind'])
+                kind   = max(kinds, key=self.KINDS.index)
+
+                if column['kind'] is None:
+                    column['kind'] = kind
+                elif kind != column['kind']:
+                    self.promote(key, idx, kind)
+
+                with open(self.column_path(key, idx), 'ab') as fobj:
+                    self.encode(key, idx, values).tofile(fobj)
+
+    def promote(self, key, idx, kind):
+        """
+        Rewrites the column already on disk as the new kind of column.
+        """
+        values = self.column(key, idx).tolist()
+        self.columns[key][idx]['kind'] = kind
+
+        with open(self.column_path(key, idx), 'wb') as fobj:
+            self.encode(key, idx, values).tofile(fobj)
+
+    def encode(self, key, idx, values):
+        """
+        Returns the array of the values for the kind of the column.
+        """
+        column = self.columns[key][idx]
+        if column['kind'] != 'str':
+            return np.array(values, dtype=self.DTYPES[column['kind']])
+
+        # Dictionary encode the values of string columns
+        lookup = self.lookup.get((key, idx))
+        if lookup is None:
+            lookup = {
+                value: code for code, value in enumerate(column['values'])
+            }
+            self.lookup[(key, idx)] = lookup
+
+        codes = []
+        for value in values:
+            if value not in lookup:
+                lookup[value] = len(column['values'])
+                column['values'].append(value)
+            codes.append(lookup[value])
+
+        return np.array(codes, dtype=self.DTYPES['str'])
+
+    def column_path(self, key, idx):
+        return os.path.join(self.path, self.files[key], "{}.bin".format(idx))
+
+    def column(self, key, idx, decode=True):
+        """
+        Memory maps the column of the series; dictionary encoded columns are
+        decoded into an array of values unless decode is False.
+        """
+        self.flush(key)
+        column = self.columns[key][idx]
+        data = np.memmap(
+            self.column_path(key, idx), mode='r',
+            dtype=self.DTYPES[column['kind']],
+        )
+
+        if decode and column['kind'] == 'str':
+            return np.array(column['values'], dtype=object)[data]
+        return data
+
+    def frame(self, key, columns=None, names=None):
+        """
+        Returns a DataFrame of the specified columns of the series (all
+        columns by default), optionally renaming them with names.
+        """
+        if key not in self: return pd.DataFrame(columns=names)
+
+        if columns is None:
+            columns = range(len(self.columns[key]))
+        columns = [idx for idx in columns if idx < len(self.columns[key])]
+        names   = names or columns
+
+        return pd.DataFrame(OrderedDict(
+            (name, self.column(key, idx)) for name, idx in zip(names, columns)
+        ))
+
+    def iterseries(self, key):
+        """
+        Yields the rows of the series from its columns.
+        """
+        if key not in self: return
+
+        columns = [
+            self.column(key, idx).tolist()
+            for idx in xrange(len(self.columns[key]))
+        ]
+
+        for row in zip(*columns):
+            yield list(row)
+
+
+##########################################################################
+## Sink Factory
+##########################################################################
+
+SINKS = {
+    MemorySink.format: MemorySink,
+    JSONLSink.format: JSONLSink,
+    CSVSink.format: CSVSink,
+    ColumnarSink.format: ColumnarSink,
+    OnlineSink.format: OnlineSink,
+}
+
+
+def get_sink(format=RESULTS_SINK, path=RESULTS_PATH, chunk_size=RESULTS_CHUNK_SIZE):
+    """
+    Returns a new sink of the specified format (memory, jsonl, csv, columnar,
+    or online). File sinks write to a unique directory under the path so that
+    simulations sharing a results path do not overwrite each other's series,
+    which is only created once the sink writes to it.
+    """
+    if format not in SINKS:
+        raise ImproperlyConfigured(
+            "'{}' is not a valid results sink, use one of {}".format(
+                format, ", ".join(sorted(SINKS))
+            )
+        )
+
+    if not issubclass(SINKS[format], FileSink):
+        return SINKS[format]()
+
+    return SINKS[format](chunk_size=chunk_size, root=path)
+
+
+def open_sink(data):
+    """
+    Opens a sink from the reference serialized in place of the results.
+    """
+    if data['sink'] == OnlineSink.format:
+        return OnlineSink.deserialize(data)
+    return FileSink.open(data['path'])
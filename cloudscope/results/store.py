@@ -0,0 +1,353 @@
+# cloudscope.results.store
+# Results store backed by SQLite for queries across experiments.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: store.py [] $
+
+"""
+Results store backed by SQLite for queries across experiments.
+
+The output of multisim is ingested once into normalized tables of the
+experiments and their settings, the aggregates of every experiment and of
+each of its replicas, the message counters and (optionally) the raw time
+series, indexed by the parameters of the experiments. Analyses then query
+the store rather than parsing every serialized result again.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import json
+import sqlite3
+
+from collections import OrderedDict
+
+from cloudscope.utils.serialize import JSONEncoder
+from peak.util.imports import lazyModule
+
+from .loader import load_results
+from .analysis import aggregate_replicas, aggregate_series
+
+# Perform lazy loading of analysis libraries
+pd  = lazyModule('pandas')
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS experiments (
+    id          INTEGER PRIMARY KEY,
+    simulation  TEXT,
+    version     TEXT,
+    randseed    INTEGER,
+    timesteps   INTEGER,
+    started     REAL,
+    finished    REAL,
+    UNIQUE (simulation, started, finished)
+);
+
+CREATE TABLE IF NOT EXISTS settings (
+    experiment  INTEGER NOT NULL REFERENCES experiments (id),
+    key         TEXT NOT NULL,
+    value,
+    PRIMARY KEY (experiment, key)
+);
+
+CREATE TABLE IF NOT EXISTS aggregates (
+    experiment  INTEGER NOT NULL REFERENCES experiments (id),
+    replica     TEXT,
+    name        TEXT NOT NULL,
+    value
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    experiment  INTEGER NOT NULL REFERENCES experiments (id),
+    counter     TEXT NOT NULL,
+    name        TEXT,
+    kind        TEXT,
+    count       INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS series (
+    experiment  INTEGER NOT NULL REFERENCES experiments (id),
+    name        TEXT NOT NULL,
+    idx         INTEGER NOT NULL,
+    value       TEXT
+);
+
+CREATE INDEX IF NOT EXISTS settings_parameter ON settings (key, value);
+CREATE INDEX IF NOT EXISTS aggregates_experiment ON aggregates (experiment, replica);
+CREATE INDEX IF NOT EXISTS aggregates_name ON aggregates (name);
+CREATE INDEX IF NOT EXISTS messages_experiment ON messages (experiment, counter);
+CREATE INDEX IF NOT EXISTS series_experiment ON series (name, experiment, idx);
+"""
+
+# Types stored as is, all other values are stored as JSON.
+SCALARS = (basestring, int, long, float, bool, type(None))
+
+##########################################################################
+## Helpers
+##########################################################################
+
+def encode(value):
+    """
+    Encodes values that SQLite cannot store (lists and dicts) as JSON.
+    """
+    if isinstance(value, SCALARS):
+        return value
+    return json.dumps(value, cls=JSONEncoder, sort_keys=True)
+
+
+def decode(value):
+    """
+    Inverse of encode, decoding JSON lists and dicts.
+    """
+    if isinstance(value, basestring) and value[:1] in ('[', '{'):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+class ExperimentRecord(object):
+    """
+    Extracts the rows of the tables of the store from a results object. An
+    instance is passed to the loader to extract the records in its workers.
+    """
+
+    def __init__(self, series=False):
+        self.series = series
+
+    def __call__(self, result):
+        timer = result.timer
+        if not isinstance(timer, dict):
+            timer = timer.serialize()
+
+        record = {
+            'experiment': (
+                result.simulation, result.version, result.randseed,
+                result.timesteps, timer['started'], timer['finished'],
+            ),
+            'settings': result.settings,
+            'aggregates': aggregate_series(result),
+            'replicas': aggregate_replicas(result),
+            'messages': [
+                (counter, name, kind, count)
+                for counter, names in result.messages.serialize().iteritems()
+                for name, kinds in names.iteritems()
+                for kind, count in kinds.iteritems()
+            ],
+            'series': {},
+        }
+
+        # Series aggregated online do not keep their raw values.
+        if self.series and not hasattr(result.results, 'aggregate'):
+            record['series'] = {
+                key: list(result.results[key]) for key in result.results.keys()
+            }
+
+        return record
+
+
+##########################################################################
+## Results Store
+##########################################################################
+
+class ResultsStore(object):
+    """
+    A SQLite database of results at path (in memory by default) with query
+    functions that return DataFrames of the experiments, aggregates, message
+    counts and series. Keyword arguments of the queries select experiments
+    by their settings, e.g. store.aggregates(users=2, type='raft').
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def ingest(self, path, series=False, processes=None, batch_size=None):
+        """
+        Ingests the results of a multisim output at path (or an open file),
+        parsing the results in a pool of processes (see load_results) and
+        including the raw time series if series is True. Experiments that
+        were already ingested are skipped, so an interrupted ingest can be
+        resumed. Returns the number of experiments ingested.
+        """
+        records = load_results(
+            path, rows=ExperimentRecord(series),
+            processes=processes, batch_size=batch_size,
+        )
+
+        return sum(
+            1 for record in records if self.insert(record) is not None
+        )
+
+    def add(self, result, series=False):
+        """
+        Adds a single results object to the store, returning its id.
+        """
+        return self.insert(ExperimentRecord(series)(result))
+
+    def insert(self, record):
+        """
+        Inserts the rows of an experiment record in a single transaction,
+        returning the experiment id or None if it is already in the store.
+        """
+        try:
+            with self.conn:
+                cursor = self.conn.execute(
+                    "INSERT INTO experiments (simulation, version, randseed, "
+                    "timesteps, started, finished) VALUES (?, ?, ?, ?, ?, ?)",
+                    record['experiment']
+                )
+                eid = cursor.lastrowid
+
+                self.conn.executemany(
+                    "INSERT INTO settings VALUES (?, ?, ?)",
+                    ((eid, key, encode(val)) for key, val in record['settings'].iteritems())
+                )
+
+                aggregates = [(None, record['aggregates'])]
+                aggregates.extend(record['replicas'].iteritems())
+                self.conn.executemany(
+                    "INSERT INTO aggregates VALUES (?, ?, ?, ?)",
+                    (
+                        (eid, replica, name, encode(val))
+                        for replica, values in aggregates
+                        for name, val in values.iteritems()
+                    )
+                )
+
+                self.conn.executemany(
+                    "INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+                    ((eid,) + row for row in record['messages'])
+                )
+
+                self.conn.executemany(
+                    "INSERT INTO series VALUES (?, ?, ?, ?)",
+                    (
+                        (eid, name, idx, encode(value))
+                        for name, values in record['series'].iteritems()
+                        for idx, value in enumerate(values)
+                    )
+                )
+
+        except sqlite3.IntegrityError:
+            return None
+
+        return eid
+
+    def select(self, column, params):
+        """
+        Returns the SQL condition and arguments selecting the experiment
+        ids in column by the values of their settings in params.
+        """
+        clauses, args = [], []
+        for key, value in sorted(params.iteritems()):
+            clauses.append(
+                "{} IN (SELECT experiment FROM settings WHERE key = ? AND value = ?)".format(column)
+            )
+            args.extend((key, encode(value)))
+
+        return " AND ".join(clauses) or "1", args
+
+    def query(self, sql, *args):
+        """
+        Returns a DataFrame of the rows of an arbitrary SQL query.
+        """
+        return pd.read_sql_query(sql, self.conn, params=args)
+
+    def experiments(self, **params):
+        """
+        Returns a DataFrame of the experiments and their settings.
+        """
+        where, args = self.select("id", params)
+        cursor = self.conn.execute(
+            "SELECT id, simulation, version, randseed, timesteps, started, "
+            "finished FROM experiments WHERE {} ORDER BY id".format(where), args
+        )
+
+        columns = [column[0] for column in cursor.description]
+        rows = OrderedDict((row[0], dict(zip(columns, row))) for row in cursor)
+
+        where, args = self.select("experiment", params)
+        for eid, key, value in self.conn.execute(
+            "SELECT experiment, key, value FROM settings WHERE {}".format(where), args
+        ):
+            rows[eid][key] = decode(value)
+
+        return pd.DataFrame(rows.values())
+
+    def aggregates(self, names=None, replicas=False, **params):
+        """
+        Returns a DataFrame of the aggregates (all or those named) of each
+        experiment, or of each replica of each experiment if replicas is True.
+        """
+        where, args = self.select("experiment", params)
+        if names is not None:
+            where += " AND name IN ({})".format(", ".join("?" * len(names)))
+            args.extend(names)
+
+        cursor = self.conn.execute(
+            "SELECT experiment, replica, name, value FROM aggregates "
+            "WHERE replica IS {} NULL AND {} ORDER BY experiment, replica".format(
+                "NOT" if replicas else "", where
+            ), args
+        )
+
+        rows = OrderedDict()
+        for eid, replica, name, value in cursor:
+            if (eid, replica) not in rows:
+                rows[(eid, replica)] = {'experiment': eid}
+                if replicas:
+                    rows[(eid, replica)]['replica'] = replica
+            rows[(eid, replica)][name] = decode(value)
+
+        return pd.DataFrame(rows.values())
+
+    def messages(self, counter='messages', **params):
+        """
+        Returns a DataFrame of the message counts of the counter (messages
+        by action, replicas by sender or received by recipient) by type.
+        """
+        where, args = self.select("experiment", params)
+        return self.query(
+            "SELECT experiment, name, kind, count FROM messages "
+            "WHERE counter = ? AND {} ORDER BY experiment, name, kind".format(where),
+            counter, *args
+        )
+
+    def series(self, name, **params):
+        """
+        Returns a DataFrame of the records of the raw time series of every
+        experiment, with a column per field of the records.
+        """
+        where, args = self.select("experiment", params)
+        cursor = self.conn.execute(
+            "SELECT experiment, value FROM series WHERE name = ? AND {} "
+            "ORDER BY experiment, idx".format(where), [name] + args
+        )
+
+        records = [[eid] + decode(value) for eid, value in cursor]
+        fields  = len(records[0]) - 1 if records else 0
+        return pd.DataFrame.from_records(
+            records, columns=['experiment'] + range(fields)
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM experiments").fetchone()[0]
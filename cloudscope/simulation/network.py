@@ -52,8 +52,9 @@ NORMAL     = "normal"
 WIDE_AREA  = "wide"
 LOCAL_AREA = "local"
 
-## Message data structure
-Message  = namedtuple('Message', 'source, target, value, delay')
+## Message data structure (kind is the message type classified on send)
+Message  = namedtuple('Message', 'source, target, value, delay, kind')
+Message.__new__.__defaults__ = (None,)
 
 ##########################################################################
 ## A Node implements the connectible interface
@@ -78,12 +79,19 @@ class Node(Process):
         """
         return self.network.connections[self]
 
+    def classify(self, value):
+        """
+        Returns the kind of message for the value, by default unclassified.
+        """
+        return None
+
     def pack(self, target, value):
         """
         Packs a message object with connection-specific values.
         """
         return Message(
-            self, target, value, self.connections[target].latency()
+            self, target, value, self.connections[target].latency(),
+            self.classify(value),
         )
 
     def send(self, target, value):
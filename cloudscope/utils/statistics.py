@@ -26,6 +26,7 @@ from collections import Counter
 from peak.util.imports import lazyModule
 
 # Lazy loading of optional dependencies
+np    = lazyModule('numpy')
 pylab = lazyModule('pylab')
 
 ##########################################################################
@@ -77,8 +78,11 @@ def median(data, sort=True):
 class OnlineVariance(object):
     """
     A counting class to keep track of the number of samples, the sum of
-    samples, and the sum of squares of the samples in order to compute the
-    mean, standard deviation, and variance in real time.
+    samples, and the sum of squared deviations from the mean of the samples
+    (Welford's algorithm) in order to compute the mean, standard deviation,
+    and variance in real time without the loss of precision of a running sum
+    of squares. Instances are merged exactly with Chan's parallel algorithm
+    so that summaries from workers and sharded sinks can be combined.
     """
 
     @classmethod
@@ -97,14 +101,21 @@ class OnlineVariance(object):
         instance = klass()
         instance.samples = data['samples']
         instance.total   = data['total']
-        instance.squares = data['squares']
+
+        # Older results only stored the sum of squares
+        if 'm2' in data:
+            instance.m2 = data['m2']
+        elif instance.samples > 0:
+            instance.m2 = max(
+                0.0, data['squares'] - data['total'] ** 2 / data['samples']
+            )
 
         return instance
 
     def __init__(self, iterable=None):
         self.samples = 0.0
         self.total   = 0.0
-        self.squares = 0.0
+        self.m2      = 0.0 # sum of squared deviations from the mean
 
         if iterable is not None:
             for sample in iterable:
@@ -114,9 +125,42 @@ class OnlineVariance(object):
         """
         Updates the online variance with a new sample.
         """
-        self.samples += 1.0
-        self.total   += sample
-        self.squares += sample * sample
+        samples = self.samples
+        if samples > 0:
+            delta = sample - self.total / samples
+            self.m2 += delta * delta * samples / (samples + 1.0)
+
+        self.samples = samples + 1.0
+        self.total  += sample
+
+    def update_many(self, samples):
+        """
+        Updates the online variance with an array of samples at once, using
+        numpy to summarize the batch if it is available.
+        """
+        try:
+            samples = np.asarray(samples)
+        except ImportError:
+            self += self.__class__(samples)
+            return
+
+        if samples.size == 0: return
+
+        batch = self.__class__()
+        batch.samples = float(samples.size)
+        batch.total   = float(samples.sum())
+        batch.m2      = float(((samples - batch.mean) ** 2).sum())
+        self += batch
+
+    @property
+    def squares(self):
+        """
+        The sum of squares of the samples, computed from the mean and the sum
+        of squared deviations for compatibility with the serialization.
+        """
+        if self.samples > 0:
+            return self.m2 + self.total * self.total / self.samples
+        return 0.0
 
     @property
     def mean(self):
@@ -137,10 +181,7 @@ class OnlineVariance(object):
         Computes the variance so long as the number of samples > 1.
         """
         if self.samples > 1:
-            s0 = self.samples
-            s1 = self.total
-            s2 = self.squares
-            return (s0 * s2 - s1 * s1)/(s0 * (s0 - 1))
+            return self.m2 / (self.samples - 1)
 
         return 0.0
 
@@ -167,6 +208,7 @@ class OnlineVariance(object):
             "samples": self.samples,
             "total": self.total,
             "squares": self.squares,
+            "m2": self.m2,
             "mean": self.mean,
             "variance": self.variance,
             "standard_deviation": self.standard_deviation,
@@ -177,15 +219,25 @@ class OnlineVariance(object):
 
     def __add__(self, other):
         instance = self.__class__()
-        instance.samples = self.samples + other.samples
-        instance.total   = self.total + other.total
-        instance.squares = self.squares + other.squares
+        instance += self
+        instance += other
         return instance
 
     def __iadd__(self, other):
-        self.samples += other.samples
-        self.total += other.total
-        self.squares += other.squares
+        # Chan et al. parallel combination of the squared deviations
+        if other.samples == 0: return self
+        if self.samples == 0:
+            self.samples = other.samples
+            self.total   = other.total
+            self.m2      = other.m2
+            return self
+
+        delta   = other.mean - self.mean
+        samples = self.samples + other.samples
+
+        self.m2 += other.m2 + delta * delta * self.samples * other.samples / samples
+        self.samples = samples
+        self.total  += other.total
         return self
 
     def __eq__(self, other):
@@ -195,9 +247,12 @@ class OnlineVariance(object):
         return (
             self.samples == other.samples and
             self.total == other.total and
-            self.squares == other.squares
+            self.m2 == other.m2
         )
 
+    def __ne__(self, other):
+        return not self == other
+
     def __str__(self):
         return (
             "Distribution of {} samples with "
@@ -211,6 +266,217 @@ class OnlineVariance(object):
             self.__class__.__name__, self.samples, self.mean, self.std
         )
 
+##########################################################################
+## Quantile Sketch
+##########################################################################
+
+class QuantileSketch(object):
+    """
+    A mergeable, bounded-memory sketch of a distribution of non-negative
+    samples (e.g. latencies) that estimates quantiles to within a relative
+    accuracy. Samples are counted in logarithmically sized buckets, such
+    that every bucket covers values within the relative accuracy of the
+    bucket's estimate. Sketches with the same accuracy merge exactly by
+    adding the bucket counts. If more than max_buckets are required, the
+    lowest buckets are collapsed, losing accuracy on the smallest values
+    rather than the tail that is usually of interest.
+    """
+
+    ACCURACY    = 0.01
+    MAX_BUCKETS = 2048
+    QUANTILES   = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('p999', 0.999))
+
+    @classmethod
+    def deserialize(klass, data):
+        """
+        Inverse of the serialization function
+        """
+        for key in ('accuracy', 'samples', 'zeros', 'buckets'):
+            if key not in data:
+                raise TypeError(
+                    "Cannot deserialize an {} without {}".format(
+                        klass.__name__, key
+                    )
+                )
+
+        instance = klass(
+            accuracy=data['accuracy'],
+            max_buckets=data.get('max_buckets', klass.MAX_BUCKETS),
+        )
+        instance.samples = data['samples']
+        instance.zeros   = data['zeros']
+        instance.minimum = data.get('minimum')
+        instance.maximum = data.get('maximum')
+        instance.buckets = Counter({
+            int(key): count for key, count in data['buckets'].items()
+        })
+
+        return instance
+
+    def __init__(self, iterable=None, accuracy=ACCURACY, max_buckets=MAX_BUCKETS):
+        self.accuracy    = accuracy
+        self.max_buckets = max_buckets
+        self.gamma       = (1.0 + accuracy) / (1.0 - accuracy)
+        self.log_gamma   = math.log(self.gamma)
+
+        self.samples = 0
+        self.zeros   = 0         # samples that are zero (or negative)
+        self.minimum = None
+        self.maximum = None
+        self.buckets = Counter() # bucket index to count of samples
+
+        if iterable is not None:
+            for sample in iterable:
+                self.update(sample)
+
+    def update(self, sample):
+        """
+        Updates the sketch with a new sample.
+        """
+        self.samples += 1
+        if self.minimum is None or sample < self.minimum: self.minimum = sample
+        if self.maximum is None or sample > self.maximum: self.maximum = sample
+
+        if sample <= 0:
+            self.zeros += 1
+            return
+
+        self.buckets[int(math.ceil(math.log(sample) / self.log_gamma))] += 1
+        if len(self.buckets) > self.max_buckets:
+            self.collapse()
+
+    def update_many(self, samples):
+        """
+        Updates the sketch with an array of samples at once, using numpy to
+        compute the buckets of the samples if it is available.
+        """
+        try:
+            samples = np.asarray(samples)
+        except ImportError:
+            for sample in samples:
+                self.update(sample)
+            return
+
+        if samples.size == 0: return
+
+        low, high = samples.min().item(), samples.max().item()
+        if self.minimum is None or low < self.minimum: self.minimum = low
+        if self.maximum is None or high > self.maximum: self.maximum = high
+
+        positive = samples[samples > 0]
+        self.samples += samples.size
+        self.zeros   += samples.size - positive.size
+
+        keys = np.ceil(np.log(positive.astype(float)) / self.log_gamma).astype(int)
+        keys, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] += count
+
+        if len(self.buckets) > self.max_buckets:
+            self.collapse()
+
+    def collapse(self):
+        """
+        Collapses the lowest buckets into the lowest remaining bucket.
+        """
+        keys  = sorted(self.buckets)
+        extra = keys[:len(keys) - self.max_buckets]
+        self.buckets[keys[len(extra)]] += sum(self.buckets.pop(key) for key in extra)
+
+    def quantile(self, q):
+        """
+        Returns the estimate of the value at the quantile q in [0, 1].
+        """
+        if self.samples == 0: return None
+
+        rank = q * (self.samples - 1)
+        seen = self.zeros
+        if seen > rank:
+            return max(self.minimum, 0)
+
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # The estimate is the value with the least relative error
+                value = 2.0 * self.gamma ** key / (self.gamma + 1.0)
+                return min(max(value, self.minimum), self.maximum)
+
+        return self.maximum
+
+    def percentiles(self):
+        """
+        Returns a dictionary of the estimates of the p50, p95, p99 and p999.
+        """
+        return {
+            label: self.quantile(q) for label, q in self.QUANTILES
+        }
+
+    def serialize(self):
+        data = {
+            "accuracy": self.accuracy,
+            "max_buckets": self.max_buckets,
+            "samples": self.samples,
+            "zeros": self.zeros,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "buckets": dict(self.buckets),
+        }
+        data.update(self.percentiles())
+        return data
+
+    def __len__(self):
+        return self.samples
+
+    def __add__(self, other):
+        instance = self.__class__(
+            accuracy=self.accuracy, max_buckets=self.max_buckets
+        )
+        instance += self
+        instance += other
+        return instance
+
+    def __iadd__(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError("cannot merge sketches of different accuracy")
+
+        self.samples += other.samples
+        self.zeros   += other.zeros
+        self.buckets.update(other.buckets)
+
+        for attr, func in (('minimum', min), ('maximum', max)):
+            values = [v for v in (getattr(self, attr), getattr(other, attr)) if v is not None]
+            setattr(self, attr, func(values) if values else None)
+
+        if len(self.buckets) > self.max_buckets:
+            self.collapse()
+        return self
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return False
+
+        return (
+            self.accuracy == other.accuracy and
+            self.samples == other.samples and
+            self.zeros == other.zeros and
+            self.buckets == other.buckets
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __str__(self):
+        return (
+            "Sketch of {} samples with {} median and {} 99th percentile"
+        ).format(
+            self.samples, self.quantile(0.5), self.quantile(0.99)
+        )
+
+    def __repr__(self):
+        return "<{}: n={}, α={}>".format(
+            self.__class__.__name__, self.samples, self.accuracy
+        )
+
 ##########################################################################
 ## Frequency Distribution
 ##########################################################################
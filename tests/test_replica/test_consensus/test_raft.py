@@ -0,0 +1,367 @@
+# tests.test_replica.test_consensus.test_raft
+# Testing the Raft consensus replica.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: test_raft.py [] $
+
+"""
+Testing the Raft consensus replica.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import unittest
+
+from itertools import combinations
+
+from cloudscope.replica import Replica, State, ReadPolicy, WritePolicy
+from cloudscope.replica.consensus.raft import RaftReplica
+from cloudscope.replica.consensus.raft import ReadIndex, ReadIndexResponse
+from cloudscope.replica.consensus.raft import PreVote, PreVoteResponse
+from cloudscope.replica.consensus.raft import VoteResponse
+from cloudscope.replica.consensus.raft import AppendEntries, AEResponse
+from cloudscope.replica.store.log import LogEntry
+from cloudscope.simulation.main import ConsistencySimulation
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+##########################################################################
+## RaftReplica Tests
+##########################################################################
+
+class RaftReplicaTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = ConsistencySimulation()
+        Replica.counter.reset()
+
+        self.alpha = RaftReplica(self.sim, pre_vote=True, check_quorum=True)
+        self.bravo = RaftReplica(self.sim)
+        self.charlie = RaftReplica(self.sim)
+        self.sim.replicas = [self.alpha, self.bravo, self.charlie]
+
+        for source, target in combinations(self.sim.replicas, 2):
+            self.sim.network.add_connection(source, target, True)
+
+    def tearDown(self):
+        self.alpha = None
+        self.bravo = None
+        self.charlie = None
+        self.sim = None
+
+    def message(self, source, value):
+        """
+        Helper to create a message from the source with the rpc value.
+        """
+        return mock.MagicMock(source=source, value=value)
+
+    def test_pre_vote(self):
+        """
+        Test that elections are only started after a successful pre-vote
+        """
+        with mock.patch.object(self.alpha, 'send') as send:
+            self.alpha.on_election_timeout()
+            self.assertEqual(send.call_count, 2)
+            self.assertIsInstance(send.call_args[0][1], PreVote)
+
+        # The term is not incremented by the poll
+        self.assertEqual(self.alpha.state, State.FOLLOWER)
+        self.assertEqual(self.alpha.currentTerm, 0)
+
+        # Pre-votes are denied by replicas that have heard from a leader
+        rpc = PreVote(1, self.alpha.id, 0, 0)
+        with mock.patch.object(self.bravo, 'send') as send:
+            self.bravo.on_pre_vote_rpc(self.message(self.alpha, rpc))
+            self.assertTrue(send.call_args[0][1].voteGranted)
+
+            self.bravo.leader = self.charlie
+            self.bravo.heard  = self.sim.env.now
+            self.bravo.on_pre_vote_rpc(self.message(self.alpha, rpc))
+            self.assertFalse(send.call_args[0][1].voteGranted)
+
+        # A majority of pre-votes starts the election
+        with mock.patch.object(self.alpha, 'send'):
+            response = PreVoteResponse(0, True)
+            self.alpha.on_pre_vote_response_rpc(self.message(self.bravo, response))
+            self.assertEqual(self.alpha.state, State.CANDIDATE)
+            self.assertEqual(self.alpha.currentTerm, 1)
+
+            response = VoteResponse(1, True)
+            self.alpha.on_vote_response_rpc(self.message(self.charlie, response))
+            self.assertEqual(self.alpha.state, State.LEADER)
+
+        election = self.sim.results.results['election']
+        self.assertEqual(election, [(self.alpha.id, 1, 0, 0, 2, True)])
+
+    def test_check_quorum(self):
+        """
+        Test that a leader steps down without contact from a quorum
+        """
+        self.alpha.state = State.LEADER
+        self.assertTrue(self.alpha.has_quorum())
+
+        # Contact from a single follower maintains the quorum
+        self.alpha.elected = -300
+        self.alpha.contacted[self.bravo] = -100
+        self.assertTrue(self.alpha.has_quorum())
+
+        self.alpha.contacted[self.bravo] = -200
+        self.assertFalse(self.alpha.has_quorum())
+
+        self.alpha.on_heartbeat_timeout()
+        self.assertEqual(self.alpha.state, State.FOLLOWER)
+        self.assertIsNone(self.alpha.leader)
+
+    def test_lease(self):
+        """
+        Test that leases are held while a quorum has been heard from
+        """
+        self.alpha.read_policy = ReadPolicy.LEASE
+        self.alpha.state = State.LEADER
+        self.assertFalse(self.alpha.has_lease())
+        self.assertFalse(self.alpha.in_lease())
+
+        self.alpha.contacted[self.bravo] = 0
+        self.assertTrue(self.alpha.has_lease())
+        self.assertTrue(self.alpha.in_lease())
+
+        self.alpha.contacted[self.bravo] = -self.alpha.lease
+        self.assertFalse(self.alpha.has_lease())
+
+        # Followers are in the lease if they heard from the leader recently
+        self.bravo.read_policy = ReadPolicy.LEASE
+        self.bravo.leader = self.alpha
+        self.bravo.heard  = 0
+        self.assertFalse(self.bravo.has_lease())
+        self.assertTrue(self.bravo.in_lease())
+
+        self.bravo.heard = -self.bravo.lease
+        self.assertFalse(self.bravo.in_lease())
+
+        self.bravo.heard = 0
+        self.bravo.read_policy = ReadPolicy.COMMIT
+        self.assertFalse(self.bravo.in_lease())
+
+    def test_confirm_reads(self):
+        """
+        Test that reads wait for a quorum to confirm leadership
+        """
+        self.alpha.state = State.LEADER
+        local, remote = mock.MagicMock(), mock.MagicMock()
+
+        with mock.patch.object(self.alpha, 'send') as send:
+            with mock.patch.object(self.alpha, 'complete_read') as complete:
+                self.alpha.confirm_read(local)
+                self.alpha.confirm_read(remote, self.charlie)
+
+                # Only the first read sends a heartbeat round
+                self.assertEqual(send.call_count, 2)
+                self.alpha.confirm_reads()
+                self.assertEqual(len(self.alpha.reads), 2)
+                self.assertFalse(complete.called)
+
+                self.alpha.contacted[self.bravo] = 0
+                self.alpha.confirm_reads()
+                self.assertEqual(self.alpha.reads, [])
+                complete.assert_called_once_with(local)
+
+            target, rpc = send.call_args[0]
+            self.assertEqual(target, self.charlie)
+            self.assertEqual(rpc, ReadIndexResponse(0, remote, True, 0))
+
+    def test_read_index(self):
+        """
+        Test a follower read index round trip through the leader
+        """
+        self.alpha.state = State.LEADER
+        self.bravo.leader = self.alpha
+        self.bravo.read_policy = ReadPolicy.QUORUM
+        access = mock.MagicMock()
+
+        # The follower requests a read index from the leader
+        with mock.patch.object(self.bravo, 'send') as send:
+            self.bravo.send_read_index(access)
+            target, rpc = send.call_args[0]
+            self.assertEqual(target, self.alpha)
+            self.assertEqual(rpc, ReadIndex(0, access, False))
+
+        # The leader responds once a quorum acknowledges a heartbeat
+        with mock.patch.object(self.alpha, 'send') as send:
+            self.alpha.on_read_index_rpc(self.message(self.bravo, rpc))
+            self.assertEqual(len(self.alpha.reads), 1)
+
+            ack = mock.MagicMock(source=self.bravo, delay=0)
+            ack.value = mock.MagicMock(term=0, success=True, lastLogIndex=0)
+            self.alpha.update_follower(ack)
+
+            target, rpc = send.call_args[0]
+            self.assertEqual(target, self.bravo)
+            self.assertEqual(rpc, ReadIndexResponse(0, access, True, 0))
+
+        # The follower completes the read once the read index is committed
+        with mock.patch.object(self.bravo, 'complete_read') as complete:
+            self.bravo.log.commitIndex = -1
+            self.bravo.on_read_index_response_rpc(self.message(self.alpha, rpc))
+            self.assertFalse(complete.called)
+
+            self.bravo.log.commitIndex = 0
+            self.bravo.complete_waiting()
+            complete.assert_called_once_with(access)
+            self.assertEqual(self.bravo.waiting, [])
+
+        # Failed read indices drop the read
+        rpc = ReadIndexResponse(0, access, False, 0)
+        self.bravo.on_read_index_response_rpc(self.message(self.alpha, rpc))
+        access.drop.assert_called_once_with()
+
+    def test_pipelined_acks(self):
+        """
+        Test that acknowledgments drain a full window without heartbeats
+        """
+        self.alpha.append_batch  = 1
+        self.alpha.append_window = 2
+        self.alpha.state = State.LEADER
+        for _ in xrange(4):
+            self.alpha.log.append(mock.MagicMock(), self.alpha.currentTerm)
+
+        with mock.patch.object(self.alpha, 'send') as send:
+            self.alpha.send_append_entries(self.bravo)
+            self.assertEqual(send.call_count, 2)
+            self.assertEqual(len(self.alpha.inflight[self.bravo]), 2)
+
+            # Each acknowledgment opens the window for the next batch
+            for idx in xrange(1, 5):
+                ack = mock.MagicMock(source=self.bravo, delay=0)
+                ack.value = mock.MagicMock(term=0, success=True, lastLogIndex=idx)
+                self.alpha.update_follower(ack)
+
+                self.assertEqual(send.call_count, min(idx + 2, 4))
+                self.assertEqual(self.alpha.matchIndex[self.bravo], idx)
+
+            entries = [call[0][1].entries for call in send.call_args_list]
+            self.assertEqual(
+                [entry[0] for batch in entries for entry in batch],
+                [entry[0] for entry in self.alpha.log[1:]]
+            )
+            self.assertEqual(self.alpha.inflight[self.bravo], [])
+
+    def test_batch_same_tick(self):
+        """
+        Test that writes in the same tick as a batch flush start a new batch
+        """
+        leader = self.alpha
+        leader.write_policy = WritePolicy.BATCH
+        leader.batch_size   = 2
+        leader.batch_delay  = leader.batch.delay = 10
+        leader.state = State.LEADER
+
+        def writes():
+            yield self.sim.env.timeout(5)
+            for _ in xrange(3):
+                leader.write('A')
+
+        flushes = []
+        def update(key, value):
+            if key == 'write batch':
+                flushes.append((value[4], value[2]))
+
+        patch_send = mock.patch.object(leader, 'send_append_entries', return_value=0)
+        patch_update = mock.patch.object(self.sim.results, 'update', side_effect=update)
+        with patch_send, patch_update:
+            self.sim.env.process(writes())
+            self.sim.env.run(until=50)
+
+        self.assertEqual(flushes, [(5, 2), (15, 1)])
+
+    def test_follower_pipelined_entries(self):
+        """
+        Test that followers accept reordered, resent and conflicting batches
+        """
+        entries = [LogEntry(mock.MagicMock(), 0) for _ in xrange(5)]
+
+        def append(prev, batch, commit, term=0):
+            rpc = AppendEntries(term, self.alpha.id, prev, 0, batch, commit)
+            with mock.patch.object(self.bravo, 'send') as send:
+                self.bravo.on_append_entries_rpc(self.message(self.alpha, rpc))
+            return send.call_args[0][1]
+
+        # A batch that arrives ahead of the previous batch is rejected
+        response = append(2, entries[2:4], 0)
+        self.assertFalse(response.success)
+        self.assertEqual(response.lastLogIndex, 0)
+
+        self.assertTrue(append(0, entries[0:2], 0).success)
+        response = append(2, entries[2:4], 0)
+        self.assertTrue(response.success)
+        self.assertEqual(response.lastLogIndex, 4)
+
+        response = append(4, entries[4:], 3)
+        self.assertEqual(response.lastLogIndex, 5)
+        self.assertEqual(self.bravo.log.commitIndex, 3)
+
+        # Resent entries already in the log are skipped
+        response = append(0, entries[0:2], 3)
+        self.assertEqual(response.lastLogIndex, 2)
+        self.assertEqual(self.bravo.log.lastApplied, 5)
+        self.assertEqual(entries[0].version.update.call_count, 1)
+
+        # Heartbeats anchored behind the commit index do not move it back
+        response = append(2, [], 4)
+        self.assertTrue(response.success)
+        self.assertEqual(self.bravo.log.commitIndex, 3)
+
+        # Conflicting entries truncate the rest of the log
+        conflict = LogEntry(mock.MagicMock(), 1)
+        response = append(3, [conflict], 3, term=1)
+        self.assertEqual(response.lastLogIndex, 4)
+        self.assertEqual(self.bravo.log.lastApplied, 4)
+        self.assertEqual(self.bravo.log[4], conflict)
+        self.assertEqual(self.bravo.log.commitIndex, 3)
+
+    def test_pipelined_gap(self):
+        """
+        Test that the batches rejected behind a gap are only resent once
+        """
+        self.alpha.append_batch  = 1
+        self.alpha.append_window = 4
+        self.alpha.state = State.LEADER
+        for _ in xrange(5):
+            self.alpha.log.append(mock.MagicMock(), self.alpha.currentTerm)
+
+        def respond(success, index):
+            rpc = AEResponse(0, success, index, None)
+            self.alpha.update_follower(
+                mock.MagicMock(source=self.bravo, value=rpc, delay=0)
+            )
+
+        with mock.patch.object(self.alpha, 'send') as send:
+            self.alpha.send_append_entries(self.bravo)
+            self.assertEqual(send.call_count, 4)
+
+            # The first batch is lost so the follower rejects the others
+            for _ in xrange(3):
+                respond(False, 0)
+            self.assertEqual(send.call_count, 8)
+            self.assertEqual(
+                [call[0][1].prevLogIndex for call in send.call_args_list[4:]],
+                [0, 1, 2, 3]
+            )
+
+            # The resent batches are acknowledged, rejections are now stale
+            respond(True, 4)
+            self.assertEqual(send.call_count, 9)
+            respond(False, 0)
+            self.assertEqual(send.call_count, 9)
+
+            # A later gap is resent again
+            respond(False, 4)
+            self.assertEqual(send.call_count, 10)
+            self.assertEqual(send.call_args[0][1].prevLogIndex, 4)
@@ -0,0 +1,222 @@
+# tests.test_replica.test_consensus.test_sharded
+# Testing the sharded Raft replica and its Raft groups.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: test_sharded.py [] $
+
+"""
+Testing the sharded Raft replica and its Raft groups.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import logging
+import unittest
+
+from itertools import combinations
+from collections import Counter
+
+from cloudscope.config import settings
+from cloudscope.replica import Replica, State
+from cloudscope.exceptions import ImproperlyConfigured
+from cloudscope.replica.consensus.sharded import ShardedRaftReplica
+from cloudscope.simulation.workload.multi import WorkloadCollection
+from cloudscope.simulation.main import ConsistencySimulation
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+##########################################################################
+## Fixtures
+##########################################################################
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "..", "fixtures")
+RAFT     = os.path.join(FIXTURES, "raft.json")
+
+##########################################################################
+## ShardedRaftReplica Tests
+##########################################################################
+
+class ShardedRaftReplicaTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = ConsistencySimulation()
+        Replica.counter.reset()
+
+        self.sim.replicas = [
+            ShardedRaftReplica(self.sim, num_shards=4, election_timeout=[100, 300])
+            for _ in xrange(3)
+        ]
+
+        for source, target in combinations(self.sim.replicas, 2):
+            self.sim.network.add_connection(source, target, True)
+
+        self.alpha, self.bravo, self.charlie = self.sim.replicas
+
+    def tearDown(self):
+        self.alpha = None
+        self.bravo = None
+        self.charlie = None
+        self.sim = None
+
+    def test_groups(self):
+        """
+        Test that every replica hosts a member of each shard's group
+        """
+        for replica in self.sim.replicas:
+            self.assertEqual(len(replica.shards), 4)
+            for shard, group in enumerate(replica.shards):
+                self.assertEqual(group.shard, shard)
+                self.assertEqual(group.id, replica.id)
+                self.assertEqual(group.election_timeout, [100, 300])
+
+        # Groups only connect to the members of the same shard
+        group = self.alpha.shards[2]
+        self.assertEqual(
+            set(group.neighbors()),
+            {self.bravo.shards[2], self.charlie.shards[2]}
+        )
+
+    def test_hash_partition(self):
+        """
+        Test that objects are routed to shards by a stable hash
+        """
+        names = [
+            "".join(chars) for chars in combinations("ABCDEFGH", 2)
+        ]
+
+        for name in names:
+            shard = self.alpha.shard_for(name)
+            self.assertIn(shard, range(4))
+            self.assertEqual(shard, self.bravo.shard_for(name))
+
+        self.assertEqual(len(set(map(self.alpha.shard_for, names))), 4)
+
+        with self.assertRaises(ImproperlyConfigured):
+            ShardedRaftReplica(self.sim, shard_partition='random')
+
+    def test_range_partition(self):
+        """
+        Test that objects are routed to ranges of the sorted namespace
+        """
+        self.sim.workload = WorkloadCollection(
+            mock.MagicMock(objects=list("ABCDEFGH")),
+            mock.MagicMock(objects=["E", "F", "AA", "AB"]),
+        )
+
+        replica = ShardedRaftReplica(self.sim, num_shards=4, shard_partition='range')
+        names = ["A", "B", "C", "D", "E", "F", "G", "H", "AA", "AB"]
+        shards = [replica.shard_for(name) for name in names]
+
+        self.assertEqual(shards, sorted(shards))
+        self.assertEqual(Counter(shards), {0: 3, 1: 2, 2: 3, 3: 2})
+
+        # Names outside the namespace fall into the nearest range
+        self.assertEqual(replica.shard_for("AAA"), 3)
+
+    def test_range_partition_fallback(self):
+        """
+        Test that range partitioning hashes without a known namespace
+        """
+        replica = ShardedRaftReplica(self.sim, num_shards=4, shard_partition='range')
+        self.assertEqual(replica.get_namespace(), [])
+
+        hashed = ShardedRaftReplica(self.sim, num_shards=4)
+        for name in ("A", "B", "ZZ", "HELLO"):
+            self.assertEqual(replica.shard_for(name), hashed.shard_for(name))
+
+    def test_routing(self):
+        """
+        Test that accesses are routed to the group of the object's shard
+        """
+        for name in ("A", "B", "C", "D"):
+            shard = self.alpha.shard_for(name)
+            access = mock.MagicMock()
+            access.name = name
+
+            with mock.patch.object(self.alpha.shards[shard], 'write') as write:
+                self.alpha.write(access)
+                write.assert_called_once_with(access)
+
+            with mock.patch.object(self.alpha.shards[shard], 'read') as read:
+                self.alpha.read(name)
+                read.assert_called_once_with(name)
+
+    def test_balanced_leadership(self):
+        """
+        Test that preferred leaders are balanced and time out first
+        """
+        preferred = Counter()
+        for shard in xrange(4):
+            groups = [replica.shards[shard] for replica in self.sim.replicas]
+            leaders = [group for group in groups if group.preferred]
+            self.assertEqual(len(leaders), 1)
+            preferred[leaders[0].host] += 1
+
+        self.assertEqual(sorted(preferred.values()), [1, 1, 2])
+
+        # Preferred leaders draw election timeouts from the earlier half
+        for group in self.alpha.shards:
+            group.run().next()
+            low, high = group.timeout._delay.range
+            if group.preferred:
+                self.assertEqual((low, high), (100, 200))
+            else:
+                self.assertEqual((low, high), (200, 300))
+
+    def test_independent_groups(self):
+        """
+        Test that each shard has its own leader and log
+        """
+        self.alpha.shards[0].state = State.LEADER
+        self.bravo.shards[1].state = State.LEADER
+
+        self.assertEqual(self.alpha.shards[0].state, State.LEADER)
+        self.assertEqual(self.alpha.shards[1].state, State.FOLLOWER)
+        self.assertEqual(self.bravo.shards[0].state, State.FOLLOWER)
+        self.assertEqual(self.bravo.shards[1].state, State.LEADER)
+
+        self.assertEqual(
+            set(self.alpha.shards[0].nextIndex),
+            {self.bravo.shards[0], self.charlie.shards[0]}
+        )
+        self.assertIsNot(self.alpha.shards[0].log, self.alpha.shards[1].log)
+
+    def test_sharded_simulation(self):
+        """
+        Run a sharded raft simulation committing writes in every shard
+        """
+        logging.disable(logging.CRITICAL)
+        patch = mock.patch.object(settings.simulation, 'integration', 'sharded')
+
+        try:
+            with patch, open(RAFT, 'r') as fobj:
+                sim = ConsistencySimulation.load(
+                    fobj, max_sim_time=50000, objects=10, users=3
+                )
+                sim.run()
+        finally:
+            logging.disable(logging.NOTSET)
+
+        replicas = [
+            replica for replica in sim.replicas
+            if isinstance(replica, ShardedRaftReplica)
+        ]
+        self.assertGreater(len(replicas), 0)
+        shards = set(xrange(replicas[0].n_shards))
+
+        # Every shard elects a leader and commits writes independently
+        leaders = {shard for _, shard, _ in sim.results.results['shard leader']}
+        self.assertEqual(leaders, shards)
+
+        commits = sim.results.results['shard commit latency']
+        self.assertEqual({record[1] for record in commits}, shards)
+        for _, _, _, created, committed in commits:
+            self.assertGreaterEqual(committed, created)
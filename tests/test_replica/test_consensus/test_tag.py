@@ -0,0 +1,215 @@
+# tests.test_replica.test_consensus.test_tag
+# Testing the tag consensus replica and its ownership helpers.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: test_tag.py [] $
+
+"""
+Testing the tag consensus replica and its ownership helpers.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import unittest
+
+from cloudscope.replica import Replica, State
+from cloudscope.replica.consensus.tag import TagReplica
+from cloudscope.replica.consensus.tag import AEResponse, LogState, Reason
+from cloudscope.replica.consensus.tag import AppendEntries, TagResponse
+from cloudscope.simulation.main import ConsistencySimulation
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+##########################################################################
+## TagReplica Tests
+##########################################################################
+
+class TagReplicaTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = ConsistencySimulation()
+        Replica.counter.reset()
+
+        self.alpha = TagReplica(self.sim)
+        self.bravo = TagReplica(self.sim)
+        self.sim.replicas = [self.alpha, self.bravo]
+
+    def tearDown(self):
+        self.alpha = None
+        self.bravo = None
+        self.sim = None
+
+    def test_ownership_index(self):
+        """
+        Test that the object to owner index follows view updates
+        """
+        self.alpha.update_view(self.alpha, {'A', 'B'})
+        self.alpha.update_view(self.bravo, {'C'})
+
+        self.assertTrue(self.alpha.owns('A'))
+        self.assertFalse(self.alpha.owns('C'))
+        self.assertIs(self.alpha.find_owner('B'), self.alpha)
+        self.assertIs(self.alpha.find_owner('C'), self.bravo)
+        self.assertIsNone(self.alpha.find_owner('D'))
+
+        # Releasing and acquiring only changes the affected objects
+        self.alpha.update_view(self.alpha, {'B', 'D'})
+        self.assertIsNone(self.alpha.find_owner('A'))
+        self.assertIs(self.alpha.find_owner('D'), self.alpha)
+        self.assertEqual(self.alpha.view[self.alpha], {'B', 'D'})
+
+        # An ownership change by another owner is not undone by a release
+        self.alpha.update_view(self.bravo, {'C', 'B'})
+        self.alpha.update_view(self.alpha, {'D'})
+        self.assertIs(self.alpha.find_owner('B'), self.bravo)
+
+        # Releasing everything removes the owner from the index
+        self.alpha.update_view(self.bravo, set())
+        self.assertIsNone(self.alpha.find_owner('C'))
+        self.assertEqual(set(self.alpha.owners.keys()), {'D'})
+
+    def test_predict_tag(self):
+        """
+        Test the working set prediction from recent accesses
+        """
+        replica = TagReplica(self.sim, tag_batch_size=3, working_set=['W'])
+        for name in ('A', 'B', 'C', 'D'):
+            replica.touch(name)
+
+        self.assertEqual(list(replica.recent), ['B', 'C', 'D'])
+        self.assertEqual(replica.predict_tag('X'), {'X', 'W', 'D'})
+
+        # Objects owned by other replicas are not requested
+        replica.update_view(self.bravo, {'W'})
+        self.assertEqual(replica.predict_tag('X'), {'X', 'D', 'C'})
+
+        # The default batch size only requests the accessed object
+        self.alpha.touch('A')
+        self.assertEqual(self.alpha.predict_tag('B'), {'B'})
+
+    def test_batched_acquisition(self):
+        """
+        Test that batching the working set reduces the tag acquisitions
+        """
+        def acquisitions(batch_size):
+            sim = ConsistencySimulation()
+            alpha = TagReplica(sim, tag_batch_size=batch_size, working_set=['A', 'B'])
+            bravo = TagReplica(sim)
+            sim.replicas = [alpha, bravo]
+            sim.network.add_connection(alpha, bravo, True, latency=50)
+
+            def accesses():
+                alpha.write('A')
+                yield sim.env.timeout(500)
+                alpha.write('B')
+
+            results = []
+            def update(key, value):
+                results.append(key)
+
+            with mock.patch.object(sim.results, 'update', side_effect=update):
+                sim.env.process(accesses())
+                sim.env.run(until=1000)
+
+            return results.count('tag acquisition'), results.count('prefetched access')
+
+        # Only accesses served by a prefetched object save a round trip
+        self.assertEqual(acquisitions(1), (2, 0))
+        self.assertEqual(acquisitions(2), (1, 1))
+
+    def test_pending_access_queue(self):
+        """
+        Test that pending accesses wait for ownership without timers
+        """
+        read  = mock.MagicMock(type='read')
+        read.name  = 'A'
+        write = mock.MagicMock(type='write')
+        write.name = 'B'
+
+        with mock.patch.object(self.alpha, 'acquire') as acquire:
+            self.alpha.enqueue(read)
+            self.alpha.enqueue(write)
+            self.assertEqual(acquire.call_count, 2)
+
+        self.assertEqual(set(self.alpha.pending), {'A', 'B'})
+
+        # Only the accesses of objects with an owner are serviced
+        self.alpha.update_view(self.alpha, {'A'})
+        patch_read    = mock.patch.object(self.alpha, 'read')
+        patch_acquire = mock.patch.object(self.alpha, 'acquire')
+        with patch_read as retry, patch_acquire as acquire:
+            self.alpha.service()
+            retry.assert_called_once_with(read)
+            acquire.assert_called_once_with({'B'})
+
+        self.assertEqual(set(self.alpha.pending), {'B'})
+
+    def test_denied_objects_wait(self):
+        """
+        Test that denied objects are not requested until their owner sends entries
+        """
+        self.sim.network.add_connection(self.alpha, self.bravo, True)
+
+        read = mock.MagicMock(type='read')
+        read.name = 'B'
+
+        patch_send    = mock.patch.object(self.alpha, 'send')
+        patch_update  = mock.patch.object(self.sim.results, 'update')
+        patch_acquire = mock.patch.object(self.alpha, 'acquire')
+
+        with patch_send, patch_update, patch_acquire as acquire:
+            self.alpha.pending['B'].append((read, 0))
+            self.alpha.send_tag_request(frozenset(['A', 'B']))
+
+            # The owner of the denied object is still unknown to us
+            response = TagResponse(self.alpha.epoch, True, {'B': self.bravo})
+            self.alpha.on_tag_response_rpc(mock.MagicMock(source=self.bravo, value=response))
+            self.assertEqual(self.alpha.view[self.alpha], {'A'})
+            self.assertEqual(self.alpha.blocked, {'B': self.bravo})
+
+            # Accesses of the denied object do not request it again
+            self.alpha.service()
+            self.alpha.enqueue(read)
+            self.assertFalse(acquire.called)
+
+            # Until the owner's append entries show that it was released
+            entries = AppendEntries(self.alpha.epoch, self.bravo, {}, {})
+            self.alpha.on_append_entries_rpc(mock.MagicMock(source=self.bravo, value=entries))
+            self.assertEqual(self.alpha.blocked, {})
+            acquire.assert_called_once_with({'B'})
+
+    def test_repeated_log_rejections(self):
+        """
+        Test that log rejections do not decrement next index past the match
+        """
+        self.sim.network.add_connection(self.alpha, self.bravo, True)
+        log = self.alpha.log['A']
+        for _ in xrange(3):
+            log.append(mock.MagicMock(), self.alpha.epoch)
+
+        self.alpha.update_view(self.alpha, {'A'})
+        self.alpha.state = State.OWNER
+
+        key = (self.bravo, 'A')
+        self.assertEqual(self.alpha.nextIndex[key], 4)
+        self.alpha.matchIndex[key] = 1
+
+        rpc = AEResponse(
+            self.alpha.epoch, {'A': False}, {'A': LogState(0, 0, 0)}, Reason.LOG
+        )
+
+        with mock.patch.object(self.alpha, 'send') as send:
+            for _ in xrange(5):
+                self.alpha.on_ae_response_rpc(mock.MagicMock(source=self.bravo, value=rpc))
+                self.assertEqual(self.alpha.nextIndex[key], 2)
+
+            self.assertEqual(send.call_count, 5)
+            self.assertEqual(send.call_args[0][1].entries['A'], log[2:])
@@ -19,7 +19,7 @@ Testing for the methods and properties of eventual replicas.
 
 import unittest
 
-from cloudscope.replica import Replica
+from cloudscope.replica import Replica, AntiEntropy
 from cloudscope.replica.eventual import *
 from cloudscope.simulation.main import ConsistencySimulation
 from cloudscope.replica.store.vcs import Version, FederatedVersion
@@ -37,20 +37,330 @@ except ImportError:
 
 class EventualReplicaTests(unittest.TestCase):
 
-    # TODO: Implement these tests!
-
     def setUp(self):
         self.sim = ConsistencySimulation()
         Replica.counter.reset()
 
+        self.alpha = EventualReplica(self.sim, anti_entropy_mode='digest')
+        self.bravo = EventualReplica(self.sim, anti_entropy_mode='digest')
+        self.sim.replicas = [self.alpha, self.bravo]
+
     def tearDown(self):
+        self.alpha = None
+        self.bravo = None
         self.sim = None
 
+    def test_digest_response(self):
+        """
+        Test that a digest response only contains differing entries
+        """
+        Foo = Version.new('Foo')
+        Bar = Version.new('Bar')
+        Baz = Version.new('Baz')
+
+        foo1 = Foo(self.alpha)
+        foo2 = foo1.nextv(self.alpha)
+        bar1 = Bar(self.alpha)
+        bar2 = bar1.nextv(self.bravo)
+        baz1 = Baz(self.bravo)
+
+        for version in (foo1, foo2, bar1):
+            version.access = mock.MagicMock(version=version)
+            self.alpha.log.append(version, 0)
+
+        for version in (foo1, bar1, bar2, baz1):
+            version.access = mock.MagicMock(version=version)
+            self.bravo.log.append(version, 0)
+
+        digest  = Digest((foo2, bar1), 2)
+        message = mock.MagicMock(source=self.alpha, value=digest)
+
+        update = mock.patch.object(self.sim.results, 'update')
+        with update as record, mock.patch.object(self.bravo, 'send') as send:
+            self.bravo.on_digest_rpc(message)
+
+        target, response = send.call_args[0]
+        self.assertIs(target, self.alpha)
+        self.assertIsInstance(response, DigestResponse)
+        self.assertEqual(response.wanted, ('Foo',))
+        self.assertEqual(
+            set(access.version for access in response.entries), {bar2, baz1}
+        )
+        self.assertEqual(response.length, 2)
+
+        # The wanted versions are recorded separately from the digest
+        record.assert_called_once_with(
+            'anti entropy', (self.bravo.id, 'digest', 2, 0, 1, self.sim.env.now)
+        )
+
+    def test_delta_watermarks(self):
+        """
+        Test that deltas only send entries since the acknowledged watermark
+        """
+        self.alpha.ae_mode = AntiEntropy.DELTA
+
+        Foo = Version.new('Foo')
+        Bar = Version.new('Bar')
+
+        foo1 = Foo(self.alpha)
+        bar1 = Bar(self.alpha)
+        foo2 = foo1.nextv(self.alpha)
+
+        def append(version):
+            version.access = mock.MagicMock(version=version)
+            self.alpha.log.append(version, 0)
+
+        def delta():
+            with mock.patch.object(self.alpha, 'send') as send:
+                self.alpha.send_delta(self.bravo, self.alpha.log.get_latest_versions())
+            return send.call_args[0][1]
+
+        def ack(msg):
+            response = DeltaResponse((), 0, msg.index, 0)
+            self.alpha.on_delta_response_rpc(
+                mock.MagicMock(source=self.bravo, value=response)
+            )
+
+        append(foo1)
+        append(bar1)
+
+        # The first session is a full exchange
+        msg = delta()
+        self.assertEqual(msg.length, 2)
+        self.assertEqual(msg.index, 2)
+        self.assertIsNone(msg.since)
+        ack(msg)
+        self.assertEqual(self.alpha.watermarks[self.bravo], 2)
+
+        # Only the new write is sent after the acknowledgment
+        append(foo2)
+        msg = delta()
+        self.assertEqual([a.version for a in msg.entries], [foo2])
+        self.assertEqual(msg.since, 0)
+
+        # An unacknowledged delta falls back to a full exchange
+        msg = delta()
+        self.assertEqual(msg.length, 2)
+        self.assertNotIn(self.bravo, self.alpha.watermarks)
+
+
+    def test_delta_no_echo(self):
+        """
+        Test that deltas do not send a neighbor's own writes back to it
+        """
+        self.alpha.ae_mode = AntiEntropy.DELTA
+
+        Foo = Version.new('Foo')
+        Bar = Version.new('Bar')
+
+        foo1 = Foo(self.bravo)
+        bar1 = Bar(self.alpha)
+        self.alpha.log.append(bar1, 0)
+
+        patch_update = mock.patch.object(self.sim.results, 'update')
+        patch_send   = mock.patch.object(self.alpha, 'send')
+
+        with patch_update, patch_send as send:
+            # The response to a delta only contains our own writes
+            delta = Delta((foo1.access,), 1, 1, None)
+            self.alpha.on_delta_rpc(mock.MagicMock(source=self.bravo, value=delta))
+            response = send.call_args[0][1]
+            self.assertIs(self.alpha.log.get_latest_version('Foo'), foo1)
+            self.assertEqual([a.version for a in response.entries], [bar1])
+
+            # A delta to the neighbor does not contain its writes either
+            self.alpha.send_delta(self.bravo, self.alpha.log.get_latest_versions())
+            self.assertEqual([a.version for a in send.call_args[0][1].entries], [bar1])
+
+            # But later local writes of its objects are sent to it
+            self.alpha.write('Foo')
+            self.alpha.send_delta(self.bravo, self.alpha.log.get_latest_versions())
+            entries = send.call_args[0][1].entries
+            self.assertEqual(
+                set(a.version for a in entries),
+                {bar1, self.alpha.log.get_latest_version('Foo')}
+            )
+
+    def test_rumor_counter_termination(self):
+        """
+        Test that rumors stop spreading after k responses from replicas that knew it
+        """
+        self.alpha.do_rumoring = True
+        self.alpha.rumor_limit = 2
+
+        version = Version.new('Foo')(self.alpha)
+        access  = mock.MagicMock(version=version, name='Foo')
+        self.alpha.log.append(version, 0)
+
+        def respond(success):
+            response = RumorResponse(access, success, None)
+            self.alpha.on_rumor_response_rpc(
+                mock.MagicMock(source=self.bravo, value=response)
+            )
+
+        neighbors = mock.patch.object(
+            self.alpha, 'get_anti_entropy_neighbors', return_value=[self.bravo]
+        )
+
+        with neighbors, mock.patch.object(self.alpha, 'send') as send:
+            self.alpha.rumor(access)
+            self.assertIn(version, self.alpha.hot)
+
+            # New replicas keep the rumor hot and spreading
+            respond(True)
+            respond(False)
+            self.assertIn(version, self.alpha.hot)
+            self.assertEqual(send.call_count, 3)
+
+            # The second response from a replica that knew it removes it
+            respond(False)
+            self.assertNotIn(version, self.alpha.hot)
+            self.assertEqual(send.call_count, 3)
+
+            # Responses to removed rumors are ignored
+            respond(False)
+            self.assertEqual(send.call_count, 3)
+
+    def test_rumor_superseded(self):
+        """
+        Test that rumors of superseded versions stop spreading
+        """
+        self.alpha.do_rumoring = True
+        self.bravo.do_rumoring = True
+
+        patches = [
+            mock.patch.object(replica, name, **kwargs)
+            for replica, target in ((self.alpha, self.bravo), (self.bravo, self.alpha))
+            for name, kwargs in (
+                ('get_anti_entropy_neighbors', {'return_value': [target]}),
+                ('send', {}),
+            )
+        ]
+
+        for patch in patches: patch.start()
+        try:
+            first  = self.alpha.write('Foo').version
+            second = self.alpha.write('Foo').version
+            self.assertEqual(self.alpha.hot.keys(), [second])
+            self.assertNotIn(first, self.alpha.rumored)
+
+            # Receiving a later version also supersedes the rumor
+            self.bravo.on_rumor_rpc(
+                mock.MagicMock(source=self.alpha, value=Rumor(second.access))
+            )
+            self.assertEqual(self.bravo.hot.keys(), [second])
+
+            later = self.bravo.write('Foo').version
+            self.assertEqual(self.bravo.hot.keys(), [later])
+
+            self.alpha.on_rumor_rpc(
+                mock.MagicMock(source=self.bravo, value=Rumor(later.access))
+            )
+            self.assertEqual(self.alpha.hot.keys(), [later])
+            self.assertNotIn(second, self.alpha.rumored)
+        finally:
+            for patch in patches: patch.stop()
+
+    def test_rumor_later_version(self):
+        """
+        Test that a rumor response with a later version is written
+        """
+        Foo  = Version.new('Foo')
+        foo1 = Foo(self.alpha)
+        foo2 = foo1.nextv(self.bravo)
+        self.alpha.log.append(foo1, 0)
+
+        response = RumorResponse(
+            mock.MagicMock(version=foo1), False,
+            mock.MagicMock(version=foo2, name='Foo')
+        )
+
+        with mock.patch.object(self.alpha, 'write') as write:
+            self.alpha.on_rumor_response_rpc(
+                mock.MagicMock(source=self.bravo, value=response)
+            )
+            write.assert_called_once_with(response.current)
+
 
 ##########################################################################
 ## Backpressure Tests
 ##########################################################################
 
+    @mock.patch.object(settings.simulation, 'versioning', 'federated')
+    def test_delta_forte_reappend(self):
+        """
+        Test that a forte re-append during a delta session skips no entries
+        """
+        self.alpha.ae_mode = AntiEntropy.DELTA
+
+        Baz = FederatedVersion.new('Baz')
+        v1 = Baz(self.alpha)
+        v2 = v1.nextv(self.alpha)
+        v3 = v1.nextv(self.bravo) # Fork!
+        v4 = v2.nextv(self.alpha)
+        v5 = v3.nextv(self.bravo)
+        v7 = v5.nextv(self.bravo).nextv(self.bravo)
+
+        def append(replica, *versions):
+            for version in versions:
+                version.access = mock.MagicMock(version=version)
+                replica.log.append(version, 0)
+
+        def delta():
+            with mock.patch.object(self.alpha, 'send') as send:
+                self.alpha.send_delta(self.bravo, self.alpha.log.get_latest_versions())
+            return send.call_args[0][1]
+
+        def respond(msg):
+            with mock.patch.object(self.bravo, 'send') as send:
+                self.bravo.on_delta_rpc(mock.MagicMock(source=self.alpha, value=msg))
+            return send.call_args[0][1]
+
+        def ack(response):
+            with mock.patch.object(self.alpha, 'write'):
+                self.alpha.on_delta_response_rpc(
+                    mock.MagicMock(source=self.bravo, value=response)
+                )
+
+        # The first session synchronizes the log up to Baz.4.0
+        append(self.alpha, v1, v2, v3, v4)
+        append(self.bravo, v1, v3)
+        with mock.patch.object(self.bravo, 'write'):
+            ack(respond(delta()))
+        self.assertEqual(self.alpha.watermarks[self.bravo], 4)
+        self.assertEqual(self.bravo.heads[self.alpha], 2)
+
+        # Baz.4.0 is re-appended while the next delta is outstanding
+        append(self.alpha, v5, v7)
+        msg = delta()
+        self.assertEqual(msg.index, 6)
+
+        v2.forte = 1
+        self.alpha.update_forte_children(self.alpha.log.get_latest_version('Baz'), v2)
+        self.assertEqual(self.alpha.log.lastApplied, 6)
+        self.assertIs(self.alpha.log[6].version, v4)
+        self.assertEqual(self.alpha.outstanding[self.bravo], 5)
+
+        # The acknowledgment only covers the entries before the re-append
+        ack(DeltaResponse((), 0, msg.index, 2))
+        self.assertNotIn(self.bravo, self.alpha.outstanding)
+        self.assertEqual(self.alpha.watermarks[self.bravo], 5)
+
+        msg = delta()
+        self.assertEqual([access.version for access in msg.entries], [v4])
+
+        # Heads reported to neighbors are rewound with the log as well
+        qux = FederatedVersion.new('Qux')(self.bravo)
+        append(self.bravo, qux)
+        self.bravo.log.remove(v1)
+        self.bravo.rewind_watermarks(1)
+        self.bravo.log.append(v1, 0)
+        self.assertEqual(self.bravo.heads[self.alpha], 1)
+
+        response = respond(Delta((), 0, 7, 2))
+        self.assertIn(qux, [access.version for access in response.entries])
+
+
 class BackpressureTests(unittest.TestCase):
     """
     These tests implement the various backpressure cases.
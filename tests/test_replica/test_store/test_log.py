@@ -165,6 +165,33 @@ class WriteLogTests(unittest.TestCase):
         self.assertEqual(log.lastVersion, version-7)
         self.assertEqual(log.lastTerm, 4)
 
+    def test_log_view(self):
+        """
+        Test the zero-copy view of log entries
+        """
+        log = WriteLog()
+        for v in xrange(1, 9):
+            log.append(v, v // 3)
+
+        view = log.view(3, 6)
+        self.assertEqual(len(view), 3)
+        self.assertEqual(view, log[3:6])
+        self.assertEqual(view[0], log[3])
+        self.assertEqual(view[-1], log[5])
+        self.assertEqual([e.version for e in view], [3, 4, 5])
+
+        # Views are not affected by appends or truncation
+        log.append(9, 3)
+        log.truncate(2)
+        self.assertEqual([e.version for e in view], [3, 4, 5])
+
+        # Views to the end of the log and empty views
+        self.assertEqual(len(log.view(1)), 1)
+        self.assertFalse(log.view(2))
+
+        with self.assertRaises(IndexError):
+            view[3]
+
     def test_log_empty(self):
         """
         Test completely empty a log
@@ -308,3 +335,35 @@ class MultiObjectWriteLogTests(unittest.TestCase):
 
         d = self.log.get_latest_commit('D')
         self.assertIsNone(d)
+
+    def test_contains_identity(self):
+        """
+        Test the multi-object log version index on append, remove, truncate
+        """
+        a = self.log.get_latest_version('A')
+        self.assertIn(a, self.log)
+
+        self.log.remove(a)
+        self.assertNotIn(a, self.log)
+
+        self.log.append(a, 6)
+        self.assertIn(a, self.log)
+
+        d = self.log.get_latest_version('D')
+        self.log.truncate(10)
+        self.assertNotIn(a, self.log)
+        self.assertNotIn(d, self.log)
+        self.assertIn(self.log.get_latest_version('A'), self.log)
+
+    def test_latest_versions(self):
+        """
+        Test the multi-object log latest versions in a single pass
+        """
+        latest = self.log.get_latest_versions()
+        self.assertEqual(set(latest.keys()), {'A', 'B', 'C', 'D'})
+
+        for name, version in latest.iteritems():
+            self.assertIs(version, self.log.get_latest_version(name))
+
+        latest = self.log.get_latest_versions(after=10)
+        self.assertEqual(set(latest.keys()), {'B', 'C', 'D'})
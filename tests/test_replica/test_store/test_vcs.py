@@ -17,12 +17,14 @@ Tests the store functionality in the simulation.
 ## Imports
 ##########################################################################
 
+import sys
 import unittest
 import random
 
 from cloudscope.config import settings
 from cloudscope.dynamo import Sequence
 from cloudscope.replica.store import ObjectFactory
+from cloudscope.replica.store import MultiObjectWriteLog
 from cloudscope.replica.store.vcs import LamportScalar
 from cloudscope.replica import Replica, State, Consistency
 from cloudscope.replica import Version, LamportVersion, FederatedVersion
@@ -548,6 +550,32 @@ class MultiVersionTests(unittest.TestCase):
         a5.access.drop()
         self.assertFalse(a1.is_forked())
 
+    def test_fork_counting(self):
+        """
+        Test that live children are counted incrementally without accesses.
+        """
+        A = Version.new('A')
+        a1 = A(self.replica)
+        a2 = a1.nextv(self.replica)
+        a3 = a1.nextv(self.replica)
+
+        # Fork detection should not construct accesses on the children
+        self.assertEqual(a1.forks, 2)
+        self.assertTrue(a1.is_forked())
+        self.assertFalse(hasattr(a2, '_access'))
+        self.assertFalse(hasattr(a3, '_access'))
+
+        # Dropping the same write twice only unforks once
+        access = a3.access
+        access.drop()
+        access.drop()
+        self.assertEqual(a1.forks, 1)
+        self.assertFalse(a1.is_forked())
+
+        # Dropping a write that did not create the version does nothing
+        a2.access.clone().drop()
+        self.assertEqual(a1.forks, 1)
+
     def test_version_comparison(self):
         """
         Test multiple versions comparison based on fork
@@ -708,6 +736,18 @@ class VersionSubclassCases(object):
         self.assertGreater(v3, v2)
         self.assertEqual(v3, Foo.latest_version())
 
+    def test_staleness(self):
+        """
+        Test the {} version staleness against the latest version
+        """
+        Foo = self.klass.new('Foo')
+        v1 = Foo(self.replica)
+        self.assertEqual(v1.staleness(), 0)
+
+        v3 = v1.nextv(self.replica).nextv(self.replica)
+        self.assertEqual(v1.staleness(), 2)
+        self.assertEqual(v3.staleness(), 0)
+
     def test_nextv(self):
         """
         Test getting the next {} of an object
@@ -1159,6 +1199,56 @@ class LamportVersionTests(VersionSubclassCases, unittest.TestCase):
         vb = Foo(bravo)
         self.assertGreater(vb, va)
 
+    def test_lamport_latest_version(self):
+        """
+        Test the running maximum of the Lamport counters
+        """
+        alpha = self.replica
+        bravo = random.choice([r for r in self.sim.replicas if r != alpha])
+        alpha.id = "a0"
+        bravo.id = "b0"
+
+        Foo = self.klass.new('Foo')
+        self.assertEqual(Foo.latest_version(), 0)
+
+        for _ in xrange(5):
+            va = Foo(alpha)
+
+        vb = Foo(bravo)
+        self.assertEqual(Foo.latest_version(), 5)
+
+        # Merging a lower version does not change the maximum
+        Foo.update_version(alpha, vb)
+        self.assertEqual(Foo.latest_version(), 5)
+
+        # Raising the counter on receipt moves the maximum with it.
+        vb.version.version = 12
+        Foo.update_version(alpha, vb)
+        self.assertEqual(Foo.latest_version(), 12)
+        self.assertEqual(Foo(alpha).version, LamportScalar(alpha.id, 13))
+        self.assertEqual(Foo.latest_version(), 13)
+
+    def test_lamport_merge_on_update(self):
+        """
+        Test that replicas merge Lamport counters when updated with a version
+        """
+        alpha = self.replica
+        bravo = random.choice([r for r in self.sim.replicas if r != alpha])
+        alpha.id = "a0"
+        bravo.id = "b0"
+
+        Foo = self.klass.new('Foo')
+        for _ in xrange(10):
+            va = Foo(alpha)
+
+        # Once bravo receives va, its next write is later than va.
+        va.update(bravo)
+        vb = Foo(bravo)
+        self.assertEqual(vb.version, LamportScalar(bravo.id, 11))
+        self.assertGreater(vb, va)
+        self.assertFalse(vb.is_stale())
+        self.assertTrue(va.is_stale())
+
     def test_nextv(self):
         """
         Test getting the next {} of an object
@@ -1419,6 +1509,30 @@ class FederatedVersionTests(VersionSubclassCases, unittest.TestCase):
         a.update(leader, commit=True, forte=True)
         self.assertEqual(a.forte, 2)
 
+    def test_propagate_forte(self):
+        """
+        Test forte propagation on deep version chains only in the log
+        """
+        A = self.klass.new('A')
+        root = a = A(self.replica)
+        log  = MultiObjectWriteLog()
+
+        # Deeper than the recursion limit to ensure iterative traversal.
+        for idx in xrange(sys.getrecursionlimit() + 10):
+            a = a.nextv(self.replica)
+            if idx % 2 == 0: log.append(a, 0)
+
+        root.forte = 1
+        latest = root.propagate_forte(root, log)
+
+        self.assertIn(latest, log)
+        self.assertEqual(latest.forte, 1)
+        self.assertEqual(latest.version, a.version - 1)
+
+        # Versions not in the log are not updated
+        self.assertNotIn(a, log)
+        self.assertEqual(a.forte, 0)
+
     def test_non_leader_forte_update(self):
         """
         Assert that only Raft leaders can update the Forte
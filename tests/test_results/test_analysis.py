@@ -41,6 +41,8 @@ reads and commit latency recorded.
 import os
 import unittest
 
+from collections import defaultdict
+
 from cloudscope.results import Results
 from cloudscope.results.analysis import *
 
@@ -216,6 +218,14 @@ class TimeSeriesAggregatorTests(unittest.TestCase):
         self.assertIn(key, result)
         self.assertAlmostEqual(result[key], 120.9669, places=4)
 
+        # Tail latencies are estimated within the accuracy of the sketch
+        latencies = sorted(v[3] - v[2] for v in self.results.results['commit latency'])
+        for label, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('p999', 0.999)):
+            key = '{} commit latency (ms)'.format(label)
+            expected = latencies[int(q * (len(latencies) - 1))]
+            self.assertIn(key, result)
+            self.assertLessEqual(abs(result[key] - expected), 0.01 * expected)
+
     def test_handle_write_latency(self):
         """
         Test the write latency result handler
@@ -232,3 +242,188 @@ class TimeSeriesAggregatorTests(unittest.TestCase):
         key = 'mean write latency (ms)'
         self.assertIn(key, result)
         self.assertAlmostEqual(result[key], 45.6957, places=4)
+
+    def test_handle_write_batch(self):
+        """
+        Test the write batch result handler
+        """
+        result = self.handler('write batch', [
+            ('r1', 'batch', 8, 4, 100),
+            ('r1', 'batch', 2, 4, 120),
+            ('r1', 'batch', 6, 4, 180),
+        ])
+
+        self.assertEqual(result['write policy'], 'batch')
+        self.assertEqual(result['write batches'], 3)
+        self.assertAlmostEqual(result['mean write batch size'], 5.3333, places=4)
+        self.assertAlmostEqual(result['append entries per write'], 0.75)
+
+    def test_handle_policy_read(self):
+        """
+        Test the policy read result handler
+        """
+        result = self.handler('policy read', [
+            ('r1', 'lease', 100, 100, 0),
+            ('r1', 'lease', 200, 210, 2),
+            ('r2', 'quorum', 100, 140, 0),
+            ('r2', 'quorum', 200, 260, 0),
+        ])
+
+        self.assertEqual(result['lease reads'], 2)
+        self.assertEqual(result['quorum reads'], 2)
+        self.assertAlmostEqual(result['mean lease read latency (ms)'], 5.0)
+        self.assertAlmostEqual(result['mean quorum read latency (ms)'], 50.0)
+        self.assertEqual(result['lease stale reads'], 1)
+        self.assertEqual(result['quorum stale reads'], 0)
+        self.assertAlmostEqual(result['mean lease version staleness'], 2.0)
+
+    def test_handle_shard_leader(self):
+        """
+        Test the shard leader result handler
+        """
+        result = self.handler('shard leader', [
+            ('r1', 0, 100),
+            ('r2', 1, 110),
+            ('r1', 2, 120),
+            ('r3', 2, 300),
+        ])
+
+        self.assertEqual(result['shard leader elections'], 4)
+        self.assertEqual(result['shard leaders'], 3)
+        self.assertEqual(result['max leader load'], 1)
+        self.assertEqual(result['min leader load'], 1)
+
+    def test_handle_election(self):
+        """
+        Test the election result handler
+        """
+        result = self.handler('election', [
+            ('r1', 1, 100, 250, 1, False),
+            ('r2', 2, 300, 340, 3, True),
+        ])
+
+        self.assertEqual(result['elections'], 2)
+        self.assertEqual(result['elections won'], 1)
+        self.assertAlmostEqual(result['mean votes per election'], 2.0)
+        self.assertAlmostEqual(result['mean election duration (ms)'], 95.0)
+
+    def test_handle_leaderless(self):
+        """
+        Test the leaderless result handler
+        """
+        result = self.handler('leaderless', [
+            ('r1', 0, 340),
+            ('r2', 0, 360),
+            ('r1', 1000, 1300),
+        ])
+
+        self.assertEqual(result['leaderless periods'], 3)
+        self.assertAlmostEqual(result['mean leaderless period (ms)'], 333.3333, places=4)
+        self.assertAlmostEqual(result['time without a leader (ms)'], 500.0)
+
+    def test_handle_anti_entropy(self):
+        """
+        Test the anti-entropy result handler
+        """
+        result = self.handler('anti entropy', [
+            ('r1', 'digest', 0, 12, 0, 100),
+            ('r2', 'digest', 2, 0, 1, 110),
+            ('r1', 'digest', 1, 0, 0, 120),
+        ])
+
+        self.assertEqual(result['anti-entropy messages'], 3)
+        self.assertEqual(result['anti-entropy entries'], 3)
+        self.assertEqual(result['anti-entropy digest versions'], 12)
+        self.assertEqual(result['anti-entropy wanted versions'], 1)
+        self.assertAlmostEqual(result['mean anti-entropy entries per message'], 1.0)
+
+    def test_handle_rumor(self):
+        """
+        Test the rumor result handler
+        """
+        result = self.handler('rumor', [
+            ('r1', 'A.1', 100, 140, 3),
+            ('r2', 'A.1', 100, 180, 2),
+            ('r1', 'B.1', 200, 220, 1),
+        ])
+
+        self.assertEqual(result['rumors'], 2)
+        self.assertEqual(result['rumor messages'], 6)
+        self.assertAlmostEqual(result['mean rumor messages'], 3.0)
+        self.assertAlmostEqual(result['mean rumor convergence (ms)'], 50.0)
+
+    def test_handle_tag_acquisition(self):
+        """
+        Test the tag acquisition result handler
+        """
+        result = self.handler('tag acquisition', [
+            ('r1', 1, 1, 100, 140),
+            ('r2', 4, 3, 100, 160),
+            ('r1', 4, 4, 200, 220),
+        ])
+
+        self.assertEqual(result['tag acquisitions'], 3)
+        self.assertAlmostEqual(result['mean tag acquisition latency (ms)'], 40.0)
+        self.assertEqual(result['objects acquired'], 8)
+        self.assertEqual(result['partial tag grants'], 1)
+        self.assertNotIn('acquisition round trips saved', result)
+
+    def test_handle_prefetched_access(self):
+        """
+        Test the prefetched access result handler
+        """
+        result = self.handler('prefetched access', [
+            ('r1', 'read', 120), ('r1', 'write', 180),
+        ])
+
+        self.assertEqual(result['acquisition round trips saved'], 2)
+
+    def test_handle_pending_access(self):
+        """
+        Test the pending access result handler
+        """
+        result = self.handler('pending access', [
+            ('r1', 'read', 100, 180),
+            ('r1', 'write', 100, 140),
+            ('r2', 'write', 200, 220),
+        ])
+
+        self.assertEqual(result['pending accesses'], 3)
+        self.assertAlmostEqual(result['mean time to service (ms)'], 46.6667, places=4)
+        self.assertAlmostEqual(result['mean read time to service (ms)'], 80.0)
+        self.assertAlmostEqual(result['mean write time to service (ms)'], 30.0)
+
+    def test_group(self):
+        """
+        Test that grouped aggregates match the handlers of each group
+        """
+        for key, values in self.results.results.iteritems():
+            if not values: continue
+
+            groups = defaultdict(list)
+            for value in values:
+                groups[value[0]].append(value)
+
+            result = self.handler.group(key, values)
+            self.assertEqual(set(result), set(groups))
+            for replica, group in groups.iteritems():
+                self.assertEqual(result[replica], self.handler(key, group))
+
+            self.assertEqual(
+                self.handler.group(key, values, by=None),
+                {None: self.handler(key, values)}
+            )
+
+    def test_group_message_types(self):
+        """
+        Test grouping the sent messages by message type
+        """
+        result = self.handler.group('sent', [
+            ('r1', 'r2', 10, 'AppendEntries'),
+            ('r1', 'r3', 12, 'AppendEntries'),
+            ('r2', 'r1', 40, 'AEResponse'),
+        ], by=3)
+
+        self.assertEqual(result['AppendEntries']['sent'], 2)
+        self.assertEqual(result['AEResponse']['message types'], {'AEResponse': 1})
+        self.assertEqual(self.handler.group('sent', []), {})
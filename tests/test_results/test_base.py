@@ -17,13 +17,17 @@ Tetings for the results collection and serialization tool.
 ## Imports
 ##########################################################################
 
+import os
 import json
+import shutil
+import tempfile
 import unittest
 import datetime
 
 from dateutil.tz import tzutc
 from cStringIO import StringIO
 from cloudscope.results import *
+from cloudscope.config import settings
 from cloudscope.version import get_version
 from cloudscope.utils.decorators import Timer
 
@@ -76,6 +80,28 @@ class ResultsTests(unittest.TestCase):
         self.assertIn('values', result.results)
         self.assertEqual(result.results, {'values': [1,2,3,4,5,6,7,8,9]})
 
+    def test_results_path_unused(self):
+        """
+        Test that results do not leave empty directories on the results path
+        """
+        root = tempfile.mkdtemp(prefix="cloudscope-test-")
+        path = os.path.join(root, 'results')
+
+        patch_sink = mock.patch.object(settings.simulation, 'results_sink', 'jsonl')
+        patch_path = mock.patch.object(settings.simulation, 'results_path', path)
+
+        try:
+            with patch_sink, patch_path:
+                Results(simulation="Test Simulation")
+                self.assertFalse(os.path.exists(path))
+
+                result = Results(simulation="Test Simulation")
+                result.update('values', 1)
+                result.results.close()
+                self.assertEqual(len(os.listdir(path)), 1)
+        finally:
+            shutil.rmtree(root)
+
     def test_properties(self):
         """
         Test the properties of the simulation
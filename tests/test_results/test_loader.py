@@ -0,0 +1,124 @@
+# tests.test_results.test_loader
+# Testing the streaming loader of multisim results.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: test_loader.py [] $
+
+"""
+Testing the streaming loader of multisim results.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import json
+import pickle
+import unittest
+import tempfile
+
+from cloudscope.results import Results
+from cloudscope.results.loader import *
+from cloudscope.results.analysis import ExperimentRow
+from cloudscope.results.analysis import create_per_experiment_dataframe
+
+##########################################################################
+## Fixtures
+##########################################################################
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "fixtures")
+RESULTS  = os.path.join(FIXTURES, "results.json")
+
+# Settings required by the per experiment table missing from the fixture
+SETTINGS = {
+    'type': 'raft', 'tick_metric': 1000, 'latency_mean': 100,
+    'latency_range': [50, 150], 'latency_stddev': 10,
+    'tick_param_model': 'conservative',
+}
+
+##########################################################################
+## Loader Tests
+##########################################################################
+
+class LoaderTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(klass):
+        with open(RESULTS, 'r') as f:
+            data = json.load(f)
+        data['settings'].update(SETTINGS)
+
+        klass.path = tempfile.mktemp(suffix=".jsonl")
+        with open(klass.path, 'w') as f:
+            for users in (1, 2, 3):
+                data['settings']['users'] = users
+                f.write(json.dumps(data) + "\n")
+            f.write(json.dumps({'idx': 4, 'success': False, 'error': 'oops'}) + "\n")
+
+    @classmethod
+    def tearDownClass(klass):
+        os.remove(klass.path)
+
+    def expected(self):
+        with open(self.path, 'r') as f:
+            return [Results.load(line) for line in f.readlines()[:-1]]
+
+    def test_load_results(self):
+        """
+        Test that results are loaded lazily in order skipping errors
+        """
+        loaded = load_results(self.path, processes=1)
+        self.assertFalse(isinstance(loaded, list))
+
+        loaded = list(loaded)
+        self.assertEqual(len(loaded), 3)
+        for result, expected in zip(loaded, self.expected()):
+            self.assertEqual(result.settings, expected.settings)
+            self.assertEqual(dict(result.results), dict(expected.results))
+
+    def test_parallel(self):
+        """
+        Test that results parsed in a process pool are loaded in order
+        """
+        loaded = list(load_results(self.path, processes=2, batch_size=1))
+        self.assertEqual([r.settings['users'] for r in loaded], [1, 2, 3])
+        self.assertEqual(
+            dict(loaded[0].results), dict(self.expected()[0].results)
+        )
+
+    def test_projection(self):
+        """
+        Test loading only the specified keys and series
+        """
+        result = next(load_results(
+            self.path, keys=('settings',), series=('read', 'write'), processes=1
+        ))
+
+        self.assertEqual(set(result.results.keys()), {'read', 'write'})
+        self.assertEqual(result.settings['users'], 1)
+        self.assertEqual(result.messages.messages, {})
+        self.assertIsNotNone(result.timer)
+
+    def test_rows(self):
+        """
+        Test that rows are accepted by the per experiment table
+        """
+        rows = list(load_results(self.path, rows=True, processes=1))
+        self.assertTrue(all(isinstance(row, ExperimentRow) for row in rows))
+
+        expected = create_per_experiment_dataframe(self.expected())
+        self.assertTrue(create_per_experiment_dataframe(iter(rows)).equals(expected))
+        self.assertTrue(create_per_experiment_dataframe(
+            load_results(self.path, processes=2)
+        ).equals(expected))
+
+    def test_pickle(self):
+        """
+        Test that loaded results can be sent to other processes
+        """
+        result = Results.load(open(RESULTS, 'r'))
+        loaded = pickle.loads(pickle.dumps(result, 2))
+        self.assertEqual(dict(loaded.results), dict(result.results))
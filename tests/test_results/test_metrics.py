@@ -18,6 +18,7 @@ Testing for the results metrics utilities.
 ##########################################################################
 
 import json
+import pickle
 import random
 import unittest
 
@@ -25,10 +26,15 @@ from cloudscope.config import settings
 from cloudscope.results.metrics import *
 from cloudscope.simulation.network import Message
 from cloudscope.utils.serialize import JSONEncoder
-from cloudscope.utils.statistics import OnlineVariance
+from cloudscope.utils.statistics import OnlineVariance, QuantileSketch
 from collections import namedtuple, defaultdict, Counter
 from cloudscope.replica.consensus.raft import AppendEntries
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 ##########################################################################
 ## Message Classes and Constants
 ##########################################################################
@@ -97,6 +103,20 @@ class MessageMetricTests(unittest.TestCase):
 
         self.assertEqual(mtype, "None")
 
+    def test_classified_message_type(self):
+        """
+        Test that the message type classified on send is not recomputed
+        """
+        instance = MessageMetric()
+        message  = Message('alpha', 'bravo', Greeting("Hi", "Jo"), 10, 'Heartbeat')
+
+        with mock.patch('cloudscope.results.metrics.message_type') as classify:
+            self.assertEqual(instance.get_message_type(message), 'Heartbeat')
+            self.assertFalse(classify.called)
+
+        self.assertEqual(message_type(message.value), Greeting.__name__)
+        self.assertEqual(message_type(None), "None")
+
     def test_aggregate_heartbeats(self):
         """
         Ensure that heartbeats are aggregated in message metric
@@ -172,6 +192,59 @@ class MessageMetricTests(unittest.TestCase):
         settings.simulation.aggregate_heartbeats = prev
 
 
+##########################################################################
+## Dense Metric Array Tests
+##########################################################################
+
+class MetricMatrixTests(unittest.TestCase):
+
+    def test_enumeration(self):
+        """
+        Test that keys are interned to consecutive indices
+        """
+        replicas = Enumeration(['a1', 'b3'])
+        self.assertEqual(replicas['b3'], 1)
+        self.assertEqual(replicas['c4'], 2)
+        self.assertEqual(replicas['a1'], 0)
+        self.assertEqual(replicas.labels, ['a1', 'b3', 'c4'])
+
+        loaded = pickle.loads(pickle.dumps(replicas))
+        self.assertEqual(loaded, replicas)
+        self.assertEqual(loaded.labels, replicas.labels)
+
+    def test_growth(self):
+        """
+        Test that the matrix grows while preserving values in shared dimensions
+        """
+        replicas = Enumeration()
+        kinds    = Enumeration()
+        matrix   = MetricMatrix(['count'], [replicas, replicas, kinds], 'l', capacity=2)
+
+        expected = {}
+        for idx in xrange(10):
+            keys = ('r{}'.format(idx), 'r{}'.format(idx % 3), 'k{}'.format(idx % 4))
+            matrix.add('count', keys, idx + 1)
+            expected[keys] = idx + 1
+
+        self.assertEqual(matrix.shape, (16, 16, 4))
+        self.assertEqual(dict(
+            (keys, matrix['count'][offset]) for keys, offset in matrix.cells()
+        ), expected)
+
+    def test_matrix(self):
+        """
+        Test the dense numpy array of a field of the matrix
+        """
+        dist = LatencyDistribution()
+        for source, target, delay in (('a1', 'b3', 10), ('b3', 'a1', 20), ('a1', 'b3', 30)):
+            dist.update(pack(Greeting("Hi", "Jo"), Replica(source), Replica(target), delay))
+
+        samples = dist.moments.matrix('samples')
+        self.assertEqual(samples.shape, (2, 2, 1))
+        self.assertEqual(samples[:, :, 0].tolist(), [[0, 2], [1, 0]])
+        self.assertEqual(dist.moments.matrix('total').sum(), 60)
+
+
 ##########################################################################
 ## Message Counter Tests
 ##########################################################################
@@ -354,3 +427,56 @@ class LatencyDistributionTests(unittest.TestCase):
         data = json.loads(json.dumps(dist, cls=JSONEncoder))
         newdist = LatencyDistribution.deserialize(data)
         self.assertEqual(newdist.messages, {'e1': {'c4': {'Greeting': OnlineVariance([10, 20])}}, 'c4': {'e1': {'Greeting': OnlineVariance([10, 30])}}})
+
+        # Quantile sketches are serialized with the tail latencies
+        self.assertAlmostEqual(data['e1']['c4']['Greeting']['p50'], 10, delta=0.1)
+        self.assertEqual(newdist.sketch('c4', 'e1', 'Greeting'), QuantileSketch([10, 30]))
+
+        # Older results without sketches can still be deserialized
+        for stats in data['e1']['c4'].values():
+            del stats['quantiles']
+        olddist = LatencyDistribution.deserialize(data)
+        self.assertEqual(olddist.messages['e1']['c4']['Greeting'], OnlineVariance([10, 20]))
+        self.assertIsNone(olddist.sketch('e1', 'c4', 'Greeting'))
+        self.assertEqual(olddist.quantiles(), QuantileSketch([10, 30]))
+        self.assertEqual(len(olddist.quantiles(source='e1')), 0)
+
+    def test_pickle(self):
+        """
+        Test that metrics can be pickled for multiprocessing
+        """
+        c4 = Replica('c4')
+        e1 = Replica('e1')
+
+        dist = LatencyDistribution()
+        counter = MessageCounter()
+        for msg in (pack(Greeting("Hi", "Jo"), e1, c4, 10), pack(Greeting("Ho", "Jo"), c4, e1, 20)):
+            dist.update(msg)
+            counter.update(msg, SENT)
+
+        loaded = pickle.loads(pickle.dumps(dist, 2))
+        self.assertEqual(loaded.messages, dist.messages)
+        self.assertEqual(loaded.serialize(), dist.serialize())
+
+        loaded = pickle.loads(pickle.dumps(counter, 2))
+        self.assertEqual(loaded.serialize(), counter.serialize())
+
+    def test_quantiles(self):
+        """
+        Test the merged quantile sketches of the latency distribution
+        """
+        c4 = Replica('c4')
+        e1 = Replica('e1')
+
+        dist = LatencyDistribution()
+        for delay in xrange(1, 101):
+            dist.update(pack(Greeting("Hola", "James"), c4, e1, delay))
+            dist.update(pack(Heartbeat(delay, "ok"), e1, c4, delay * 10))
+
+        self.assertEqual(len(dist.quantiles()), 200)
+        self.assertEqual(len(dist.quantiles(source='c4')), 100)
+        self.assertEqual(len(dist.quantiles(mtype='Heartbeat')), 100)
+        self.assertEqual(len(dist.quantiles(source='c4', mtype='Heartbeat')), 0)
+
+        p99 = dist.quantiles(source='e1').quantile(0.99)
+        self.assertLessEqual(abs(p99 - 990), 0.01 * 990)
@@ -0,0 +1,161 @@
+# tests.test_results.test_online
+# Testing the online aggregation of the results time series.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: test_online.py [] $
+
+"""
+Testing the online aggregation of the results time series.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import pickle
+import unittest
+
+from cStringIO import StringIO
+from cloudscope.config import settings
+from cloudscope.results import Results
+from cloudscope.results.online import *
+from cloudscope.results.analysis import aggregator
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+##########################################################################
+## Fixtures
+##########################################################################
+
+SERIES = {
+    'sent': [
+        ('r1', 'r2', 10, 'AppendEntries'),
+        ('r1', 'r3', 12, 'AppendEntries'),
+        ('r2', 'r1', 40, 'AEResponse'),
+    ],
+    'recv': [
+        ('r2', 'r1', 30, 'AppendEntries', 20),
+        ('r1', 'r2', 55, 'AEResponse', 15),
+    ],
+    'read latency': [
+        ('r1', 'A.1', 100, 130),
+        ('r1', 'A.2', 200, 215),
+        ('r2', 'A.1', 100, 180),
+    ],
+    'stale reads': [
+        ('r1', 300, 120, 4, 2),
+        ('r2', 320, 200, 3, 2),
+    ],
+    'visibility': [
+        ('r1', 'A.1', 0.5, 100, 140),
+        ('r1', 'A.1', 1.0, 100, 190),
+        ('r2', 'B.1', 0.5, 150, 160),
+    ],
+    'commit latency': [
+        ('r1', 'A.1', 100, 160),
+        ('r1', 'A.1', 100, 170),
+        ('r1', 'A.2', 200, 230),
+    ],
+    'write batch': [
+        ('r1', 'batch', 4, 2, 100),
+        ('r1', 'batch', 2, 2, 200),
+    ],
+    'tag size': [
+        ('r2', 100, 3),
+        ('r2', 200, 5),
+    ],
+}
+
+##########################################################################
+## Online Sink Tests
+##########################################################################
+
+class OnlineSinkTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = OnlineSink()
+        for key, values in SERIES.iteritems():
+            for value in values:
+                self.sink.append(key, value)
+
+    def tearDown(self):
+        self.sink = None
+
+    def expected(self, replica=None):
+        """
+        Aggregates the raw series (for the replica) with the handlers.
+        """
+        result = {}
+        for key, values in SERIES.iteritems():
+            if replica is not None:
+                values = [v for v in values if v[0] == replica]
+            if values:
+                result.update(aggregator(key, values))
+        return result
+
+    def test_accumulators(self):
+        """
+        Test the accumulators for the series and handlers without them
+        """
+        self.assertIsInstance(get_accumulator('read latency'), Mean)
+        self.assertIsInstance(get_accumulator('visibility'), Visibility)
+        self.assertIsInstance(get_accumulator('write batch'), Values)
+        self.assertIsInstance(get_accumulator('unknown'), Count)
+
+    def test_aggregates(self):
+        """
+        Test the online aggregates match the handlers of the series
+        """
+        self.assertEqual(self.sink.replicas(), {'r1', 'r2'})
+        self.assertEqual(self.sink.aggregate('r1'), self.expected('r1'))
+        self.assertEqual(self.sink.aggregate('r2'), self.expected('r2'))
+        self.assertEqual(self.sink.aggregate(), self.expected())
+
+    def test_merge(self):
+        """
+        Test that sinks are merged across experiments
+        """
+        merged = OnlineSink()
+        merged += self.sink
+        merged += self.sink
+
+        result = merged.aggregate()
+        self.assertEqual(result['sent'], 6)
+        self.assertEqual(result['completed reads'], 6)
+        self.assertEqual(result['committed writes'], 2)
+        self.assertEqual(result['write batches'], 4)
+        self.assertEqual(result['mean read latency (ms)'], self.expected()['mean read latency (ms)'])
+
+    def test_pickle(self):
+        """
+        Test that the online sink can be sent to other processes
+        """
+        loaded = pickle.loads(pickle.dumps(self.sink, 2))
+        self.assertEqual(loaded.aggregate('r1'), self.expected('r1'))
+        self.assertEqual(loaded.aggregate(), self.expected())
+
+    def test_serialization(self):
+        """
+        Test that the online aggregates round trip through the results
+        """
+        with mock.patch.object(settings.simulation, 'results_sink', 'online'):
+            result = Results(simulation="Test Simulation")
+
+        self.assertIsInstance(result.results, OnlineSink)
+        for key, values in SERIES.iteritems():
+            for value in values:
+                result.update(key, value)
+
+        output = StringIO()
+        result.dump(output)
+        output.seek(0)
+
+        loaded = Results.load(output)
+        self.assertIsInstance(loaded.results, OnlineSink)
+        self.assertEqual(loaded.results.aggregate('r1'), self.expected('r1'))
+        self.assertEqual(loaded.results.aggregate(), self.expected())
@@ -0,0 +1,183 @@
+# tests.test_results.test_sink
+# Testing the sinks that store the time series of the results.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: test_sink.py [] $
+
+"""
+Testing the sinks that store the time series of the results.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from cStringIO import StringIO
+from cloudscope.config import settings
+from cloudscope.results import Results
+from cloudscope.results.sink import *
+from cloudscope.exceptions import ImproperlyConfigured
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+##########################################################################
+## Sink Tests
+##########################################################################
+
+class SinkTests(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix="cloudscope-test-")
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_get_sink(self):
+        """
+        Test the sink factory by format
+        """
+        self.assertIsInstance(get_sink('memory'), MemorySink)
+        self.assertIsInstance(get_sink('jsonl', self.path), JSONLSink)
+        self.assertIsInstance(get_sink('csv', self.path), CSVSink)
+
+        with self.assertRaises(ImproperlyConfigured):
+            get_sink('parquet')
+
+    def test_shared_results_path(self):
+        """
+        Test that sinks on the same results path write to their own directory
+        """
+        path = os.path.join(self.path, 'results')
+        sinks = [get_sink('jsonl', path), get_sink('jsonl', path)]
+        self.assertNotEqual(sinks[0].path, sinks[1].path)
+
+        for idx, sink in enumerate(sinks):
+            self.assertEqual(os.path.dirname(sink.path), path)
+            sink.append('read latency', ('r1', idx, 1.5))
+            sink.close()
+
+        for idx, sink in enumerate(sinks):
+            loaded = FileSink.open(sink.path)
+            self.assertEqual(loaded['read latency'], [['r1', idx, 1.5]])
+
+    def test_lazy_results_path(self):
+        """
+        Test that sinks do not create their directory until written to
+        """
+        path = os.path.join(self.path, 'results')
+        sink = get_sink('jsonl', path)
+        self.assertFalse(os.path.exists(path))
+
+        sink.append('read latency', ('r1', 0, 1.5))
+        sink.close()
+        self.assertEqual(os.listdir(path), [os.path.basename(sink.path)])
+
+    def test_chunked_writes(self):
+        """
+        Test that file sinks only buffer a chunk of each series
+        """
+        sink = JSONLSink(self.path, chunk_size=4)
+        for idx in xrange(10):
+            sink.append('read latency', ('r1', idx, idx * 2.5))
+
+        self.assertEqual(len(sink.buffers['read latency']), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.path, 'read_latency.jsonl')))
+
+        # Reading a series includes the values still buffered
+        self.assertIn('read latency', sink)
+        self.assertNotIn('write latency', sink)
+        self.assertEqual(len(sink['read latency']), 10)
+        self.assertEqual(sink['read latency'][9], ['r1', 9, 22.5])
+        self.assertEqual(sink['write latency'], [])
+
+    def test_round_trip(self):
+        """
+        Test that streamed series are loaded transparently with the results
+        """
+        rows = [
+            ('r1', 'A.1', 100, 12.5, True, None),
+            ('r2', 'B.2', 120, 0.0, False, 'latest'),
+        ]
+
+        for fmt in ('jsonl', 'csv', 'columnar'):
+            path  = os.path.join(self.path, fmt)
+            patch = mock.patch.multiple(
+                settings.simulation, results_sink=fmt,
+                results_path=path, results_chunk_size=1,
+            )
+
+            with patch:
+                result = Results(simulation="Test Simulation")
+                for row in rows:
+                    result.update('policy read', row)
+                result.update('sent', ('r1', 'r2', 10))
+
+            output = StringIO()
+            result.dump(output)
+            output.seek(0)
+
+            loaded = Results.load(output)
+            self.assertIsInstance(loaded.results, FileSink)
+            self.assertEqual(set(loaded.results.keys()), {'policy read', 'sent'})
+            self.assertEqual(
+                loaded.results['policy read'], [list(row) for row in rows]
+            )
+
+    def test_columnar_sink(self):
+        """
+        Test the typed and dictionary encoded columns of the columnar sink
+        """
+        rows = [
+            ('r1', 1, True, None),
+            ('r2', 2, False, 'x'),
+            ('r1', 2.5, True, 'y'),
+            ('r3', 4, False, 'x'),
+        ]
+
+        sink = ColumnarSink(self.path, chunk_size=2)
+        for row in rows:
+            sink.append('policy read', row)
+        sink.close()
+
+        loaded = FileSink.open(self.path)
+        self.assertIsInstance(loaded, ColumnarSink)
+        self.assertEqual(loaded['policy read'], [list(row) for row in rows])
+
+        # Integer columns are promoted to floats once a float is appended
+        kinds = [column['kind'] for column in loaded.columns['policy read']]
+        self.assertEqual(kinds, ['str', 'float', 'bool', 'str'])
+        self.assertEqual(loaded.columns['policy read'][0]['values'], ['r1', 'r2', 'r3'])
+
+        # Columns are memory mapped and can be read without decoding
+        codes = loaded.column('policy read', 0, decode=False)
+        self.assertEqual(codes.tolist(), [0, 1, 0, 2])
+
+        frame = loaded.frame('policy read', [0, 1], ['replica', 'latency'])
+        self.assertEqual(list(frame.columns), ['replica', 'latency'])
+        self.assertEqual(frame['latency'].sum(), 9.5)
+
+    def test_memory_round_trip(self):
+        """
+        Test that in memory series are serialized with the results
+        """
+        result = Results(simulation="Test Simulation")
+        result.update('sent', ('r1', 'r2', 10))
+
+        output = StringIO()
+        result.dump(output)
+        output.seek(0)
+
+        loaded = Results.load(output)
+        self.assertIsInstance(loaded.results, MemorySink)
+        self.assertEqual(loaded.results, {'sent': [['r1', 'r2', 10]]})
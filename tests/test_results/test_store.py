@@ -0,0 +1,146 @@
+# tests.test_results.test_store
+# Testing the SQLite results store.
+#
+# Copyright (C) 2016 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: test_store.py [] $
+
+"""
+Testing the SQLite results store.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import json
+import unittest
+import tempfile
+
+from cloudscope.results import Results
+from cloudscope.results.store import *
+from cloudscope.results.analysis import aggregate_series, aggregate_replicas
+
+##########################################################################
+## Fixtures
+##########################################################################
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "fixtures")
+RESULTS  = os.path.join(FIXTURES, "results.json")
+
+##########################################################################
+## Results Store Tests
+##########################################################################
+
+class ResultsStoreTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(klass):
+        with open(RESULTS, 'r') as f:
+            data = json.load(f)
+
+        # Write a multisim output of experiments with varying users.
+        klass.path = tempfile.mktemp(suffix=".jsonl")
+        with open(klass.path, 'w') as f:
+            for users in (1, 2, 3):
+                data['settings']['users'] = users
+                data['timer']['started'] += 1
+                f.write(json.dumps(data) + "\n")
+
+    @classmethod
+    def tearDownClass(klass):
+        os.remove(klass.path)
+
+    def setUp(self):
+        self.store = ResultsStore()
+        self.store.ingest(self.path, processes=1)
+
+        with open(RESULTS, 'r') as f:
+            self.results = Results.load(f)
+
+    def tearDown(self):
+        self.store.close()
+        self.store = None
+
+    def test_encoding(self):
+        """
+        Test that lists and dicts are stored as JSON
+        """
+        for value in (1, 0.5, u'raft', None, True):
+            self.assertEqual(decode(encode(value)), value)
+
+        self.assertEqual(encode([5, 255]), '[5, 255]')
+        self.assertEqual(decode(encode({'a': [1, 2]})), {'a': [1, 2]})
+
+    def test_ingest(self):
+        """
+        Test that experiments are ingested once
+        """
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual(self.store.ingest(self.path, processes=1), 0)
+        self.assertEqual(len(self.store), 3)
+
+    def test_experiments(self):
+        """
+        Test querying the experiments by their settings
+        """
+        experiments = self.store.experiments()
+        self.assertEqual(experiments['users'].tolist(), [1, 2, 3])
+        self.assertEqual(experiments['simulation'][0], self.results.simulation)
+
+        experiments = self.store.experiments(users=2)
+        self.assertEqual(len(experiments), 1)
+        self.assertEqual(experiments['users'][0], 2)
+        self.assertEqual(len(self.store.experiments(users=2, read_policy='none')), 0)
+
+    def test_aggregates(self):
+        """
+        Test querying the aggregates of experiments and replicas
+        """
+        expected = aggregate_series(self.results)
+        aggregates = self.store.aggregates(users=3)
+        self.assertEqual(len(aggregates), 1)
+        self.assertEqual(aggregates['experiment'][0], 3)
+        for name, value in expected.iteritems():
+            self.assertEqual(aggregates[name][0], value)
+
+        aggregates = self.store.aggregates(['completed reads'])
+        self.assertEqual(list(aggregates.columns), ['completed reads', 'experiment'])
+
+        expected = aggregate_replicas(self.results)
+        replicas = self.store.aggregates(replicas=True, users=1)
+        self.assertEqual(set(replicas['replica']), set(expected))
+        for _, row in replicas.iterrows():
+            self.assertEqual(row['sent'], expected[row['replica']]['sent'])
+
+    def test_messages(self):
+        """
+        Test querying the message counts
+        """
+        messages = self.store.messages(users=1)
+        expected = self.results.messages.messages
+        for _, row in messages.iterrows():
+            self.assertEqual(row['count'], expected[row['name']][row['kind']])
+
+        received = self.store.messages('received')
+        self.assertEqual(len(received), 3 * len(self.store.messages('received', users=1)))
+
+    def test_series(self):
+        """
+        Test storing and querying the raw time series
+        """
+        self.assertEqual(len(self.store.series('read')), 0)
+
+        store = ResultsStore()
+        eid = store.add(self.results, series=True)
+        self.assertIsNone(store.add(self.results))
+
+        reads = store.series('read')
+        self.assertEqual(list(reads.columns[:2]), ['experiment', 0])
+        self.assertTrue((reads['experiment'] == eid).all())
+        self.assertEqual(
+            [list(row)[1:] for row in reads.itertuples(index=False)],
+            [list(value) for value in self.results.results['read']]
+        )
@@ -30,6 +30,7 @@ try:
 except ImportError:
     import mock
 
+from cloudscope.config import settings
 from cloudscope.version import get_version
 from cloudscope.simulation.main import ConsistencySimulation
 
@@ -103,6 +104,10 @@ class SimulationTests(unittest.TestCase):
             u'sent', u'recv', u'dropped', u'commit latency',
             u'stale reads', u'empty reads', u'missed reads',
             u'dropped writes', 'forked writes', 'stale writes',
+            u'write batch', u'forwarded writes', u'policy read',
+            u'anti entropy', u'rumor', u'tag acquisition',
+            u'pending access', u'prefetched access', u'election',
+            u'leaderless',
         }
 
         for metric in required:
@@ -151,6 +156,25 @@ class SimulationTests(unittest.TestCase):
         # Check the results
         self.assertReliableResults(results)
 
+    def test_raft_lamport_simulation(self):
+        """
+        Run the raft consensus simulation with lamport versioning
+        """
+        with mock.patch.object(settings.simulation, 'versioning', 'lamport'):
+            sim = load_simulation(RAFT)
+            sim.run()
+
+        # Dump the results for testing
+        output = StringIO()
+        sim.results.dump(output)
+
+        # Get the results from the simulation
+        output.seek(0)
+        results = json.load(output)
+
+        # Check the results
+        self.assertReliableResults(results, metrics={u'policy read'})
+
     @unittest.skip("See issue #63")
     def test_tag_simulation(self):
         """
@@ -17,6 +17,7 @@ Testing for the statistics utility module.
 ## Imports
 ##########################################################################
 
+import json
 import unittest
 
 from itertools import product
@@ -550,3 +551,157 @@ class OnlineVarianceTests(unittest.TestCase):
             # Not precise enough for these calculations
             # self.assertAlmostEqual(stddev, online.stddev)
             # self.assertAlmostEqual(variance, online.variance)
+
+    def test_online_variance_stability(self):
+        """
+        Test that the variance of large samples does not lose precision
+        """
+        expected = OnlineVariance(FLOATS[0] * 1000)
+        online   = OnlineVariance([1e9 + x for x in FLOATS[0]] * 1000)
+        self.assertAlmostEqual(online.variance, expected.variance, places=4)
+
+        # The sum of squares cancels catastrophically at this magnitude
+        s0, s1 = online.samples, online.total
+        naive  = (s0 * online.squares - s1 * s1) / (s0 * (s0 - 1))
+        self.assertGreater(abs(naive - online.variance), 0.01)
+
+    def test_online_variance_update_many(self):
+        """
+        Test that bulk updates and merges match per sample updates
+        """
+        for data in INTEGERS + FLOATS:
+            expected = OnlineVariance(data)
+
+            online = OnlineVariance()
+            online.update_many(data)
+            self.assertEqual(online.samples, expected.samples)
+            self.assertAlmostEqual(online.mean, expected.mean)
+            self.assertAlmostEqual(online.variance, expected.variance)
+
+            # Merge a sharded summary of the data
+            merged = OnlineVariance()
+            for idx in xrange(0, len(data), 7):
+                shard = OnlineVariance()
+                shard.update_many(data[idx:idx+7])
+                merged += shard
+
+            self.assertAlmostEqual(merged.mean, expected.mean)
+            self.assertAlmostEqual(merged.variance, expected.variance)
+            self.assertAlmostEqual(merged.squares, expected.squares, places=4)
+
+    def test_online_variance_serialization(self):
+        """
+        Test the serialization of online variance with and without m2
+        """
+        online = OnlineVariance(FLOATS[1])
+        data   = json.loads(json.dumps(online.serialize()))
+        self.assertEqual(OnlineVariance.deserialize(data), online)
+
+        # Older results only have the sum of squares
+        del data['m2']
+        loaded = OnlineVariance.deserialize(data)
+        self.assertAlmostEqual(loaded.variance, online.variance)
+
+
+##########################################################################
+## Quantile Sketch Tests
+##########################################################################
+
+class QuantileSketchTests(unittest.TestCase):
+    """
+    Test cases for the QuantileSketch class
+    """
+
+    def test_quantile_edge_cases(self):
+        """
+        Test the quantiles of empty and zero valued sketches
+        """
+        sketch = QuantileSketch()
+        self.assertEqual(len(sketch), 0)
+        self.assertIsNone(sketch.quantile(0.5))
+
+        sketch = QuantileSketch([0, 0, 0, 5])
+        self.assertEqual(sketch.zeros, 3)
+        self.assertEqual(sketch.quantile(0.5), 0)
+        self.assertEqual(sketch.quantile(1.0), 5)
+
+    def test_relative_accuracy(self):
+        """
+        Test that quantiles are estimated within the relative accuracy
+        """
+        data   = range(1, 10001)
+        sketch = QuantileSketch(data, accuracy=0.01)
+
+        for q in (0.0, 0.25, 0.5, 0.95, 0.99, 0.999, 1.0):
+            expected = data[int(q * (len(data) - 1))]
+            self.assertLessEqual(
+                abs(sketch.quantile(q) - expected), 0.01 * expected
+            )
+
+        percentiles = sketch.percentiles()
+        self.assertEqual(set(percentiles), {'p50', 'p95', 'p99', 'p999'})
+        self.assertEqual(percentiles['p99'], sketch.quantile(0.99))
+
+    def test_bounded_buckets(self):
+        """
+        Test that the lowest buckets are collapsed past the maximum
+        """
+        data   = [1.1 ** idx for idx in xrange(500)]
+        sketch = QuantileSketch(data, max_buckets=100)
+
+        self.assertEqual(len(sketch.buckets), 100)
+        self.assertEqual(len(sketch), 500)
+
+        # The tail is unaffected by the collapsed buckets
+        expected = data[int(0.99 * 499)]
+        self.assertLessEqual(
+            abs(sketch.quantile(0.99) - expected), 0.01 * expected
+        )
+
+    def test_sketch_addition(self):
+        """
+        Test that merged sketches are identical to a sketch of all samples
+        """
+        for a, b in product(INTEGERS + FLOATS, repeat=2):
+            a = [abs(x) for x in a]
+            b = [abs(x) for x in b]
+
+            sa = QuantileSketch(a)
+            sb = QuantileSketch(b)
+            merged = sa + sb
+
+            self.assertIsNot(sa, merged)
+            self.assertEqual(merged, QuantileSketch(a + b))
+            self.assertEqual(merged.minimum, min(a + b))
+            self.assertEqual(merged.maximum, max(a + b))
+
+        with self.assertRaises(ValueError):
+            QuantileSketch(accuracy=0.01) + QuantileSketch(accuracy=0.05)
+
+    def test_update_many(self):
+        """
+        Test that bulk updates are identical to updating each sample
+        """
+        for data in INTEGERS + FLOATS:
+            data = [abs(x) for x in data]
+
+            sketch = QuantileSketch()
+            sketch.update_many(data)
+
+            self.assertEqual(sketch, QuantileSketch(data))
+            self.assertEqual(sketch.minimum, min(data))
+            self.assertEqual(type(sketch.minimum), type(min(data)))
+
+    def test_serialization(self):
+        """
+        Test that sketches round trip through JSON serialization
+        """
+        sketch = QuantileSketch(FLOATS[1])
+        data   = json.loads(json.dumps(sketch.serialize()))
+        loaded = QuantileSketch.deserialize(data)
+
+        self.assertEqual(loaded, sketch)
+        self.assertEqual(loaded.percentiles(), sketch.percentiles())
+
+        with self.assertRaises(TypeError):
+            QuantileSketch.deserialize({'samples': 10})